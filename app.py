@@ -1,10 +1,38 @@
 import sys
-from flask import Flask, request, abort, jsonify
+from flask import Flask, Response, request, abort, jsonify, stream_with_context
 from flask_cors import CORS
-from database.models import setup_db, Movie, Actor, dbSessionClose, dbSessionRollback
-from datetime import date
-from auth.auth import AuthError, requires_auth
-from flask_migrate import Migrate
+from database.models import setup_db, Movie, Actor, Casting, dbSessionRollback, dbSessionCommit
+from database.queries import MOVIE_FIELDS, ACTOR_FIELDS, movie_filters, actor_filters, fetch_page, fetch_row
+from database.queries import movie_casts, actor_roles, embed_related
+from database.queries import movies_version, actors_version, movie_casts_version, actor_roles_version
+from database.queries import catalog_version
+from database.search import SEARCH_KINDS, search
+from database.export import iter_rows, ndjson_chunks, json_array_chunks
+from database.bulk import BULK_MAX_ITEMS, bulk_insert, bulk_update, bulk_delete
+from database.writes import update_row, delete_row
+from database.validation import ValidationError, validate_movie, validate_actor, validate_id
+from database.pool import pool_status
+from database.replicas import replica_status
+from database.serialization import json_response, dumps
+from auth.auth import AuthError, requires_auth, check_permissions, permission_set, token_cache
+from auth.rate_limit import RateLimitExceeded
+from cache.response_cache import response_cache
+from cache.conditional import conditional, conditional_response
+from cache.object_cache import object_cache
+from monitoring.metrics import registry, instrument_app, status_samples, AUTH_FAILURES
+from monitoring.metrics import POOL_METRICS, RESPONSE_CACHE_METRICS, OBJECT_CACHE_METRICS, TOKEN_CACHE_METRICS
+from monitoring.profiling import RequestProfiler
+from monitoring.slow_queries import slow_query_log
+
+"""
+Rate limit cost of the endpoints heavier than a single row read or write
+(see RATE_LIMIT_RATE in auth/rate_limit.py; other endpoints cost 1 to read and 2 to write)
+"""
+
+LIST_COST = 2
+SEARCH_COST = 3
+BULK_COST = 10
+EXPORT_COST = 20
 
 """
 Create and configure the application
@@ -15,7 +43,9 @@ def create_app(test_config=None):
     app = Flask(__name__)
     CORS(app, resource={r"/*": {"origins": "*"}})
     db = setup_db(app)
-    migrate = Migrate(app, db)
+    instrument_app(app)
+    RequestProfiler.from_env().install(app)
+    slow_query_log.install()
 
     @app.after_request
     def after_request(response):
@@ -23,61 +53,374 @@ def create_app(test_config=None):
         response.headers.add("Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS")
         return response
 
+    """
+    GET /health
+    - no permission required
+    - returns the database connection pool metrics with status code 200:
+      size, checked_in, checked_out, overflow, and how often / how long requests waited for a connection
+    - returns the response cache hits, misses and hit ratio
+    - returns the health and lag of the read replicas, if any
+    """
+
+    @app.route("/health")
+    def health():
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "database": pool_status(db.engine),
+                    "cache": response_cache.stats(),
+                    "object_cache": object_cache.stats(),
+                    "replicas": replica_status(app),
+                }
+            ),
+            200,
+        )
+
+    """
+    GET /metrics
+    - no permission required
+    - returns the metrics of this worker process in the Prometheus text format with status code 200:
+      request latency histograms per route, method and status, authentication step timings,
+      database queries and query time per request, pool gauges and cache counters
+    """
+
+    @app.route("/metrics")
+    def metrics():
+        samples = status_samples(POOL_METRICS, pool_status(db.engine))
+        samples += status_samples(RESPONSE_CACHE_METRICS, response_cache.stats())
+        samples += status_samples(OBJECT_CACHE_METRICS, object_cache.stats())
+        samples += status_samples(TOKEN_CACHE_METRICS, token_cache.stats())
+        return Response(registry.render(samples), mimetype="text/plain; version=0.0.4")
+
     """
     GET /movies
     - requires the get:movies permission
-    - returns the list of movies in the server with status code 200
+    - returns a page of movies ordered by id with status code 200
+    - query params (all optional):
+        limit: page size (default 50, max 1000)
+        cursor: next_cursor of the previous page
+        fields: comma separated columns to return, e.g. fields=title
+        title: title prefix
+        release_date_from, release_date_to: ISO dates YYYY-MM-DD
+        embed=actors: include each movie's cast (also requires get:actors)
+    - next_cursor is null on the last page
+    - sends ETag and Last-Modified, returns 304 when If-None-Match / If-Modified-Since still match
     """
 
     @app.route("/movies")
-    @requires_auth("get:movies")
+    @requires_auth("get:movies", cost=LIST_COST)
+    @response_cache.cached("movies", embed=("actors", "castings"))
+    @conditional(lambda: movies_version(request.args))
     def getMovies(payload):
-        movies = Movie.query.order_by(Movie.id).all()
+        embed = request.args.get("embed")
+        if embed not in (None, "actors"):
+            abort(400)
+        if embed:
+            check_permissions("get:actors", payload)
+
+        try:
+            movies, next_cursor = fetch_page(Movie, MOVIE_FIELDS, request.args, movie_filters(request.args))
+        except ValueError:
+            abort(400)
 
         if len(movies) == 0:
             abort(404)
 
-        displayMovies = [movie.format() for movie in movies]
+        if embed:
+            embed_related(movies, "actors", movie_casts)
 
-        return jsonify({"success": True, "movies": displayMovies}), 200
+        return json_response({"success": True, "movies": movies, "next_cursor": next_cursor})
 
     """
     GET /actors
     - requires the get:actors permission
-    - returns the list of actors in the server with status code 200
+    - returns a page of actors ordered by id with status code 200
+    - query params (all optional):
+        limit: page size (default 50, max 1000)
+        cursor: next_cursor of the previous page
+        fields: comma separated columns to return, e.g. fields=name,age
+        name: name prefix
+        age_min, age_max: age bounds
+        gender: exact gender
+        embed=movies: include the movies each actor is cast in (also requires get:movies)
+    - next_cursor is null on the last page
+    - sends ETag and Last-Modified, returns 304 when If-None-Match / If-Modified-Since still match
     """
 
     @app.route("/actors")
-    @requires_auth("get:actors")
+    @requires_auth("get:actors", cost=LIST_COST)
+    @response_cache.cached("actors", embed=("movies", "castings"))
+    @conditional(lambda: actors_version(request.args))
     def getActors(payload):
-        actors = Actor.query.order_by(Actor.id).all()
+        embed = request.args.get("embed")
+        if embed not in (None, "movies"):
+            abort(400)
+        if embed:
+            check_permissions("get:movies", payload)
+
+        try:
+            actors, next_cursor = fetch_page(Actor, ACTOR_FIELDS, request.args, actor_filters(request.args))
+        except ValueError:
+            abort(400)
 
         if len(actors) == 0:
             abort(404)
 
-        displayActors = [actor.format() for actor in actors]
+        if embed:
+            embed_related(actors, "movies", actor_roles)
+
+        return json_response({"success": True, "actors": actors, "next_cursor": next_cursor})
+
+    """
+    GET /movies/<id> and GET /actors/<id>
+    - require the get:movies / get:actors permission
+    - if <id> not found, returns a 404 error
+    - returns json with the movie or actor and status code 200:
+      {"success": true, "movie": {"id": 1, "title": "...", "release_date": "..."}}
+    - rows are served from the object cache when present (X-Cache: HIT), writes to a row invalidate it;
+      with read replicas, clients that just wrote skip the cache (see database/replicas.py)
+    - sends ETag and Last-Modified, returns 304 when If-None-Match / If-Modified-Since still match;
+      the row's updated_at is cached with it, so hits and 304s from the cache need no query
+    """
+
+    @app.route("/movies/<int:movie_id>")
+    @requires_auth("get:movies")
+    def getMovie(payload, movie_id):
+        return detail_response(payload, "movie", Movie, MOVIE_FIELDS, movie_id)
+
+    @app.route("/actors/<int:actor_id>")
+    @requires_auth("get:actors")
+    def getActor(payload, actor_id):
+        return detail_response(payload, "actor", Actor, ACTOR_FIELDS, actor_id)
+
+    def detail_response(payload, key, model, fields, id):
+        replicas = app.extensions.get("replicas")
+        if replicas is not None and replicas.is_sticky():
+            cached, stamp = None, None
+        else:
+            cached, stamp = object_cache.lookup(model.__tablename__, id)
+        cache = "HIT"
+        if cached is None:
+            row = fetch_row(model, dict(fields, updated_at=model.updated_at), id)
+            if row is None:
+                abort(404)
+            updated_at = row.pop("updated_at")
+            cached = dumps(row), updated_at
+            if replicas is None or replicas.cacheable(object_cache.invalidated_at):
+                object_cache.set(model.__tablename__, id, cached, stamp)
+            cache = "MISS"
+        body, updated_at = cached
+
+        def view():
+            return Response(b'{"success":true,"%s":%s}' % (key.encode(), body), mimetype="application/json")
+
+        # (1, updated_at) is the catalog_version of the row, known here without querying it
+        response = conditional_response(payload, (1, updated_at), view)
+        response.headers["X-Cache"] = cache
+        return response
+
+    """
+    GET /movies/<id>/actors
+    - requires the get:movies and get:actors permissions
+    - if <id> not found, returns a 404 error
+    - returns json with the cast of the movie (actors with their role) and status code 200
+    - sends ETag and Last-Modified, returns 304 when If-None-Match / If-Modified-Since still match
+    """
 
-        return jsonify({"success": True, "actors": displayActors}), 200
+    @app.route("/movies/<int:movie_id>/actors")
+    @requires_auth("get:movies", "get:actors")
+    @response_cache.cached("movies", "actors", "castings")
+    @conditional(movie_casts_version)
+    def getMovieActors(payload, movie_id):
+        if Movie.query.with_entities(Movie.id).filter_by(id=movie_id).first() is None:
+            abort(404)
+
+        return json_response({"success": True, "movie_id": movie_id, "actors": movie_casts([movie_id])[movie_id]})
+
+    """
+    GET /actors/<id>/movies
+    - requires the get:actors and get:movies permissions
+    - if <id> not found, returns a 404 error
+    - returns json with the movies the actor is cast in (with their role) and status code 200
+    - sends ETag and Last-Modified, returns 304 when If-None-Match / If-Modified-Since still match
+    """
+
+    @app.route("/actors/<int:actor_id>/movies")
+    @requires_auth("get:actors", "get:movies")
+    @response_cache.cached("movies", "actors", "castings")
+    @conditional(actor_roles_version)
+    def getActorMovies(payload, actor_id):
+        if Actor.query.with_entities(Actor.id).filter_by(id=actor_id).first() is None:
+            abort(404)
+
+        return json_response({"success": True, "actor_id": actor_id, "movies": actor_roles([actor_id])[actor_id]})
+
+    """
+    GET /search
+    - requires the get:movies or get:actors permission
+    - returns movies and actors matching q, best match first, with status code 200
+    - query params:
+        q: words to look for, each matching the start of a word of the title or name (required)
+        type: movies or actors, to search one catalog (default every catalog the caller may read)
+        limit: page size (default 20, max 100)
+        cursor: next_cursor of the previous page
+    - each result has a "type" (movie or actor) and a "rank"
+    - next_cursor is null on the last page
+    - every page ranks the 300 matches of each catalog with the lowest ids (SEARCH_CANDIDATES of
+      database/search.py), so with more matches the order is approximate; at most 300 results are paged
+      through, next_cursor is null there and a cursor past it is a 400
+    """
+
+    @app.route("/search")
+    @requires_auth("get:movies", "get:actors", any_of=True, cost=SEARCH_COST)
+    @response_cache.cached("movies", "actors")
+    @conditional(lambda: catalog_version((Movie, []), (Actor, [])))
+    def searchCatalog(payload):
+        kinds = request.args.getlist("type")
+        if not kinds:
+            kinds = [kind for kind in SEARCH_KINDS if "get:" + kind in permission_set(payload)]
+        for kind in kinds:
+            if kind not in SEARCH_KINDS:
+                abort(400)
+            check_permissions("get:" + kind, payload)
+
+        try:
+            results, next_cursor = search(request.args.get("q"), kinds, request.args)
+        except ValueError:
+            abort(400)
+
+        return json_response({"success": True, "results": results, "next_cursor": next_cursor})
+
+    """
+    POST /movies/<id>/actors
+    - requires patch:movies permission
+    - payload should be json.
+      example payload: {"actor_id": 13, "role": "Max Rockatansky"}
+    - if the movie or actor is not found, returns a 404 error
+    - if the actor is already cast in the movie, returns a 422 error
+    - returns json with the casting and status code 200
+    """
+
+    @app.route("/movies/<int:movie_id>/actors", methods=["POST"])
+    @requires_auth("patch:movies")
+    @response_cache.invalidates("castings")
+    def castActor(payload, movie_id):
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get("actor_id"), int):
+            abort(400)
+        if Movie.query.get(movie_id) is None or Actor.query.get(data["actor_id"]) is None:
+            abort(404)
+        if Casting.query.get((movie_id, data["actor_id"])) is not None:
+            abort(422)
+
+        error = False
+        body = {}
+        try:
+            casting = Casting(movie_id=movie_id, actor_id=data["actor_id"], role=data.get("role"))
+            casting.insert()
+            body = casting.format()
+        except Exception:
+            dbSessionRollback()
+            error = True
+            print(sys.exc_info())
+
+        if error:
+            abort(400)
+        else:
+            return jsonify({"success": True, "casting": body}), 200
+
+    """
+    DELETE /movies/<id>/actors/<actor_id>
+    - requires patch:movies permission
+    - if the actor is not cast in the movie, returns a 404 error
+    - returns json with the removed casting and status code 200
+    """
+
+    @app.route("/movies/<int:movie_id>/actors/<int:actor_id>", methods=["DELETE"])
+    @requires_auth("patch:movies")
+    @response_cache.invalidates("castings")
+    def uncastActor(payload, movie_id, actor_id):
+        casting = Casting.query.get((movie_id, actor_id))
+        if casting is None:
+            abort(404)
+
+        error = False
+        try:
+            casting.delete()
+        except Exception:
+            dbSessionRollback()
+            error = True
+            print(sys.exc_info())
+
+        if error:
+            abort(400)
+        else:
+            return jsonify({"success": True, "movie_id": movie_id, "actor_id": actor_id}), 200
+
+    """
+    GET /movies/export
+    - requires the get:movies permission
+    - streams every movie ordered by id, accepts the same fields and filter params as GET /movies
+    - format=ndjson (default): one json object per line, application/x-ndjson
+    - format=json: {"success": true, "movies": [...]} sent in chunks
+    - memory use is constant regardless of table size
+    """
+
+    @app.route("/movies/export")
+    @requires_auth("get:movies", cost=EXPORT_COST)
+    def exportMovies(payload):
+        try:
+            rows = iter_rows(Movie, MOVIE_FIELDS, request.args, movie_filters(request.args))
+        except ValueError:
+            abort(400)
+
+        return export_response(rows, "movies", request.args.get("format", "ndjson"))
+
+    """
+    GET /actors/export
+    - requires the get:actors permission
+    - streams every actor ordered by id, accepts the same fields and filter params as GET /actors
+    - format=ndjson (default): one json object per line, application/x-ndjson
+    - format=json: {"success": true, "actors": [...]} sent in chunks
+    - memory use is constant regardless of table size
+    """
+
+    @app.route("/actors/export")
+    @requires_auth("get:actors", cost=EXPORT_COST)
+    def exportActors(payload):
+        try:
+            rows = iter_rows(Actor, ACTOR_FIELDS, request.args, actor_filters(request.args))
+        except ValueError:
+            abort(400)
+
+        return export_response(rows, "actors", request.args.get("format", "ndjson"))
+
+    def export_response(rows, key, format):
+        if format == "ndjson":
+            return Response(stream_with_context(ndjson_chunks(rows)), mimetype="application/x-ndjson")
+        if format == "json":
+            return Response(stream_with_context(json_array_chunks(rows, key)), mimetype="application/json")
+        abort(400)
 
     """
     POST /movies
     - requires post:movies permission
     - payload should be json. The release date should be of iso format YYYY-MM-DD
       example payload: {"title":"MovieTitle", "release_date": "2020-12-30"}
+    - an invalid payload returns a 400 error listing the invalid fields, before the database is touched
     - returns json with id of the newly created movie and status code 200
     """
 
     @app.route("/movies", methods=["POST"])
     @requires_auth("post:movies")
+    @response_cache.invalidates("movies")
     def createMovie(payload):
-        payload = request.json
+        values = validate_movie(request.get_json(silent=True))
         error = False
         body = {}
         try:
-            movie = Movie(
-                title=payload["title"],
-                release_date=date.fromisoformat(payload["release_date"]),
-            )
+            movie = Movie(**values)
             movie.insert()
             body["id"] = movie.id
             body["success"] = True
@@ -85,8 +428,6 @@ def create_app(test_config=None):
             dbSessionRollback()
             error = True
             print(sys.exc_info())
-        finally:
-            dbSessionClose()
         if error:
             abort(400)
         else:
@@ -97,17 +438,20 @@ def create_app(test_config=None):
     - requires post:actors permission
     - payload should be json. 
       example payload: {"name" : "ActorName", "age" : 23, "gender": "Female"} 
+    - age between 0 and 150, gender one of Female, Male, Non-binary, Other
+    - an invalid payload returns a 400 error listing the invalid fields, before the database is touched
     - returns json with id of the newly created actor and status code 200
     """
 
     @app.route("/actors", methods=["POST"])
     @requires_auth("post:actors")
+    @response_cache.invalidates("actors")
     def createActor(payload):
-        payload = request.json
+        values = validate_actor(request.get_json(silent=True))
         body = {}
         error = False
         try:
-            actor = Actor(name=payload["name"], age=payload["age"], gender=payload["gender"])
+            actor = Actor(**values)
             actor.insert()
             body["id"] = actor.id
             body["success"] = True
@@ -115,13 +459,10 @@ def create_app(test_config=None):
             dbSessionRollback()
             error = True
             print(sys.exc_info())
-        finally:
-            dbSessionClose()
         if error:
             abort(400)
         else:
-            jsonify(body), 200
-        return jsonify(body), 200
+            return jsonify(body), 200
 
     """
     DELETE /movies/<id>
@@ -133,22 +474,28 @@ def create_app(test_config=None):
 
     @app.route("/movies/<movie_id>", methods=["DELETE"])
     @requires_auth("delete:movies")
+    @response_cache.invalidates("movies", "castings")
+    @object_cache.invalidates("movies", "movie_id")
     def delete_movie(payload, movie_id):
-        error = False
-        movie = Movie.query.get(movie_id)
-        if movie is None:
+        try:
+            id = int(movie_id)
+        except ValueError:
             abort(404)
+
+        error = False
+        found = False
         try:
-            movie.delete()
+            found = delete_row(Movie, id)
+            dbSessionCommit()
         except Exception:
             dbSessionRollback()
             error = True
             print(sys.exc_info())
-        finally:
-            dbSessionClose()
 
         if error:
             abort(400)
+        elif not found:
+            abort(404)
         else:
             return jsonify({"success": True, "delete": movie_id}), 200
 
@@ -162,22 +509,28 @@ def create_app(test_config=None):
 
     @app.route("/actors/<actor_id>", methods=["DELETE"])
     @requires_auth("delete:actors")
+    @response_cache.invalidates("actors", "castings")
+    @object_cache.invalidates("actors", "actor_id")
     def delete_actor(payload, actor_id):
-        error = False
-        actor = Actor.query.get(actor_id)
-        if actor is None:
+        try:
+            id = int(actor_id)
+        except ValueError:
             abort(404)
+
+        error = False
+        found = False
         try:
-            actor.delete()
+            found = delete_row(Actor, id)
+            dbSessionCommit()
         except Exception:
             dbSessionRollback()
             error = True
             print(sys.exc_info())
-        finally:
-            dbSessionClose()
 
         if error:
             abort(400)
+        elif not found:
+            abort(404)
         else:
             return jsonify({"success": True, "delete": actor_id}), 200
 
@@ -186,37 +539,31 @@ def create_app(test_config=None):
     - requires patch:movies permission
     - payload should be json. The release date should be of iso format YYYY-MM-DD
       example payload: {"title":"MovieTitle", "release_date": "2020-12-30"}
+    - only the fields in the payload are changed, at least one is required
+    - if <id> not found, returns a 404 error; an invalid payload returns a 400 error listing the invalid fields
     - returns json with details of the modified movie and status code 200
     """
 
     @app.route("/movies/<int:index>", methods=["PATCH"])
     @requires_auth("patch:movies")
+    @response_cache.invalidates("movies")
+    @object_cache.invalidates("movies", "index")
     def editMovie(payload, index):
-        movie = Movie.query.get(index)
-        if movie is None:
-            abort(404)
-
-        data = request.json
-
-        if data is None:
-            abort(400)
-
+        values = validate_movie(request.get_json(silent=True), partial=True)
         error = False
-        body = {}
+        body = None
         try:
-            movie.title = data["title"]
-            movie.release_date = data["release_date"]
-            movie.update()
-            body = movie.format()
+            body = update_row(Movie, MOVIE_FIELDS, index, values)
+            dbSessionCommit()
         except Exception:
             dbSessionRollback()
             error = True
             print(sys.exc_info())
-        finally:
-            dbSessionClose()
 
         if error:
             abort(400)
+        elif body is None:
+            abort(404)
         else:
             return jsonify({"success": True, "movie": body}), 200
 
@@ -225,25 +572,22 @@ def create_app(test_config=None):
     - requires patch:actors permission
     - payload should be json.
       example paylod: {"name":"ActorName", "age": 56, "gender": "Male"}
+    - only the fields in the payload are changed, at least one is required
+    - if <id> not found, returns a 404 error; an invalid payload returns a 400 error listing the invalid fields
     - returns json with details of the modified actor and status code 200
     """
 
     @app.route("/actors/<int:index>", methods=["PATCH"])
     @requires_auth("patch:actors")
+    @response_cache.invalidates("actors")
+    @object_cache.invalidates("actors", "index")
     def editActor(payload, index):
-        actor = Actor.query.get(index)
-        if actor is None:
-            abort(404)
-
-        data = request.json
+        values = validate_actor(request.get_json(silent=True), partial=True)
         error = False
-        body = {}
+        body = None
         try:
-            actor.name = data["name"]
-            actor.age = data["age"]
-            actor.gender = data["gender"]
-            actor.update()
-            body = actor.format()
+            body = update_row(Actor, ACTOR_FIELDS, index, values)
+            dbSessionCommit()
         except Exception:
             dbSessionRollback()
             error = True
@@ -251,9 +595,129 @@ def create_app(test_config=None):
 
         if error:
             abort(422)
+        elif body is None:
+            abort(404)
         else:
             return jsonify({"success": True, "actor": body}), 200
 
+    """
+    Bulk endpoints
+    - POST /movies/bulk, POST /actors/bulk: payload is a json array of items shaped like POST /movies, POST /actors
+    - PATCH /movies/bulk, PATCH /actors/bulk: payload is a json array of items with an "id" and the fields to change
+    - DELETE /movies/bulk, DELETE /actors/bulk: payload is a json array of ids
+    - require the same permission as the single item endpoint
+    - at most 10000 items per request, otherwise 400
+    - every item is validated before the database is touched; valid items are written in one transaction
+    - returns json with one result per item, in request order, and status code 200:
+      {"index": 0, "success": true, "id": 12} or {"index": 1, "success": false, "error": 400, "message": "..."}
+    """
+
+    @app.route("/movies/bulk", methods=["POST"])
+    @requires_auth("post:movies", cost=BULK_COST)
+    @response_cache.invalidates("movies")
+    def createMovies(payload):
+        return bulk_create(Movie, validate_movie)
+
+    @app.route("/actors/bulk", methods=["POST"])
+    @requires_auth("post:actors", cost=BULK_COST)
+    @response_cache.invalidates("actors")
+    def createActors(payload):
+        return bulk_create(Actor, validate_actor)
+
+    @app.route("/movies/bulk", methods=["PATCH"])
+    @requires_auth("patch:movies", cost=BULK_COST)
+    @response_cache.invalidates("movies")
+    def editMovies(payload):
+        return bulk_edit(Movie, validate_movie)
+
+    @app.route("/actors/bulk", methods=["PATCH"])
+    @requires_auth("patch:actors", cost=BULK_COST)
+    @response_cache.invalidates("actors")
+    def editActors(payload):
+        return bulk_edit(Actor, validate_actor)
+
+    @app.route("/movies/bulk", methods=["DELETE"])
+    @requires_auth("delete:movies", cost=BULK_COST)
+    @response_cache.invalidates("movies", "castings")
+    def deleteMovies(payload):
+        return bulk_remove(Movie)
+
+    @app.route("/actors/bulk", methods=["DELETE"])
+    @requires_auth("delete:actors", cost=BULK_COST)
+    @response_cache.invalidates("actors", "castings")
+    def deleteActors(payload):
+        return bulk_remove(Actor)
+
+    def bulk_create(model, validate):
+        valid, results = validate_items(validate)
+        ids = bulk_write(bulk_insert, model, [values for index, values in valid])
+        for (index, values), id in zip(valid, ids):
+            results[index] = {"index": index, "success": True, "id": id}
+        return json_response({"success": True, "results": results})
+
+    def bulk_edit(model, validate):
+        def validate_edit(item):
+            values = validate(item, partial=True)
+            values["id"] = validate_id(item.get("id"))
+            return values
+
+        valid, results = validate_items(validate_edit)
+        updated = bulk_write(bulk_update, model, [values for index, values in valid])
+        object_cache.invalidate(model.__tablename__, *updated)
+        for index, values in valid:
+            results[index] = item_result(index, values["id"], values["id"] in updated)
+        return json_response({"success": True, "results": results})
+
+    def bulk_remove(model):
+        valid, results = validate_items(validate_id)
+        deleted = bulk_write(bulk_delete, model, [id for index, id in valid])
+        object_cache.invalidate(model.__tablename__, *deleted)
+        for index, id in valid:
+            results[index] = item_result(index, id, id in deleted)
+        return json_response({"success": True, "results": results})
+
+    def validate_items(validate):
+        items = request.get_json(silent=True)
+        if not isinstance(items, list) or not 0 < len(items) <= BULK_MAX_ITEMS:
+            abort(400)
+
+        valid = []
+        results = [None] * len(items)
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, validate(item)))
+            except ValidationError as ex:
+                results[index] = {
+                    "index": index,
+                    "success": False,
+                    "error": 400,
+                    "message": str(ex),
+                    "errors": ex.errors,
+                }
+        return valid, results
+
+    def bulk_write(write, model, rows):
+        if not rows:
+            return []
+        error = False
+        try:
+            written = write(model, rows)
+            dbSessionCommit()
+        except Exception:
+            dbSessionRollback()
+            error = True
+            print(sys.exc_info())
+
+        if error:
+            abort(400)
+        else:
+            return written
+
+    def item_result(index, id, found):
+        if found:
+            return {"index": index, "success": True, "id": id}
+        return {"index": index, "success": False, "error": 404, "message": "Resource not found", "id": id}
+
     """
     Error handlers
     """
@@ -287,8 +751,20 @@ def create_app(test_config=None):
     def unprocessable(error):
         return jsonify({"success": False, "error": 422, "message": "Unprocessable"}), 422
 
+    @app.errorhandler(ValidationError)
+    def invalid_payload(ex):
+        return jsonify({"success": False, "error": 400, "message": "Bad Request", "errors": ex.errors}), 400
+
+    @app.errorhandler(RateLimitExceeded)
+    def too_many_requests(ex):
+        response = jsonify({"success": False, "error": 429, "message": "Too Many Requests"})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(ex.retry_after)
+        return response
+
     @app.errorhandler(AuthError)
     def handle_auth_error(ex):
+        AUTH_FAILURES.inc(ex.error.get("code", "unknown"))
         response = jsonify(ex.error)
         response.status_code = ex.status_code
         return response
@@ -296,7 +772,21 @@ def create_app(test_config=None):
     return app
 
 
-APP = create_app()
+"""
+APP
+The application served by gunicorn (app:APP) and asgi.py, created the first time it is
+imported rather than with this module, so importing app for create_app builds nothing
+(migration tooling is loaded by manage.py only)
+"""
+
+
+def __getattr__(name):
+    global APP
+    if name == "APP":
+        APP = create_app()
+        return APP
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
-    APP.run(host="0.0.0.0", port=8080, debug=True)
+    create_app().run(host="0.0.0.0", port=8080, debug=True)
@@ -0,0 +1,46 @@
+import os
+import sys
+from app import APP as FLASK_APP
+from auth.auth import key_store, warm_up as warm_up_auth
+from database.models import db
+from serving.asgi import AsgiBridge
+
+"""
+ASGI entry point
+- serves the same routes as app:APP, e.g. uvicorn asgi:APP --workers 2
+  or gunicorn asgi:APP -k uvicorn.workers.UvicornWorker
+- ASGI_THREADS: requests run at the same time per process
+  (default DB_POOL_SIZE + DB_MAX_OVERFLOW, one database connection each)
+- on startup the signing keys are fetched and a database connection is opened,
+  on shutdown the key refresh stops and the pool is closed
+"""
+
+
+def warm_up():
+    try:
+        warm_up_auth()
+        key_store.start_background_refresh()
+    except Exception:
+        # requests fetch the keys themselves once the JWKS endpoint answers
+        print(sys.exc_info())
+
+    try:
+        with FLASK_APP.app_context():
+            db.engine.connect().close()
+    except Exception:
+        print(sys.exc_info())
+
+
+def close():
+    key_store.stop_background_refresh()
+    with FLASK_APP.app_context():
+        db.engine.dispose()
+    replicas = FLASK_APP.extensions.get("replicas")
+    if replicas is not None:
+        replicas.dispose()
+
+
+pool_connections = int(os.getenv("DB_POOL_SIZE", "5")) + int(os.getenv("DB_MAX_OVERFLOW", "10"))
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", pool_connections))
+
+APP = AsgiBridge(FLASK_APP, threads=ASGI_THREADS, on_startup=[warm_up], on_shutdown=[close])
@@ -1,13 +1,68 @@
 import os
-from jose import jwt
+import time
+import importlib
 from flask import request
-from urllib.request import urlopen
-import json
 from functools import wraps
+from config import config
+from auth.jwks import JWKSKeyStore, fetch_jwks
+from auth.token_cache import TokenCache
+from auth.rate_limit import rate_limiter
+from monitoring.metrics import AUTH_DURATION
+
+"""
+Auth0 settings (AUTH0_DOMAIN, ALGORITHMS, API_AUDIENCE, JWKS_URL) come from config and are
+read when the first token is verified; the JWT library is imported then too (see warm_up)
+"""
+
+"""
+Process-wide JWKS key store
+- keys are fetched once, indexed by kid and refreshed in the background
+- set JWKS_URL to point at a local stand-in (e.g. file:///path/to/jwks.json)
+"""
+
+key_store = JWKSKeyStore(
+    lambda: config.jwks_url,
+    default_ttl=int(os.getenv("JWKS_TTL", "600")),
+    stale_ttl=int(os.getenv("JWKS_STALE_TTL", "3600")),
+    min_refetch_interval=int(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "30")),
+)
+
+"""
+Verified-token cache
+- repeated bearer tokens skip the RSA signature and claims check until they expire
+- entries signed with a key that rotates out of the JWKS are dropped
+- TOKEN_CACHE_SIZE=0 disables it
+"""
+
+token_cache = TokenCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
+key_store.add_listener(token_cache.invalidate_kids)
+
+"""
+Use_key_provider
+- input: fetcher(url, timeout) returning the JWKS body and headers, e.g. LocalKeys().fetcher
+  (see auth/local_keys.py); None goes back to fetching JWKS_URL
+- the key store loads its signing keys from the provider from now on;
+  the keys and verified tokens cached so far are dropped
+"""
+
+
+def use_key_provider(fetcher):
+    key_store.fetcher = fetcher or fetch_jwks
+    key_store.clear()
+    token_cache.clear()
+
+
+"""
+Warm_up
+- imports the JWT library and fetches the signing keys ahead of the first request,
+  e.g. once in a preloading server's master so the forked workers share both
+"""
+
+
+def warm_up():
+    importlib.import_module("jose.jwt")
+    key_store.refresh()
 
-AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN").replace("\r", "")
-ALGORITHMS = os.getenv("ALGORITHMS").replace("\r", "")
-API_AUDIENCE = os.getenv("API_AUDIENCE").replace("\r", "")
 
 """
 AuthError Exception 
@@ -39,9 +94,9 @@ def get_token_auth_header():
     header_parts = auth_header.split(" ")
 
     if len(header_parts) != 2:
-        AuthError({"code": "unauthorized", "message": "No Authorization header"}, 401)
-    elif header_parts[0].lower() == "bearer":
-        AuthError({"code": "unauthorized", "message": "Not bearer token"}, 401)
+        raise AuthError({"code": "unauthorized", "message": "No Authorization header"}, 401)
+    elif header_parts[0].lower() != "bearer":
+        raise AuthError({"code": "unauthorized", "message": "Not bearer token"}, 401)
 
     return header_parts[1]
 
@@ -49,29 +104,53 @@ def get_token_auth_header():
 """
 Check_permissions
 - inputs: 
-    1. permission: string permission (i.e., "post:movie")
+    1. permission: string permission (i.e., "post:movie") or a collection of them
     2. payload: decoded jwt payload
+    3. permissions: optional frozenset of the payload permissions, as cached with the token
+    4. any_of: if true one of the requested permissions is enough, otherwise all are needed
 - raises AuthError if permissions not included in the payload
 - raises AuthError if requested permission string is not in the payload permission array
 - return true otherwise
 """
 
 
-def check_permissions(permission, payload):
+def check_permissions(permission, payload, permissions=None, any_of=False):
     if "permissions" not in payload:
         raise AuthError({"code": "invalid_claims", "message": "Permissions not included in JWT"}, 400)
 
-    if permission not in payload["permissions"]:
+    if permissions is None:
+        permissions = permission_set(payload)
+    required = (permission,) if isinstance(permission, str) else permission
+
+    if any_of:
+        allowed = not required or not permissions.isdisjoint(required)
+    else:
+        allowed = permissions.issuperset(required)
+
+    if not allowed:
         raise AuthError({"code": "unauthorized", "message": "Permission not found"}, 403)
 
     return True
 
 
+"""
+Permission_set
+- input: decoded jwt payload
+- return the payload permissions as a frozenset (empty if the claim is missing)
+"""
+
+
+def permission_set(payload):
+    return frozenset(payload.get("permissions") or ())
+
+
 """
 Verify_decode_jwt
 - input: a json web token (string)
+- return the cached payload if the token was already verified and has not expired
+  (verify_token also returns the permission set cached with it)
 - verify that the input should be an Auth0 token with kid
-- verify the token using Auth0 /.well-known/jwks.json
+- verify the token using the signing key from the cached Auth0 /.well-known/jwks.json
 - decode the payload from the token
 - validate the claims
 - return decoded payload
@@ -79,25 +158,44 @@ Verify_decode_jwt
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
-    jwks = json.loads(jsonurl.read())
+    return verify_token(token)[0]
+
+
+def verify_token(token):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
 
-    unverified_header = jwt.get_unverified_header(token)
+    from jose import jwt, JWTError
+
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except JWTError:
+        raise AuthError({"code": "invalid_header", "message": "Authorization malformed"}, 401)
 
     rsa_key = {}
     if "kid" not in unverified_header:
         raise AuthError({"code": "invalid_header", "message": "Authorization malformed"}, 401)
 
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {"kty": key["kty"], "kid": key["kid"], "use": key["use"], "n": key["n"], "e": key["e"]}
+    start = time.perf_counter()
+    key = key_store.get_key(unverified_header["kid"])
+    AUTH_DURATION.observe(time.perf_counter() - start, "jwks")
+    if key is not None:
+        rsa_key = {"kty": key["kty"], "kid": key["kid"], "use": key["use"], "n": key["n"], "e": key["e"]}
 
     if rsa_key:
+        start = time.perf_counter()
         try:
             payload = jwt.decode(
-                token, rsa_key, algorithms=ALGORITHMS, audience=API_AUDIENCE, issuer="https://" + AUTH0_DOMAIN + "/"
+                token,
+                rsa_key,
+                algorithms=config.algorithms,
+                audience=config.api_audience,
+                issuer="https://" + config.auth0_domain + "/",
             )
-            return payload
+            permissions = permission_set(payload)
+            token_cache.put(token, payload, rsa_key["kid"], permissions)
+            return payload, permissions
 
         except jwt.ExpiredSignatureError:
             raise AuthError({"code": "token_expired", "message": "Token expired"}, 401)
@@ -110,26 +208,38 @@ def verify_decode_jwt(token):
 
         except Exception:
             raise AuthError({"code": "invalid_header", "message": "Unable to parse authentication token"}, 400)
+
+        finally:
+            AUTH_DURATION.observe(time.perf_counter() - start, "decode")
     raise AuthError({"code": "invalid_header", "message": "Unable to find the appropriate key."}, 400)
 
 
 """
-@requires_auth(permission)
-- Input: permission (string. eg. "post:movie")
+@requires_auth(*permissions, any_of=False, cost=None)
+- Input: permissions (strings. eg. "post:movie"); several may be given
+- any_of: if true the caller needs one of the permissions, otherwise all of them
+- cost: tokens the request takes from the caller's rate limit bucket
+  (default: the cost of the permissions, see auth/rate_limit.py)
 - call the get_token_auth_header method to get the token
-- call verify_decode_jwt method to decode the jwt
-- call check_permissions method to validate claims and check requested permission
+- call verify_token method to decode the jwt and get its cached permission set
+- call check_permissions method to validate claims and check requested permissions
+- call rate_limiter.admit to charge the request to the token's sub, raises RateLimitExceeded
 - return decorator which passes the decoded payload to the decorated method
 """
 
 
-def requires_auth(permission=""):
+def requires_auth(*permissions, any_of=False, cost=None):
+    required = frozenset(permissions)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
+            start = time.perf_counter()
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
+            AUTH_DURATION.observe(time.perf_counter() - start, "header")
+            payload, granted = verify_token(token)
+            check_permissions(required, payload, granted, any_of)
+            rate_limiter.admit(payload, required, cost)
             return f(payload, *args, **kwargs)
 
         return wrapper
@@ -0,0 +1,205 @@
+import re
+import sys
+import json
+import time
+import threading
+from urllib.request import urlopen
+
+"""
+JWKSKeyStore
+A process-wide store of the signing keys published at a JWKS url, indexed by kid.
+- url: where the key set is published. Any url urlopen understands works, so a
+  local stand-in can be used with file:///path/to/jwks.json or http://localhost:port/;
+  a callable returning the url is called on every fetch instead
+- default_ttl: seconds a fetched key set is fresh when the response has no Cache-Control max-age
+- stale_ttl: seconds past expiry during which the old keys are still served
+  while a refresh runs in the background (stale-while-revalidate)
+- min_refetch_interval: minimum seconds between refetches triggered by an unknown kid,
+  so a flood of tokens with made-up kids cannot hammer the JWKS endpoint
+- fetch_timeout: seconds before a fetch of the key set is abandoned
+- fetcher: optional callable(url, timeout) returning (body, headers), used instead of urlopen
+"""
+
+
+class JWKSKeyStore:
+    def __init__(
+        self,
+        url,
+        default_ttl=600,
+        stale_ttl=3600,
+        min_refetch_interval=30,
+        fetch_timeout=5,
+        fetcher=None,
+    ):
+        self.url = url
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.fetch_timeout = fetch_timeout
+        self.fetcher = fetcher or fetch_jwks
+
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._generation = 0
+        self._attempts = 0
+        self._listeners = []
+
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    """
+    get_key(kid)
+    - returns the JWK dict for kid, or None if the key set does not contain it
+    - loads the key set on first use and starts the background refresh
+    - serves expired keys within the stale window and refreshes them asynchronously
+    - refetches once (single-flight, rate limited) when kid is unknown
+    """
+
+    def get_key(self, kid):
+        now = time.monotonic()
+        if self._generation == 0 or now >= self._expires_at + self.stale_ttl:
+            self.refresh()
+            self.start_background_refresh()
+        elif now >= self._expires_at:
+            self._refresh_async()
+
+        attempts = self._attempts
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._fetched_at >= self.min_refetch_interval:
+            self.refresh(attempts)
+            key = self._keys.get(kid)
+        return key
+
+    """
+    refresh()
+    - fetches the key set and swaps it in atomically
+    - concurrent callers share a single fetch: whoever waits on an in-flight fetch
+      returns once it completes instead of fetching again
+    - attempts: the fetch counter the caller observed, defaults to the current one
+    - raises the fetch error if there are no keys at all to fall back on
+    """
+
+    def refresh(self, attempts=None):
+        if attempts is None:
+            attempts = self._attempts
+        with self._fetch_lock:
+            if self._attempts != attempts and self._keys:
+                return
+            generation = self._generation
+            try:
+                url = self.url() if callable(self.url) else self.url
+                body, headers = self.fetcher(url, self.fetch_timeout)
+                jwks = json.loads(body)
+                keys = {key["kid"]: key for key in jwks["keys"] if "kid" in key}
+            except Exception:
+                self._attempts += 1
+                print(sys.exc_info())
+                if not self._keys:
+                    raise
+                # keep serving what we have and retry no sooner than min_refetch_interval
+                self._fetched_at = time.monotonic()
+                return
+
+            now = time.monotonic()
+            with self._lock:
+                rotated = {kid for kid, key in self._keys.items() if keys.get(kid) != key}
+                changed = rotated or set(keys) != set(self._keys)
+                self._keys = keys
+                self._fetched_at = now
+                self._expires_at = now + _max_age(headers, self.default_ttl)
+                self._generation += 1
+                self._attempts += 1
+
+            if changed and generation:
+                for listener in list(self._listeners):
+                    listener(rotated)
+
+    """
+    add_listener(callback)
+    - callback(rotated_kids) is called after a refresh that changed the key set,
+      with the kids that were removed or now map to a different key
+    """
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def start_background_refresh(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+            self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+
+    def clear(self):
+        with self._fetch_lock, self._lock:
+            self._keys = {}
+            self._fetched_at = 0.0
+            self._expires_at = 0.0
+            self._generation = 0
+
+    def _run(self):
+        while True:
+            # refresh a little ahead of expiry so requests never see stale keys,
+            # and back off to min_refetch_interval while the endpoint is failing
+            remaining = self._expires_at - time.monotonic()
+            wait = max(remaining * 0.9 if remaining > 0 else self.min_refetch_interval, 1.0)
+            if self._stop.wait(wait):
+                return
+            try:
+                self.refresh()
+            except Exception:
+                print(sys.exc_info())
+
+    def _refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                print(sys.exc_info())
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="jwks-revalidate", daemon=True).start()
+
+
+"""
+fetch_jwks(url, timeout)
+- default fetcher: reads url with urlopen
+- returns the response body and headers (headers is empty for file:// urls)
+"""
+
+
+def fetch_jwks(url, timeout):
+    with urlopen(url, timeout=timeout) as response:
+        return response.read(), response.headers or {}
+
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def _max_age(headers, default):
+    cache_control = headers.get("Cache-Control") if headers else None
+    if cache_control:
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            return 0
+        match = _MAX_AGE.search(cache_control)
+        if match:
+            return int(match.group(1))
+    return default
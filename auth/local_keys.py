@@ -0,0 +1,135 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import config
+
+"""
+LocalKeys
+An RSA signing key and the JWKS publishing it, kept in memory, standing in for Auth0
+in tests and benchmarks: no Auth0 tenant, real tokens or network access needed.
+- issuer, audience: claims of the minted tokens; default to the ones auth/auth.py verifies
+- kid: key id of the first key
+- install() makes the process-wide key store read the keys from here
+- serve() publishes the JWKS over HTTP for servers running in other processes
+"""
+
+
+class LocalKeys:
+    def __init__(self, issuer=None, audience=None, kid="local", algorithm="RS256", bits=2048):
+        self.issuer = issuer
+        self.audience = audience
+        self.algorithm = algorithm
+        self.bits = bits
+        self._keys = {}
+        self._server = None
+        self.kid = None
+        self.rotate(kid)
+
+    """
+    rotate(kid, keep)
+    - generates a new key that signs the tokens minted from now on
+    - keep: also publish the previous keys, so the tokens they signed still verify
+    - return the kid of the new key
+    """
+
+    def rotate(self, kid=None, keep=False):
+        from Crypto.PublicKey import RSA
+        from jose import jwk
+
+        kid = kid or f"local-{len(self._keys) + 1}"
+        key = RSA.generate(self.bits)
+        public = jwk.construct(key.publickey().export_key().decode(), self.algorithm).to_dict()
+        public.update(kid=kid, use="sig", alg=self.algorithm)
+        keys = self._keys if keep else {}
+        keys[kid] = (key.export_key().decode(), public)
+        self._keys = keys
+        self.kid = kid
+        return kid
+
+    def jwks(self):
+        return {"keys": [public for private, public in self._keys.values()]}
+
+    """
+    fetcher(url, timeout)
+    - JWKSKeyStore fetcher serving the JWKS from memory, the url is ignored
+    """
+
+    def fetcher(self, url, timeout):
+        return json.dumps(self.jwks()), {}
+
+    """
+    token(permissions, sub, expires_in, kid, headers, **claims)
+    - return a signed JWT carrying permissions, expiring expires_in seconds from now
+      (negative for an expired token)
+    - kid: sign with a published key other than the current one
+    - claims override or add to the standard ones, e.g. aud="someone-else"
+    """
+
+    def token(self, permissions=(), sub="local-user", expires_in=3600, kid=None, headers=None, **claims):
+        from jose import jwt
+
+        kid = kid or self.kid
+        now = int(time.time())
+        body = {
+            "iss": self.issuer or "https://" + config.auth0_domain + "/",
+            "aud": self.audience or config.api_audience,
+            "sub": sub,
+            "iat": now,
+            "exp": now + expires_in,
+            "permissions": list(permissions),
+        }
+        body.update(claims)
+        headers = dict(headers or {}, kid=kid)
+        return jwt.encode(body, self._keys[kid][0], algorithm=self.algorithm, headers=headers)
+
+    """
+    install()
+    - points the key store of auth/auth.py at these keys and forgets the keys and tokens it cached
+    - return self
+    """
+
+    def install(self):
+        _auth().use_key_provider(self.fetcher)
+        return self
+
+    """
+    serve(host, port)
+    - serves the JWKS over HTTP from a background thread, on a free port by default
+    - return the url to use as JWKS_URL
+    """
+
+    def serve(self, host="127.0.0.1", port=0):
+        if self._server is None:
+            keys = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = json.dumps(keys.jwks()).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="local-jwks", daemon=True).start()
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/.well-known/jwks.json"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _auth():
+    # auth/auth.py imports Flask, only import it once the caller installs the keys
+    from auth import auth
+
+    return auth
@@ -0,0 +1,208 @@
+import os
+import sys
+import math
+import time
+import threading
+from collections import OrderedDict
+from flask import has_request_context, request
+from monitoring.metrics import Counter
+
+"""
+Per-client rate limiting
+Every authenticated request takes tokens from a bucket keyed by the JWT sub claim; a bucket
+holds up to burst tokens and refills at rate tokens per second. A request finding too few
+tokens is rejected with 429 and a Retry-After header, before its view touches the database.
+- the cost of a request is the cost given to @requires_auth, otherwise the highest cost of the
+  permissions it requires (costs), otherwise PERMISSION_COSTS of their verb
+- a request costing more than burst is charged burst, so it is still served once the bucket is full
+"""
+
+PERMISSION_COSTS = {"get": 1, "post": 2, "patch": 2, "delete": 2}
+
+RATE_LIMITED = Counter("rate_limited_total", "Requests rejected with 429, by route pattern", ("route",))
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+
+"""
+MemoryBuckets
+In-process token buckets. Each process has its own, so with several workers a client
+can send up to workers * rate requests per second.
+- maxsize: number of buckets kept before the least recently used one is dropped
+  (a dropped bucket starts full again)
+"""
+
+
+class MemoryBuckets:
+    def __init__(self, maxsize=100000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    """
+    take(key, cost, rate, burst)
+    - takes cost tokens from the bucket of key if it holds that many
+    - return 0 when they were taken, otherwise the seconds until the bucket holds enough
+    """
+
+    def take(self, key, cost, rate, burst):
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+"""
+Token bucket update run atomically by the shared store, on its own clock
+- KEYS[1]: bucket key, ARGV: rate, burst, cost
+- returns the seconds to wait as a string (0 when the tokens were taken)
+"""
+
+TOKEN_BUCKET_SCRIPT = """
+redis.replicate_commands()
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = burst
+if bucket[1] then
+    tokens = math.min(burst, tonumber(bucket[1]) + math.max(now - tonumber(bucket[2]), 0) * rate)
+end
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+"""
+SharedBuckets
+Token buckets shared by every worker, on top of a Redis-compatible client.
+- client: anything implementing register_script(script) returning a callable(keys, args),
+  e.g. redis.Redis or a local in-memory stand-in
+- prefix: namespace of the bucket keys; idle buckets expire once they would be full again
+- when the store is unreachable requests are let through rather than failed
+"""
+
+
+class SharedBuckets:
+    def __init__(self, client, prefix="casting:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, cost, rate, burst):
+        try:
+            return float(self.script(keys=[self.prefix + key], args=[rate, burst, cost]))
+        except Exception:
+            print(sys.exc_info())
+            return 0.0
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+
+"""
+RateLimiter
+- rate: tokens added to each bucket per second (0 disables rate limiting)
+- burst: size of the buckets, the cost a client can spend at once after being idle (default 10 * rate)
+- costs: cost of a request requiring a permission, by permission (e.g. "get:actors") or verb ("get")
+- backend: MemoryBuckets (default) or SharedBuckets
+"""
+
+
+class RateLimiter:
+    def __init__(self, rate=0.0, burst=None, costs=None, backend=None):
+        self.rate = rate
+        self.burst = burst or rate * 10
+        self.costs = dict(PERMISSION_COSTS, **(costs or {}))
+        self.backend = backend or MemoryBuckets()
+        self._permission_costs = {}
+
+    @classmethod
+    def from_env(cls):
+        backend = None
+        if os.getenv("RATE_LIMIT_URL"):
+            backend = SharedBuckets.from_url(os.getenv("RATE_LIMIT_URL"))
+        return cls(
+            rate=float(os.getenv("RATE_LIMIT_RATE", "0")),
+            burst=float(os.getenv("RATE_LIMIT_BURST", "0")),
+            costs=parse_costs(os.getenv("RATE_LIMIT_COSTS", "")),
+            backend=backend or MemoryBuckets(maxsize=int(os.getenv("RATE_LIMIT_SIZE", "100000"))),
+        )
+
+    """
+    admit(payload, permissions, cost)
+    - charges the request to the bucket of the payload sub
+    - raises RateLimitExceeded with the seconds to wait when the bucket is short of tokens
+    """
+
+    def admit(self, payload, permissions=(), cost=None):
+        if not self.rate:
+            return
+        if cost is None:
+            cost = self.cost(permissions)
+        wait = self.backend.take(str(payload.get("sub")), min(cost, self.burst), self.rate, self.burst)
+        if wait:
+            route = request.url_rule.rule if has_request_context() and request.url_rule else "none"
+            RATE_LIMITED.inc(route)
+            raise RateLimitExceeded(max(math.ceil(wait), 1))
+
+    def cost(self, permissions):
+        cost = self._permission_costs.get(permissions)
+        if cost is None:
+            costs = [self.costs.get(p, self.costs.get(p.split(":")[0], 1)) for p in permissions]
+            cost = self._permission_costs[permissions] = max(costs, default=1)
+        return cost
+
+
+"""
+Parse_costs
+- input: "permission=cost" pairs separated by commas, e.g. "get:actors=2,delete=5"
+- return dict of permission or verb to cost
+"""
+
+
+def parse_costs(value):
+    costs = {}
+    for pair in value.split(","):
+        if pair.strip():
+            name, _, cost = pair.partition("=")
+            costs[name.strip()] = float(cost)
+    return costs
+
+
+"""
+Process-wide rate limiter
+- RATE_LIMIT_RATE: tokens per second refilled in the bucket of each client (default 0, disabled)
+- RATE_LIMIT_BURST: size of the buckets (default 10 * RATE_LIMIT_RATE)
+- RATE_LIMIT_COSTS: cost overrides by permission or verb, e.g. "get:actors=2,delete=5"
+- RATE_LIMIT_SIZE: buckets kept by the in-process backend (default 100000)
+- RATE_LIMIT_URL: redis:// url of buckets shared by every worker, used instead of the in-process ones
+"""
+
+rate_limiter = RateLimiter.from_env()
@@ -0,0 +1,113 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+"""
+TokenCache
+A bounded LRU of bearer tokens that already passed signature and claims verification.
+- entries are keyed by the sha256 of the token, so raw tokens are never held in memory
+- an entry lives until the token's exp claim; tokens without exp are not cached
+- maxsize: number of entries kept before the least recently used one is evicted (0 disables caching)
+- clock: callable returning the current unix time, used to compare against exp
+"""
+
+
+class TokenCache:
+    def __init__(self, maxsize=10000, clock=time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    """
+    get(token)
+    - returns the cached (payload, permissions) for token, or None on a miss
+    - expired entries are dropped and count as a miss
+    """
+
+    def get(self, token):
+        key = _token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, kid, exp, permissions = entry
+            if exp <= self.clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload, permissions
+
+    """
+    put(token, payload, kid, permissions)
+    - caches the payload of a verified token signed with key kid,
+      together with its permissions precompiled into a frozenset
+    - evicts the least recently used entries beyond maxsize
+    """
+
+    def put(self, token, payload, kid, permissions=frozenset()):
+        exp = payload.get("exp")
+        if not self.maxsize or not isinstance(exp, (int, float)) or exp <= self.clock():
+            return
+        key = _token_key(token)
+        with self._lock:
+            self._entries[key] = (payload, kid, exp, permissions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    """
+    invalidate_kids(kids)
+    - drops every entry verified with one of the given signing keys
+    - registered as a JWKSKeyStore listener so rotated keys stop being trusted
+    """
+
+    def invalidate_kids(self, kids):
+        if not kids:
+            return
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] in kids]:
+                del self._entries[key]
+
+    """
+    purge_expired()
+    - drops every entry whose token has expired, returns how many were dropped
+    """
+
+    def purge_expired(self):
+        now = self.clock()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[2] <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _token_key(token):
+    return hashlib.sha256(token.encode()).digest()
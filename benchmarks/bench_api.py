@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import platform
+import subprocess
+from datetime import date, datetime, timedelta, timezone
+
+from common import local_auth, make_app, percentile
+
+"""
+Benchmark suite: every route of app.py, at several table sizes
+- seeds SIZE movies and SIZE actors with 3 castings per movie, on a fresh SQLite file or on the
+  Postgres database of BENCH_DATABASE_URL (its tables are dropped and recreated)
+- signs tokens with a local JWKS (see common.local_auth), no Auth0 or network access needed
+- sends --requests requests per route through the Flask test client, one at a time, response and
+  object caches off (--cache to keep them on); writes and deletes get ids created for them before the clock starts
+- records requests/s, p50 and p99 latency and the status codes of each route in a JSON file,
+  compare two of them with benchmarks/compare.py
+- routes of app.py without a scenario here are listed under "unmeasured"
+- usage: python benchmarks/bench_api.py [--sizes 1000 10000] [--requests 200] [--output FILE] [--cache]
+"""
+
+CASTINGS_PER_MOVIE = 3
+BULK_ITEMS = 10
+EXPORT_FRACTION = 10
+
+
+def seed(db, Movie, Actor, Casting, size):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(
+        Movie.__table__.insert(),
+        [{"title": f"Movie {i}", "release_date": date(1980, 1, 1) + timedelta(days=i % 15000)} for i in range(size)],
+    )
+    db.session.execute(
+        Actor.__table__.insert(), [{"name": f"Actor {i}", "age": 20 + i % 60, "gender": "Female"} for i in range(size)]
+    )
+    db.session.execute(
+        Casting.__table__.insert(),
+        [
+            {"movie_id": m, "actor_id": (m * 7 + k) % size + 1, "role": f"Role {k}"}
+            for m in range(1, size + 1)
+            for k in range(CASTINGS_PER_MOVIE)
+        ],
+    )
+    db.session.commit()
+    if db.engine.dialect.name == "postgresql":
+        # fresh tables have no planner statistics until autovacuum gets to them, which made runs vary
+        db.session.execute("ANALYZE")
+        db.session.commit()
+
+
+def new_movies(db, Movie, n):
+    rows = [{"title": f"Bench movie {i}", "release_date": date(2000, 1, 1)} for i in range(n)]
+    db.session.execute(Movie.__table__.insert(), rows)
+    db.session.commit()
+    return [id for id, in db.session.query(Movie.id).order_by(Movie.id.desc()).limit(n)]
+
+
+def new_actors(db, Actor, n):
+    rows = [{"name": f"Bench actor {i}", "age": 30, "gender": "Female"} for i in range(n)]
+    db.session.execute(Actor.__table__.insert(), rows)
+    db.session.commit()
+    return [id for id, in db.session.query(Actor.id).order_by(Actor.id.desc()).limit(n)]
+
+
+"""
+Scenarios
+- one per route and method: (method, rule, requests) where requests is a list of n (path, json body)
+- the rows a request changes or deletes are created here, outside of the timed loop
+"""
+
+
+def scenarios(db, models, size, n):
+    Movie, Actor, Casting = models
+    ids = [i % size + 1 for i in range(n)]
+    movie = {"title": "Bench movie", "release_date": "2001-02-03"}
+    actor = {"name": "Bench actor", "age": 40, "gender": "Male"}
+
+    yield "GET", "/health", [("/health", None)] * n
+    yield "GET", "/metrics", [("/metrics", None)] * n
+    yield "GET", "/movies", [(f"/movies?limit=50&cursor={i * 50 % size}", None) for i in range(n)]
+    yield "GET", "/actors", [(f"/actors?limit=50&cursor={i * 50 % size}", None) for i in range(n)]
+    yield "GET", "/movies/<int:movie_id>", [(f"/movies/{id}", None) for id in ids]
+    yield "GET", "/actors/<int:actor_id>", [(f"/actors/{id}", None) for id in ids]
+    yield "GET", "/movies/<int:movie_id>/actors", [(f"/movies/{id}/actors", None) for id in ids]
+    yield "GET", "/actors/<int:actor_id>/movies", [(f"/actors/{id}/movies", None) for id in ids]
+    yield "GET", "/search", [(f"/search?q=movie {id}", None) for id in ids]
+    # an export reads the whole table, fewer of them keep the run short at large sizes
+    yield "GET", "/movies/export", [("/movies/export", None)] * max(n // EXPORT_FRACTION, 1)
+    yield "GET", "/actors/export", [("/actors/export?format=json", None)] * max(n // EXPORT_FRACTION, 1)
+
+    yield "POST", "/movies", [("/movies", movie)] * n
+    yield "POST", "/actors", [("/actors", actor)] * n
+    yield "PATCH", "/movies/<int:index>", [(f"/movies/{id}", movie) for id in ids]
+    yield "PATCH", "/actors/<int:index>", [(f"/actors/{id}", actor) for id in ids]
+    yield "POST", "/movies/bulk", [("/movies/bulk", [movie] * BULK_ITEMS)] * n
+    yield "POST", "/actors/bulk", [("/actors/bulk", [actor] * BULK_ITEMS)] * n
+    chunks = [[(i * BULK_ITEMS + k) % size + 1 for k in range(BULK_ITEMS)] for i in range(n)]
+    yield "PATCH", "/movies/bulk", [("/movies/bulk", [{"id": id, "title": "Edited"} for id in c]) for c in chunks]
+    yield "PATCH", "/actors/bulk", [("/actors/bulk", [{"id": id, "age": 41} for id in c]) for c in chunks]
+
+    movies, actors = new_movies(db, Movie, n), new_actors(db, Actor, n)
+    casts = [(f"/movies/{m}/actors", {"actor_id": a, "role": "Bench role"}) for m, a in zip(movies, actors)]
+    yield "POST", "/movies/<int:movie_id>/actors", casts
+    yield "DELETE", "/movies/<int:movie_id>/actors/<int:actor_id>", [
+        (f"/movies/{m}/actors/{a}", None) for m, a in zip(movies, actors)
+    ]
+    yield "DELETE", "/movies/<movie_id>", [(f"/movies/{id}", None) for id in movies]
+    yield "DELETE", "/actors/<actor_id>", [(f"/actors/{id}", None) for id in actors]
+
+    movies, actors = new_movies(db, Movie, n * BULK_ITEMS), new_actors(db, Actor, n * BULK_ITEMS)
+    starts = range(0, n * BULK_ITEMS, BULK_ITEMS)
+    yield "DELETE", "/movies/bulk", [("/movies/bulk", movies[i : i + BULK_ITEMS]) for i in starts]
+    yield "DELETE", "/actors/bulk", [("/actors/bulk", actors[i : i + BULK_ITEMS]) for i in starts]
+
+
+def measure(client, headers, method, requests):
+    samples, statuses = [], {}
+    start = time.perf_counter()
+    for path, body in requests:
+        began = time.perf_counter()
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        samples.append(time.perf_counter() - began)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    elapsed = time.perf_counter() - start
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "path": requests[0][0],
+        "requests": len(requests),
+        "rps": round(len(requests) / elapsed, 1),
+        "p50_ms": round(percentile(samples, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "errors": errors,
+        "statuses": statuses,
+    }
+
+
+def routes(app):
+    return {
+        f"{method} {rule.rule}"
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != "static"
+        for method in rule.methods - {"HEAD", "OPTIONS"}
+    }
+
+
+def git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every route of app.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and size")
+    parser.add_argument("--output", help="JSON file, default bench_api_<commit>_<database>.json")
+    parser.add_argument("--cache", action="store_true", help="keep the response and object caches on")
+    args = parser.parse_args()
+
+    token = local_auth()
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        os.environ["DATABASE_URL"] = url
+        from app import create_app
+
+        app = create_app()
+    else:
+        app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_api.db"))
+    from database.models import db, Movie, Actor, Casting
+    from cache.response_cache import response_cache
+    from cache.object_cache import object_cache
+
+    if not args.cache:
+        response_cache.ttl = object_cache.ttl = 0
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + token()}
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": None,
+        "caches": args.cache,
+        "requests_per_route": args.requests,
+        "sizes": {},
+        "unmeasured": [],
+    }
+    measured = set()
+    print(f"{'size':>7} {'route':<52} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for size in args.sizes:
+        results = report["sizes"][str(size)] = {}
+        with app.app_context():
+            report["database"] = db.engine.url.get_backend_name()
+            seed(db, Movie, Actor, Casting, size)
+            for method, rule, requests in scenarios(db, (Movie, Actor, Casting), size, args.requests):
+                name = f"{method} {rule}"
+                result = results[name] = measure(client, headers, method, requests)
+                measured.add(name)
+                print(
+                    f"{size:>7} {name:<52} {result['rps']:>8.0f} {result['p50_ms']:>8.2f} "
+                    f"{result['p99_ms']:>8.2f} {result['errors']:>6}"
+                )
+                db.session.remove()
+
+    report["unmeasured"] = sorted(routes(app) - measured)
+    for name in report["unmeasured"]:
+        print(f"no scenario for {name}", file=sys.stderr)
+
+    output = args.output or f"bench_api_{report['commit'] or 'unknown'}_{report['database']}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import date, timedelta
+
+from common import local_auth, make_app, free_port, start_server, load
+
+"""
+Load test: the WSGI deployment (gunicorn sync workers, app:APP) against the ASGI one
+(gunicorn with uvicorn workers, asgi:APP), same number of processes, same SQLite catalog
+- busy: CONNECTIONS clients send GET /movies?limit=50 back to back over keep-alive connections
+- idle: IDLE_CONNECTIONS connections are opened and left silent (slow or idle clients),
+  while 20 clients send requests
+- reports requests per second, latency percentiles and failed requests (errors or no answer in 10s)
+- usage: python benchmarks/bench_asgi.py [workers] [connections] [idle connections] [seconds]
+  (default 2 1000 1000 10)
+"""
+
+ROUTE = "/movies?limit=50"
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    idle = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 10
+
+    token = local_auth()
+    make_app(os.path.join(tempfile.gettempdir(), "casting_bench_asgi.db"))
+    from database.models import db, Movie
+    from app import APP
+
+    with APP.app_context():
+        rows = [{"title": f"Movie {i}", "release_date": date(1980, 1, 1) + timedelta(days=i)} for i in range(10000)]
+        db.session.execute(Movie.__table__.insert(), rows)
+        db.session.commit()
+
+    # every request reaches the database, as on a cold or frequently written catalog
+    env = dict(os.environ, RESPONSE_CACHE_TTL="0")
+    headers = f"Authorization: Bearer {token()}\r\n"
+    servers = {
+        "wsgi": ["gunicorn", "app:APP", "-w", str(workers)],
+        "asgi": ["gunicorn", "asgi:APP", "-w", str(workers), "-k", "uvicorn.workers.UvicornWorker"],
+    }
+    scenarios = {"busy": (connections, 0), "idle": (20, idle)}
+
+    print(f"{workers} processes per server, {seconds:.0f}s per run")
+    print(f"{'server':>6} {'scenario':>9} {'clients':>8} {'idle':>6}", end=" ")
+    print(f"{'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} failed")
+    for name, command in servers.items():
+        port = free_port()
+        bin_dir = os.path.dirname(sys.executable)
+        process = start_server([os.path.join(bin_dir, command[0]), *command[1:], "-b", f"127.0.0.1:{port}"], port, env)
+        try:
+            for scenario, (clients, idle_connections) in scenarios.items():
+                rate, p50, p99, failed = asyncio.run(load(port, ROUTE, headers, clients, idle_connections, seconds))
+                print(
+                    f"{name:>6} {scenario:>9} {clients:>8} {idle_connections:>6} {rate:>8.0f} "
+                    f"{p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {failed:>6}"
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
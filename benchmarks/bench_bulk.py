@@ -0,0 +1,64 @@
+import os
+import time
+import tempfile
+
+from common import local_auth, make_app
+
+"""
+Benchmark: bulk endpoints against the single item endpoints
+- creates, updates and deletes N actors one request at a time, then with one bulk request each
+- runs in-process through the Flask test client on a SQLite file
+- usage: python benchmarks/bench_bulk.py
+"""
+
+
+def run(client, headers, n):
+    results = {}
+
+    start = time.perf_counter()
+    ids = []
+    for i in range(n):
+        res = client.post("/actors", json={"name": f"Actor {i}", "age": 30, "gender": "Female"}, headers=headers)
+        ids.append(res.get_json()["id"])
+    results["create single"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for id in ids:
+        client.patch(f"/actors/{id}", json={"name": "Edited", "age": 31, "gender": "Female"}, headers=headers)
+    results["update single"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for id in ids:
+        client.delete(f"/actors/{id}", headers=headers)
+    results["delete single"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    items = [{"name": f"Actor {i}", "age": 30, "gender": "Female"} for i in range(n)]
+    ids = [item["id"] for item in client.post("/actors/bulk", json=items, headers=headers).get_json()["results"]]
+    results["create bulk"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.patch("/actors/bulk", json=[{"id": id, "name": "Edited", "age": 31} for id in ids], headers=headers)
+    results["update bulk"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.delete("/actors/bulk", json=ids, headers=headers)
+    results["delete bulk"] = time.perf_counter() - start
+
+    return results
+
+
+def main():
+    token = local_auth()
+    app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_bulk.db"))
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + token()}
+
+    print(f"{'items':>6} {'operation':>14} {'seconds':>8} {'items/s':>10}")
+    for n in (100, 1000, 5000):
+        for operation, seconds in run(client, headers, n).items():
+            print(f"{n:>6} {operation:>14} {seconds:>8.3f} {n / seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
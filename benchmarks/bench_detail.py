@@ -0,0 +1,79 @@
+import os
+import time
+import random
+import tempfile
+from datetime import date, timedelta
+
+from common import local_auth, make_app, percentile
+
+"""
+Benchmark: fetching one movie by id
+- detail, cached: GET /movies/<id> with the object cache warm
+- detail, uncached: GET /movies/<id> with the object cache off, one primary key lookup
+- list scan: what clients did before the detail endpoint, paging through GET /movies?limit=1000
+  until the movie shows up
+- seeds 10000 movies on a SQLite file, response cache off, random ids
+- usage: python benchmarks/bench_detail.py
+"""
+
+ROWS = 10000
+REQUESTS = 2000
+
+
+def fetch_detail(client, headers, id):
+    return client.get(f"/movies/{id}", headers=headers).get_json()["movie"]
+
+
+def fetch_by_scan(client, headers, id):
+    cursor = ""
+    while True:
+        data = client.get(f"/movies?limit=1000{cursor}", headers=headers).get_json()
+        for movie in data["movies"]:
+            if movie["id"] == id:
+                return movie
+        cursor = f"&cursor={data['next_cursor']}"
+
+
+def run(fetch, client, headers, ids):
+    samples = []
+    for id in ids:
+        start = time.perf_counter()
+        fetch(client, headers, id)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    token = local_auth()
+    app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_detail.db"))
+    from database.models import db, Movie
+    from cache.response_cache import response_cache
+    from cache.object_cache import object_cache
+
+    with app.app_context():
+        rows = [{"title": f"Movie {i}", "release_date": date(1980, 1, 1) + timedelta(days=i)} for i in range(ROWS)]
+        db.session.execute(Movie.__table__.insert(), rows)
+        db.session.commit()
+
+    response_cache.ttl = 0
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + token()}
+    random.seed(1)
+    ids = [random.randint(1, ROWS) for _ in range(REQUESTS)]
+
+    object_cache.ttl = 30
+    run(fetch_detail, client, headers, ids)
+    results = {"detail, cached": run(fetch_detail, client, headers, ids)}
+    object_cache.ttl = 0
+    object_cache.clear()
+    results["detail, uncached"] = run(fetch_detail, client, headers, ids)
+    results["list scan"] = run(fetch_by_scan, client, headers, ids[: REQUESTS // 20])
+
+    print(f"{'fetch':>18} {'p50 ms':>8} {'p99 ms':>8} {'fetches/s':>10}")
+    for name, samples in results.items():
+        p50, p99 = percentile(samples, 0.5) * 1000, percentile(samples, 0.99) * 1000
+        print(f"{name:>18} {p50:>8.3f} {p99:>8.3f} {len(samples) / sum(samples):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import random
+import resource
+import tempfile
+import subprocess
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+Benchmark: peak RSS of the streaming export against materializing the whole table
+- seeds a SQLite file per size (kept in $TMPDIR between runs) and measures each run in
+  a fresh process so ru_maxrss is the peak of that run alone
+- export: database/export.iter_rows + ndjson_chunks, as served by GET /movies/export
+- list: Movie.query.all() + format() + one json document, the previous GET /movies path
+- usage: python benchmarks/bench_export.py [sizes...]  (default 10000 100000 1000000)
+"""
+
+LIST_MAX_ROWS = 1000000
+
+
+def database_file(rows):
+    return os.path.join(tempfile.gettempdir(), f"casting_bench_export_{rows}.db")
+
+
+def seed(rows):
+    path = database_file(rows)
+    if os.path.exists(path):
+        return path
+    app, db, Movie = make_app(path)
+    with app.app_context():
+        db.create_all()
+        rng = random.Random(rows)
+        start = date(1950, 1, 1)
+        for offset in range(0, rows, 50000):
+            db.session.execute(
+                Movie.__table__.insert(),
+                [
+                    {"title": f"Movie {i}", "release_date": start + timedelta(days=rng.randrange(25000))}
+                    for i in range(offset, min(offset + 50000, rows))
+                ],
+            )
+        db.session.commit()
+    return path
+
+
+def make_app(path):
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + path)
+    from flask import Flask
+    from database.models import db, setup_db, Movie
+
+    app = Flask(__name__)
+    setup_db(app, "sqlite:///" + path)
+    return app, db, Movie
+
+
+def measure(mode, rows):
+    app, db, Movie = make_app(database_file(rows))
+    from flask import json
+    from werkzeug.datastructures import MultiDict
+    from database.queries import MOVIE_FIELDS
+    from database.export import iter_rows, ndjson_chunks
+
+    start = time.perf_counter()
+    size = 0
+    with app.app_context():
+        if mode == "export":
+            for chunk in ndjson_chunks(iter_rows(Movie, MOVIE_FIELDS, MultiDict(), [])):
+                size += len(chunk)
+        else:
+            movies = [movie.format() for movie in Movie.query.order_by(Movie.id).all()]
+            size = len(json.dumps({"success": True, "movies": movies}))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode} {rows} {elapsed:.2f} {peak:.1f} {size}")
+
+
+def main(sizes):
+    print(f"{'mode':>7} {'rows':>9} {'seconds':>8} {'peak RSS MB':>12} {'bytes':>12}")
+    for rows in sizes:
+        seed(rows)
+        for mode in ("export", "list"):
+            if mode == "list" and rows > LIST_MAX_ROWS:
+                continue
+            out = subprocess.run(
+                [sys.executable, __file__, "--measure", mode, str(rows)], capture_output=True, text=True, check=True
+            ).stdout.split()
+            print(f"{out[0]:>7} {int(out[1]):>9} {float(out[2]):>8.2f} {float(out[3]):>12.1f} {int(out[4]):>12}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2], int(sys.argv[3]))
+    else:
+        main([int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000])
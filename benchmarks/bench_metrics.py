@@ -0,0 +1,78 @@
+import os
+import time
+import tempfile
+from datetime import date, timedelta
+
+from common import local_auth, make_app
+
+"""
+Benchmark: cost of the /metrics instrumentation
+- observe: one Histogram.observe call, the work added per recorded value
+- request: GET /movies?limit=50 through the Flask test client, with and without the request hooks
+  and SQLAlchemy listeners of monitoring/metrics.py
+- render: one scrape of /metrics with every route recorded
+- usage: python benchmarks/bench_metrics.py
+"""
+
+REQUESTS = 2000
+
+
+def per_call(f, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        f()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    token = local_auth()
+    app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_metrics.db"))
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from database.models import db, Movie
+    from cache.response_cache import response_cache
+    from monitoring import metrics
+
+    with app.app_context():
+        rows = [{"title": f"Movie {i}", "release_date": date(1980, 1, 1) + timedelta(days=i)} for i in range(1000)]
+        db.session.execute(Movie.__table__.insert(), rows)
+        db.session.commit()
+
+    histogram = metrics.Histogram("bench_seconds", "bench", ("route", "method", "status"), registry=metrics.Registry())
+    seconds = per_call(lambda: histogram.observe(0.003, "/movies", "GET", "200"), 100000)
+    print(f"observe: {seconds * 1e9:.0f} ns")
+
+    response_cache.ttl = 0
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + token()}
+    hooks = [(app.before_request_funcs[None], app.before_request_funcs[None][-1])]
+    hooks.append((app.after_request_funcs[None], app.after_request_funcs[None][-1]))
+    listeners = [("before_cursor_execute", metrics.beforeCursorExecute)]
+    listeners.append(("after_cursor_execute", metrics.afterCursorExecute))
+
+    for label in ("on", "off"):
+        if label == "off":
+            for funcs, hook in hooks:
+                funcs.remove(hook)
+            for name, listener in listeners:
+                event.remove(Engine, name, listener)
+        samples = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            client.get("/movies?limit=50", headers=headers)
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        p50, mean = samples[len(samples) // 2] * 1000, sum(samples) / len(samples) * 1000
+        print(f"GET /movies?limit=50, metrics {label}: p50 {p50:.3f} ms, mean {mean:.3f} ms")
+
+    for rule in app.url_map.iter_rules():
+        for status in ("200", "400", "404"):
+            metrics.REQUEST_DURATION.observe(0.01, rule.rule, "GET", status)
+            metrics.DB_QUERIES.observe(2, rule.rule)
+    seconds = per_call(lambda: client.get("/metrics"), 200)
+    size = len(client.get("/metrics").data)
+    print(f"GET /metrics: {seconds * 1000:.2f} ms, {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
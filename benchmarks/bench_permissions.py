@@ -0,0 +1,46 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AUTH0_DOMAIN", "casting.test")
+os.environ.setdefault("ALGORITHMS", "RS256")
+os.environ.setdefault("API_AUDIENCE", "casting")
+
+from auth.auth import check_permissions, permission_set
+
+"""
+Micro-benchmark: permission checks for tokens with large permission arrays
+- list: the previous path, a linear `permission in payload["permissions"]` scan per required permission
+- frozenset: the permission set precompiled once per token and cached with it
+- usage: python benchmarks/bench_permissions.py
+"""
+
+REQUIRED = ("get:actors", "patch:actors", "post:actors")
+
+
+def check_permissions_list(permissions, payload):
+    for permission in permissions:
+        if permission not in payload["permissions"]:
+            return False
+    return True
+
+
+def main():
+    print(f"{'permissions':>12} {'required':>9} {'list us':>10} {'frozenset us':>13} {'speedup':>8}")
+    for size in (8, 100, 1000, 10000):
+        # the permissions routes ask for sit at the end of the array: the worst case for a scan
+        payload = {"permissions": [f"scope:{i}" for i in range(size - len(REQUIRED))] + list(REQUIRED)}
+        permissions = permission_set(payload)
+        for count in (1, len(REQUIRED)):
+            required = REQUIRED[:count]
+            compiled = frozenset(required)
+            number = 20000 if size <= 1000 else 2000
+            old = min(timeit.repeat(lambda: check_permissions_list(required, payload), number=number, repeat=5))
+            new = min(timeit.repeat(lambda: check_permissions(compiled, payload, permissions), number=number, repeat=5))
+            old, new = old / number * 1e6, new / number * 1e6
+            print(f"{size:>12} {count:>9} {old:>10.3f} {new:>13.3f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import time
+import tempfile
+from datetime import date, timedelta
+
+from common import local_auth, make_app
+
+"""
+Benchmark: cost of rate limiting
+- take: one MemoryBuckets.take call, for a single client and spread over 10000 clients
+- admit: one RateLimiter.admit call as made by @requires_auth, cost looked up from the permissions
+- request: GET /movies?limit=50 through the Flask test client with rate limiting off and on
+  (a rate high enough that no request is rejected)
+- flood: one client sending GET /movies?limit=50 back to back for a second at RATE_LIMIT_RATE=20:
+  how many requests reach the view, and how fast the rejected ones are answered
+- usage: python benchmarks/bench_rate_limit.py
+"""
+
+REQUESTS = 2000
+
+
+def per_call(f, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        f()
+    return (time.perf_counter() - start) / calls
+
+
+def timed_requests(client, headers, seconds=None, requests=REQUESTS):
+    samples = {}
+    deadline = time.perf_counter() + seconds if seconds else None
+    for _ in range(requests if not seconds else 10**9):
+        start = time.perf_counter()
+        status = client.get("/movies?limit=50", headers=headers).status_code
+        samples.setdefault(status, []).append(time.perf_counter() - start)
+        if deadline and time.perf_counter() > deadline:
+            break
+    return {status: sorted(values) for status, values in samples.items()}
+
+
+def main():
+    token = local_auth()
+    app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_rate_limit.db"))
+    from database.models import db, Movie
+    from cache.response_cache import response_cache
+    from auth.rate_limit import MemoryBuckets, RateLimiter, rate_limiter
+
+    with app.app_context():
+        rows = [{"title": f"Movie {i}", "release_date": date(1980, 1, 1) + timedelta(days=i)} for i in range(1000)]
+        db.session.execute(Movie.__table__.insert(), rows)
+        db.session.commit()
+
+    buckets = MemoryBuckets()
+    seconds = per_call(lambda: buckets.take("alice", 1, 1e9, 1e9), 100000)
+    print(f"take, one client: {seconds * 1e9:.0f} ns")
+    subs = [f"client {i}" for i in range(10000)]
+    seconds = per_call(lambda: [buckets.take(sub, 1, 1e9, 1e9) for sub in subs], 10) / len(subs)
+    print(f"take, 10000 clients: {seconds * 1e9:.0f} ns")
+    limiter = RateLimiter(rate=1e9)
+    permissions = frozenset(["get:movies"])
+    seconds = per_call(lambda: limiter.admit({"sub": "alice"}, permissions), 100000)
+    print(f"admit: {seconds * 1e9:.0f} ns")
+
+    response_cache.ttl = 0
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + token()}
+    for label, rate in (("off", 0), ("on", 1e9)):
+        rate_limiter.rate, rate_limiter.burst = rate, rate * 10
+        samples = timed_requests(client, headers)[200]
+        p50, mean = samples[len(samples) // 2] * 1000, sum(samples) / len(samples) * 1000
+        print(f"GET /movies?limit=50, rate limit {label}: p50 {p50:.3f} ms, mean {mean:.3f} ms")
+
+    rate_limiter.rate, rate_limiter.burst = 20, 200
+    samples = timed_requests(client, headers, seconds=1)
+    for status, values in sorted(samples.items()):
+        print(f"flood at 20/s, burst 200: {len(values)} x {status}, p50 {values[len(values) // 2] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
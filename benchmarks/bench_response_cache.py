@@ -0,0 +1,55 @@
+import os
+import time
+import tempfile
+from datetime import date, timedelta
+
+from common import local_auth, make_app
+
+"""
+Load test: GET list endpoints with and without the response cache
+- seeds 10000 movies on a SQLite file and replays the same reads through the Flask test client
+- reports latency percentiles with RESPONSE_CACHE_TTL=0 (off) and with the cache on
+- usage: python benchmarks/bench_response_cache.py
+"""
+
+ROUTES = ["/movies?limit=50", "/movies?limit=1000", "/movies?limit=100&title=movie 1&fields=title"]
+REQUESTS = 500
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def main():
+    token = local_auth()
+    app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_cache.db"))
+    from database.models import db, Movie
+    from cache.response_cache import response_cache
+
+    with app.app_context():
+        rows = [{"title": f"Movie {i}", "release_date": date(1980, 1, 1) + timedelta(days=i)} for i in range(10000)]
+        db.session.execute(Movie.__table__.insert(), rows)
+        db.session.commit()
+
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + token()}
+
+    print(f"{'route':>45} {'cache':>6} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for route in ROUTES:
+        for ttl in (0, 30):
+            response_cache.ttl = ttl
+            client.get(route, headers=headers)
+            samples = []
+            for _ in range(REQUESTS):
+                start = time.perf_counter()
+                client.get(route, headers=headers)
+                samples.append(time.perf_counter() - start)
+            label = "on" if ttl else "off"
+            p50, p99 = percentile(samples, 0.5) * 1000, percentile(samples, 0.99) * 1000
+            print(f"{route:>45} {label:>6} {p50:>8.3f} {p99:>8.3f} {REQUESTS / sum(samples):>8.0f}")
+    print("hit ratio", round(response_cache.stats()["hit_ratio"], 3))
+
+
+if __name__ == "__main__":
+    main()
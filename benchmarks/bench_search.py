@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import date, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+Benchmark: GET /search latency on a large catalog
+- seeds n movies and n actors with titles and names drawn from a generated vocabulary
+- SEARCH_DATABASE_URL: Postgres url to measure the tsvector + GIN path; without it a SQLite
+  file and the in-process index are used
+- reports p50 / p99 of database/search.search for typical queries
+- usage: python benchmarks/bench_search.py [rows]  (default 1000000)
+"""
+
+QUERIES = ["mad max", "kora", "kit", "sis", "ve", "delu mi", "tarsu bel", "zzzz"]
+REQUESTS = 50
+
+
+def vocabulary(rng, size=20000):
+    syllables = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words) + ["mad", "max"]
+
+
+def seed(db, Movie, Actor, rows):
+    rng = random.Random(rows)
+    words = vocabulary(rng)
+    # a zipf-like choice, some words are in many titles and most in a few
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    rng.shuffle(weights)
+    weights = list(accumulate(weights))
+    for offset in range(0, rows, 50000):
+        count = min(offset + 50000, rows) - offset
+        titles = [" ".join(rng.choices(words, cum_weights=weights, k=rng.randint(1, 4))).title() for _ in range(count)]
+        names = [" ".join(rng.choices(words, cum_weights=weights, k=2)).title() for _ in range(count)]
+        release = date(1950, 1, 1)
+        db.session.execute(
+            Movie.__table__.insert(),
+            [{"title": title, "release_date": release + timedelta(days=i % 25000)} for i, title in enumerate(titles)],
+        )
+        db.session.execute(
+            Actor.__table__.insert(),
+            [{"name": name, "age": 20 + i % 60, "gender": "Male"} for i, name in enumerate(names)],
+        )
+        db.session.commit()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    url = os.getenv("SEARCH_DATABASE_URL")
+    url = url or "sqlite:///" + os.path.join(tempfile.gettempdir(), "casting_bench_search.db")
+    os.environ["DATABASE_URL"] = url
+
+    from flask import Flask
+    from werkzeug.datastructures import MultiDict
+    from database.models import db, setup_db, Movie, Actor
+    from database.search import search
+
+    app = Flask(__name__)
+    setup_db(app, url)
+    if url.startswith("postgres"):
+        # multi-row INSERT ... VALUES instead of one statement per row while seeding
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"]["executemany_mode"] = "values"
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        # the seeded catalog is kept between runs of the same size
+        seeded = Movie.query.count() == rows
+        db.session.remove()
+        if not seeded:
+            db.drop_all()
+            db.create_all()
+            seed(db, Movie, Actor, rows)
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute("ANALYZE")
+            db.session.commit()
+        seconds = time.perf_counter() - start
+        print(f"{rows} movies and {rows} actors on {db.engine.dialect.name}, ready in {seconds:.0f}s")
+
+        args = MultiDict({"limit": "20"})
+        print(f"{'q':>12} {'results':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for q in QUERIES:
+            results, _ = search(q, ["movies", "actors"], args)
+            samples = []
+            for _ in range(REQUESTS):
+                start = time.perf_counter()
+                search(q, ["movies", "actors"], args)
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            p50, p99 = samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000
+            print(f"{q:>12} {len(results):>8} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
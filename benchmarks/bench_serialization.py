@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import random
+import importlib.util
+import tempfile
+import tracemalloc
+from unittest import mock
+from datetime import date, timedelta
+
+from common import local_auth, make_app
+
+"""
+Benchmark: building a GET /movies body of n rows
+- format+jsonify: Movie.query + Movie.format() + jsonify, the original list path
+- tuples+jsonify: column tuples (no ORM objects or identity map) encoded by jsonify
+- tuples+json / tuples+orjson: column tuples encoded by database/serialization.dumps,
+  with the standard library fallback and with orjson (when installed)
+- orjson iso: the same with JSON_DATE_FORMAT=iso, dates encoded natively by orjson
+- reports the best of 3 timings and the peak memory allocated (tracemalloc) per variant
+- usage: python benchmarks/bench_serialization.py [sizes...]  (default 1000 10000 100000)
+"""
+
+
+def seed(db, Movie, rows):
+    rng = random.Random(rows)
+    start = date(1950, 1, 1)
+    for offset in range(0, rows, 50000):
+        db.session.execute(
+            Movie.__table__.insert(),
+            [
+                {"title": f"Movie {i}", "release_date": start + timedelta(days=rng.randrange(25000))}
+                for i in range(offset, min(offset + 50000, rows))
+            ],
+        )
+    db.session.commit()
+
+
+def variants(db, Movie, jsonify, n):
+    from database.queries import MOVIE_FIELDS
+    from database import serialization
+
+    def format_jsonify():
+        movies = [movie.format() for movie in Movie.query.order_by(Movie.id).limit(n)]
+        db.session.expunge_all()
+        return jsonify({"success": True, "movies": movies}).get_data()
+
+    def tuples():
+        names = list(MOVIE_FIELDS)
+        rows = db.session.query(*MOVIE_FIELDS.values()).order_by(Movie.id).limit(n)
+        return [dict(zip(names, row)) for row in rows]
+
+    def tuples_jsonify():
+        return jsonify({"success": True, "movies": tuples()}).get_data()
+
+    def encoder(blocked=False, date_format="http"):
+        # a separate copy of the module, loaded with or without orjson and with the given date format
+        spec = importlib.util.spec_from_file_location(f"serialization_{date_format}", serialization.__file__)
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, JSON_DATE_FORMAT=date_format), mock.patch.dict(sys.modules):
+            if blocked:
+                sys.modules["orjson"] = None
+            spec.loader.exec_module(module)
+
+        def tuples_dumps():
+            return module.dumps({"success": True, "movies": tuples()})
+
+        return tuples_dumps
+
+    result = [("format+jsonify", format_jsonify), ("tuples+jsonify", tuples_jsonify)]
+    result.append(("tuples+json", encoder(blocked=True)))
+    if serialization.ENCODER == "orjson":
+        result.append(("tuples+orjson", encoder()))
+        result.append(("orjson iso", encoder(date_format="iso")))
+    return result
+
+
+def measure(run):
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        body = run()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak, len(body)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 100000]
+    local_auth()
+    app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_serialization.db"))
+    from flask import jsonify
+    from database.models import db, Movie
+
+    with app.app_context():
+        seed(db, Movie, max(sizes))
+
+    print(f"{'rows':>7} {'variant':>15} {'ms':>9} {'peak MB':>9} {'body KB':>9}")
+    with app.test_request_context():
+        for n in sizes:
+            for name, run in variants(db, Movie, jsonify, n):
+                seconds, peak, size = measure(run)
+                print(f"{n:>7} {name:>15} {seconds * 1000:>9.1f} {peak / 2 ** 20:>9.1f} {size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
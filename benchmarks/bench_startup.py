@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from statistics import median
+
+"""
+Benchmark: cold start of a worker process
+- runs a fresh python process executing --statement (default "from app import APP", what a
+  gunicorn worker or serverless function does before serving) --runs times
+- wall: milliseconds until the process exits, minus the start of an empty interpreter
+- imports: the -X importtime report of the statement, median of the runs: every module it
+  imports (the interpreter's own startup imports left out) with the modules they import directly,
+  slowest first, cumulative milliseconds
+- settings point at a SQLite file and a made-up Auth0 tenant; nothing is fetched
+- usage: python benchmarks/bench_startup.py [--statement "import app"] [--runs 10] [--top 12]
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def environment():
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "casting_bench_startup.db"))
+    env.setdefault("AUTH0_DOMAIN", "casting.bench")
+    env.setdefault("ALGORITHMS", "RS256")
+    env.setdefault("API_AUDIENCE", "casting")
+    return env
+
+
+def wall(statement, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+
+"""
+Import_tree
+- return dict of (parent, module) -> cumulative microseconds, for the modules imported by the
+  statement (parent None) and the modules those import directly
+"""
+
+
+def import_tree(statement, env):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT, env=env, capture_output=True, text=True
+    ).stderr
+    tree = {}
+    parent = None
+    # children are reported before their parent, walk the report backwards
+    for line in reversed(stderr.splitlines()):
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            parent = name.strip()
+            tree[(None, parent)] = int(cumulative)
+        elif depth == 1:
+            tree[(parent, name.strip())] = int(cumulative)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--statement", default="from app import APP")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    env = environment()
+    empty = median(wall("pass", env) for _ in range(args.runs))
+    seconds = median(wall(args.statement, env) for _ in range(args.runs))
+    startup = import_tree("pass", env)
+    runs = [import_tree(args.statement, env) for _ in range(args.runs)]
+    tree = {key: median(run.get(key, 0) for run in runs) for key in runs[0] if (None, key[0] or key[1]) not in startup}
+    total = sum(microseconds for (parent, name), microseconds in tree.items() if parent is None)
+
+    print(f"{args.statement}: {(seconds - empty) * 1000:.0f} ms wall, {total / 1000:.0f} ms importing")
+    roots = sorted((key for key in tree if key[0] is None), key=lambda key: -tree[key])
+    for root in roots[: args.top]:
+        print(f"  {root[1]:<36} {tree[root] / 1000:>8.1f} ms")
+        children = sorted((key for key in tree if key[0] == root[1]), key=lambda key: -tree[key])
+        for child in children[: args.top]:
+            print(f"    {child[1]:<34} {tree[child] / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import time
+import tempfile
+from collections import Counter
+
+from common import local_auth, make_app, percentile
+
+"""
+Benchmark: cost of rejecting invalid writes
+- validate: one validate_movie / validate_actor call on a valid and on an invalid item
+- requests: POST /movies, POST /actors and PATCH /actors/<id> through the Flask test client with
+  payloads that are not valid (and valid ones for reference): p50 and mean latency, status codes returned
+- runs on a fresh SQLite file, or on the Postgres database of BENCH_DATABASE_URL
+- usage: python benchmarks/bench_validation.py
+"""
+
+REQUESTS = 2000
+
+PAYLOADS = [
+    ("POST", "/movies", "valid", {"title": "Bench movie", "release_date": "2020-12-30"}),
+    ("POST", "/movies", "bad date", {"title": "Bench movie", "release_date": "30/12/2020"}),
+    ("POST", "/movies", "missing title", {"release_date": "2020-12-30"}),
+    ("POST", "/movies", "not json", "title=Bench movie"),
+    ("POST", "/actors", "valid", {"name": "Bench actor", "age": 40, "gender": "Male"}),
+    ("POST", "/actors", "bad age", {"name": "Bench actor", "age": "old", "gender": "Male"}),
+    ("POST", "/actors", "age 400", {"name": "Bench actor", "age": 400, "gender": "Male"}),
+    ("POST", "/actors", "gender 42", {"name": "Bench actor", "age": 40, "gender": 42}),
+    ("PATCH", "/actors/1", "bad age", {"age": "old"}),
+]
+
+
+def per_call(f, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        f()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    token = local_auth()
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        os.environ["DATABASE_URL"] = url
+        from app import create_app
+        from database.models import db
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+    else:
+        app = make_app(os.path.join(tempfile.gettempdir(), "casting_bench_validation.db"))
+    from database.models import Actor
+    from database.validation import validate_movie, validate_actor
+    from cache.response_cache import response_cache
+
+    with app.app_context():
+        Actor(name="Bench actor", age=40, gender="Male").insert()
+
+    for name, validate, item in (
+        ("validate_movie, valid", validate_movie, {"title": "Bench movie", "release_date": "2020-12-30"}),
+        ("validate_movie, bad date", validate_movie, {"title": "Bench movie", "release_date": "30/12/2020"}),
+        ("validate_actor, valid", validate_actor, {"name": "Bench actor", "age": 40, "gender": "Male"}),
+        ("validate_actor, bad age", validate_actor, {"name": "Bench actor", "age": "old", "gender": "Male"}),
+    ):
+
+        def call():
+            try:
+                validate(item)
+            except ValueError:
+                pass
+
+        print(f"{name}: {per_call(call, 100000) * 1e9:.0f} ns")
+
+    response_cache.ttl = 0
+    client = app.test_client()
+    headers = {"Authorization": "Bearer " + token()}
+    print(f"{'request':>28} {'p50 ms':>8} {'mean ms':>8}  statuses")
+    for method, route, label, payload in PAYLOADS:
+        body = {"data": payload} if isinstance(payload, str) else {"json": payload}
+        samples, statuses = [], Counter()
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            statuses[client.open(route, method=method, headers=headers, **body).status_code] += 1
+            samples.append(time.perf_counter() - start)
+        p50, mean = percentile(samples, 0.5) * 1000, sum(samples) / len(samples) * 1000
+        print(f"{method + ' ' + route + ', ' + label:>28} {p50:>8.3f} {mean:>8.3f}  {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    main()
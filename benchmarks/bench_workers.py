@@ -0,0 +1,76 @@
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import date, timedelta
+
+from common import local_auth, make_app, free_port, start_server, load
+
+"""
+Load test: requests per second of each gunicorn worker model with the shipped gunicorn.conf.py
+- sync workers (app:APP), gthread workers (app:APP, GUNICORN_THREADS threads each)
+  and uvicorn workers (asgi:APP), WEB_CONCURRENCY processes each
+- seeds 10000 movies and actors with 3 castings per movie on a SQLite file, response cache off
+- CLIENTS keep-alive clients per endpoint for the given seconds
+- usage: python benchmarks/bench_workers.py [workers] [clients] [seconds]  (default 2 50 5)
+"""
+
+ROUTES = ["/movies?limit=50", "/actors?limit=50", "/movies/1/actors", "/search?q=movie 12"]
+MODELS = {
+    "sync": ("sync", "app:APP"),
+    "gthread": ("gthread", "app:APP"),
+    "uvicorn": ("uvicorn", "asgi:APP"),
+}
+
+
+def seed(db, Movie, Actor, Casting):
+    rows = 10000
+    db.session.execute(
+        Movie.__table__.insert(),
+        [{"title": f"Movie {i}", "release_date": date(1980, 1, 1) + timedelta(days=i)} for i in range(rows)],
+    )
+    db.session.execute(
+        Actor.__table__.insert(), [{"name": f"Actor {i}", "age": 20 + i % 60, "gender": "Female"} for i in range(rows)]
+    )
+    castings = [(i, (i * 7 + k) % rows + 1, f"Role {k}") for i in range(1, rows + 1) for k in range(3)]
+    db.session.execute(
+        Casting.__table__.insert(), [{"movie_id": m, "actor_id": a, "role": role} for m, a, role in castings]
+    )
+    db.session.commit()
+
+
+def main():
+    workers = sys.argv[1] if len(sys.argv) > 1 else "2"
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    token = local_auth()
+    make_app(os.path.join(tempfile.gettempdir(), "casting_bench_workers.db"))
+    from database.models import db, Movie, Actor, Casting
+    from app import APP
+
+    with APP.app_context():
+        seed(db, Movie, Actor, Casting)
+
+    headers = f"Authorization: Bearer {token()}\r\n"
+    gunicorn = os.path.join(os.path.dirname(sys.executable), "gunicorn")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{workers} processes per server, {clients} clients, {seconds:.0f}s per endpoint")
+    print(f"{'workers':>8} {'route':>20} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} failed")
+    for name, (worker_class, app) in MODELS.items():
+        env = dict(os.environ, RESPONSE_CACHE_TTL="0", GUNICORN_WORKER_CLASS=worker_class, WEB_CONCURRENCY=workers)
+        port = free_port()
+        command = [gunicorn, "-c", os.path.join(root, "gunicorn.conf.py"), app, "-b", f"127.0.0.1:{port}"]
+        process = start_server(command, port, env)
+        try:
+            for route in ROUTES:
+                target = route.replace(" ", "%20")
+                rate, p50, p99, failed = asyncio.run(load(port, target, headers, clients, 0, seconds))
+                print(f"{name:>8} {route:>20} {rate:>8.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {failed:>6}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import subprocess
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+Shared benchmark setup
+- local_auth(): creates an RSA key (auth/local_keys.py), serves its JWKS on localhost and points
+  the auth module and the servers started by start_server at it, so tokens can be signed without Auth0
+- make_app(path): builds the Flask app on a fresh SQLite file
+- start_server(command, port, env) and load(...): run the app under a real server and drive it
+  over HTTP with many concurrent connections
+"""
+
+TIMEOUT = 10
+
+ALL_PERMISSIONS = [
+    "get:movies",
+    "get:actors",
+    "post:movies",
+    "post:actors",
+    "patch:movies",
+    "patch:actors",
+    "delete:movies",
+    "delete:actors",
+]
+
+
+def local_auth():
+    os.environ.update(AUTH0_DOMAIN="casting.bench", ALGORITHMS="RS256", API_AUDIENCE="casting")
+    from auth.local_keys import LocalKeys
+
+    keys = LocalKeys(issuer="https://casting.bench/", audience="casting", kid="bench")
+    os.environ["JWKS_URL"] = keys.serve()
+
+    def token(permissions=ALL_PERMISSIONS, sub="bench"):
+        return keys.token(permissions, sub)
+
+    return token
+
+
+def make_app(path):
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    from app import create_app
+    from database.models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)] if samples else float("nan")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(command, port, env):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(command, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            urlopen(Request(f"http://127.0.0.1:{port}/health"), timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{' '.join(command)} did not start")
+
+
+"""
+Client
+One keep-alive HTTP/1.1 connection, reopened whenever the server closes it
+(gunicorn sync workers close the connection after every response, other workers when idle or recycled)
+"""
+
+
+class Client:
+    def __init__(self, port, route, headers):
+        self.port = port
+        self.request = f"GET {route} HTTP/1.1\r\nHost: bench\r\n{headers}\r\n".encode()
+        self.reader = self.writer = None
+
+    async def get(self):
+        reused = self.writer is not None
+        if not reused:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            self.writer.write(self.request)
+            status_line = await self.reader.readline()
+        except ConnectionError:
+            status_line = b""
+        if not status_line and reused:
+            # the server closed the idle connection (keep-alive timeout, recycled worker), retry like browsers do
+            self.close()
+            return await self.get()
+        status = int(status_line.split()[1])
+        length, close = 0, False
+        while True:
+            line = (await self.reader.readline()).strip().lower()
+            if not line:
+                break
+            name, _, value = line.partition(b":")
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"connection" and value.strip() == b"close":
+                close = True
+        await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+"""
+Load
+- opens idle silent connections, then runs clients sending GET route back to back for seconds
+- return (requests per second, p50 seconds, p99 seconds, failed requests)
+"""
+
+
+async def load(port, route, headers, clients, idle, seconds):
+    idle_connections = [await asyncio.open_connection("127.0.0.1", port) for _ in range(idle)]
+    samples, failures = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def run(client):
+        nonlocal failures
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(client.get(), TIMEOUT)
+                if status == 200:
+                    samples.append(time.perf_counter() - start)
+                else:
+                    failures += 1
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                failures += 1
+                client.close()
+        client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[run(Client(port, route, headers)) for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    for reader, writer in idle_connections:
+        writer.close()
+    return len(samples) / elapsed, percentile(samples, 0.5), percentile(samples, 0.99), failures
@@ -0,0 +1,68 @@
+import sys
+import json
+import argparse
+
+"""
+Compare two result files of benchmarks/bench_api.py
+- prints p50, p99 and requests/s of every route and size measured in both, with the change in percent
+- a route regresses when its p50 grew by more than --threshold percent (default 20) and by more than
+  --min-ms milliseconds (default 0.5, so noise on sub-millisecond routes is not reported),
+  or when it returns errors it did not return before
+- exit status 1 when a route regressed, so a CI step can fail on it
+- usage: python benchmarks/compare.py old.json new.json [--threshold 20] [--min-ms 0.5]
+"""
+
+
+def change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(old, new, threshold, min_ms):
+    rows, regressions = [], []
+    for size, routes in new["sizes"].items():
+        for name, result in routes.items():
+            before = old["sizes"].get(size, {}).get(name)
+            if before is None:
+                continue
+            slower = result["p50_ms"] - before["p50_ms"]
+            regressed = change(before["p50_ms"], result["p50_ms"]) > threshold and slower > min_ms
+            regressed = regressed or result["errors"] > before["errors"]
+            rows.append((size, name, before, result, regressed))
+            if regressed:
+                regressions.append(f"{size} {name}")
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two bench_api.py result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=20.0, help="p50 increase in percent")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="p50 increase in milliseconds")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old.get("database") != new.get("database"):
+        print(f"warning: comparing {old.get('database')} with {new.get('database')} results", file=sys.stderr)
+
+    rows, regressions = compare(old, new, args.threshold, args.min_ms)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'size':>7} {'route':<52} {'p50 ms':>16} {'change':>8} {'p99 ms':>16} {'req/s':>12} {'errors':>8}")
+    for size, name, before, after, regressed in rows:
+        print(
+            f"{size:>7} {name:<52} {before['p50_ms']:>7.2f} {after['p50_ms']:>8.2f} "
+            f"{change(before['p50_ms'], after['p50_ms']):>+7.0f}% {before['p99_ms']:>7.2f} {after['p99_ms']:>8.2f} "
+            f"{before['rps']:>5.0f} {after['rps']:>6.0f} {before['errors']:>3} {after['errors']:>4}"
+            + ("  REGRESSION" if regressed else "")
+        )
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import Response, current_app, request
+from werkzeug.http import is_resource_modified
+
+"""
+@conditional(version)
+- decorates a GET view placed under @requires_auth (it receives the decoded payload)
+- version(**view_args): cheap summary of the rows the response is built from, e.g. queries.movies_version;
+  a ValueError from it lets the view answer (usually with its own 400)
+- the ETag is a hash of the path, query parameters, the caller's permissions and that version,
+  Last-Modified the latest updated_at in it
+- when If-None-Match (or, without it, If-Modified-Since) still matches, returns 304 without running the view
+- Last-Modified does not move when rows are only deleted, clients should prefer If-None-Match
+"""
+
+
+def conditional(version):
+    def conditional_decorator(f):
+        @wraps(f)
+        def wrapper(payload, *args, **kwargs):
+            try:
+                state = version(*args, **kwargs)
+            except ValueError:
+                return f(payload, *args, **kwargs)
+
+            return conditional_response(payload, state, lambda: f(payload, *args, **kwargs))
+
+        return wrapper
+
+    return conditional_decorator
+
+
+"""
+Conditional_response
+- inputs: the decoded payload, the version of the response (as returned by the version of @conditional)
+  and view(), building the response
+- for views that know their version without a query, e.g. from a cache (see detail_response in app.py)
+- return 304 when the request's validators still match, otherwise the response of view(); a 200 carries
+  the ETag and Last-Modified
+"""
+
+
+def conditional_response(payload, state, view):
+    etag = etag_for(payload, state)
+    last_modified = max((value for value in state if isinstance(value, datetime)), default=None)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        response = current_app.make_response(view())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def etag_for(payload, state):
+    scope = ",".join(sorted(payload.get("permissions") or ()))
+    query = "&".join(f"{name}={value}" for name, value in sorted(request.args.items(multi=True)))
+    raw = f"{request.path}?{query}|{scope}|{state!r}"
+    return hashlib.sha1(raw.encode()).hexdigest()
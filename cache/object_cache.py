@@ -0,0 +1,118 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+"""
+ObjectCache
+In-process LRU of serialized rows keyed by table and primary key, serving the detail endpoints
+without a database round trip: each row is cached with its updated_at, so the ETag and Last-Modified
+and any 304 are built from the cache too.
+- maxsize: number of rows kept before the least recently used one is evicted
+- ttl: seconds a row is served from the cache (0 disables caching)
+- writes invalidate the rows they change in the process that handled them; other worker
+  processes keep serving their copy until it expires, for at most ttl seconds
+- a row read from the database while an invalidation happens is not stored, so a reader racing
+  a write cannot put the old row back in the cache
+- invalidated_at(): time.time() of the last invalidation, for callers reading from a replica that
+  may lag behind it (see detail_response in app.py)
+"""
+
+
+class ObjectCache:
+    def __init__(self, maxsize=10000, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._invalidated_at = 0.0
+        self._lock = threading.Lock()
+
+    """
+    lookup(kind, id)
+    - return (value, stamp): the cached value or None, and the stamp to pass to set on a miss
+    """
+
+    def lookup(self, kind, id):
+        key = (kind, id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, None
+                del self._entries[key]
+            self.misses += 1
+            return None, self._generation
+
+    def set(self, kind, id, value, stamp):
+        if not self.ttl:
+            return
+        key = (kind, id)
+        with self._lock:
+            if stamp != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind, *ids):
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at = time.time()
+            for id in ids:
+                self._entries.pop((kind, int(id)), None)
+
+    """
+    @invalidates(kind, arg)
+    - decorates a write view; once it returns successfully the cached row of kind
+      whose primary key is the view argument arg is invalidated
+    """
+
+    def invalidates(self, kind, arg):
+        def invalidates_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                response = f(*args, **kwargs)
+                self.invalidate(kind, kwargs[arg])
+                return response
+
+            return wrapper
+
+        return invalidates_decorator
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at = time.time()
+            self._entries.clear()
+
+    def invalidated_at(self):
+        return self._invalidated_at
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+"""
+Process-wide object cache
+- OBJECT_CACHE_TTL: seconds rows are cached (default 30, 0 disables)
+- OBJECT_CACHE_SIZE: rows kept (default 10000)
+"""
+
+object_cache = ObjectCache(
+    maxsize=int(os.getenv("OBJECT_CACHE_SIZE", "10000")), ttl=int(os.getenv("OBJECT_CACHE_TTL", "30"))
+)
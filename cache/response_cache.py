@@ -0,0 +1,236 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, request
+
+"""
+MemoryBackend
+In-process LRU store with per-entry expiry, plus the resource version counters.
+Each process has its own copy, so with several workers a write only invalidates
+the worker that handled it; the others serve the old response until it expires.
+- maxsize: number of responses kept before the least recently used one is evicted
+"""
+
+
+class MemoryBackend:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._bumped_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def versions(self, resources):
+        return [self._versions.get(resource, 0) for resource in resources]
+
+    def bump(self, resource):
+        with self._lock:
+            self._versions[resource] = self._versions.get(resource, 0) + 1
+            self._bumped_at = time.time()
+
+    def bumped_at(self):
+        return self._bumped_at
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+"""
+SharedBackend
+Store shared by every worker, on top of a Redis-compatible client.
+- client: anything implementing get(key), set(key, value, ex=seconds), mget(keys) and incr(key),
+  e.g. redis.Redis or a local in-memory stand-in
+- prefix: namespace of the keys written to the shared store
+- the time of the last version bump is shared too (kept an hour), see bumped_at()
+"""
+
+
+class SharedBackend:
+    def __init__(self, client, prefix="casting:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(int(ttl), 1))
+
+    def versions(self, resources):
+        values = self.client.mget([self.prefix + "version:" + resource for resource in resources])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, resource):
+        self.client.incr(self.prefix + "version:" + resource)
+        self.client.set(self.prefix + "bumped_at", repr(time.time()), ex=3600)
+
+    def bumped_at(self):
+        value = self.client.get(self.prefix + "bumped_at")
+        return float(value) if value is not None else 0.0
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+
+"""
+Response headers stored with a cached body, so hits can still answer conditional requests
+"""
+
+KEPT_HEADERS = ("ETag", "Last-Modified", "Cache-Control")
+
+"""
+ResponseCache
+Read-through cache of successful GET responses.
+- the key is built from the path, the query parameters, the caller's permissions and
+  the current version of every resource the response depends on
+- writes bump the version of the resources they change, so older entries are never read again
+- ttl: seconds a response is served from the cache (0 disables caching)
+- with read replicas (database/replicas.py), clients that just wrote bypass the cache, and a response
+  read from a replica shortly after a write is not stored: the replica may not have that write yet
+"""
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=30):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    """
+    @cached(*resources, embed=())
+    - decorates a view placed under @requires_auth (it receives the decoded payload)
+    - resources: names of the tables the response is built from, e.g. "movies"
+    - embed: extra resources the response depends on when the request has an embed parameter
+    - placed above @conditional, hits keep the ETag of the stored response and still answer 304
+    """
+
+    def cached(self, *resources, embed=()):
+        def cached_decorator(f):
+            @wraps(f)
+            def wrapper(payload, *args, **kwargs):
+                replicas = current_app.extensions.get("replicas")
+                if not self.ttl or (replicas is not None and replicas.is_sticky()):
+                    return f(payload, *args, **kwargs)
+
+                depends = resources + tuple(embed) if request.args.get("embed") else resources
+                key = self.key(payload, depends)
+                value = self.backend.get(key)
+                if value is not None:
+                    self.hits += 1
+                    response = self.load(value)
+                    response.make_conditional(request)
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                self.misses += 1
+                response = current_app.make_response(f(payload, *args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    if replicas is None or replicas.cacheable(self.backend.bumped_at):
+                        self.backend.set(key, self.dump(response), self.ttl)
+                response.headers["X-Cache"] = "MISS"
+                return response
+
+            return wrapper
+
+        return cached_decorator
+
+    """
+    @invalidates(*resources)
+    - decorates a write view; once it returns successfully the cached responses
+      depending on any of resources are invalidated
+    """
+
+    def invalidates(self, *resources):
+        def invalidates_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                response = f(*args, **kwargs)
+                self.invalidate(*resources)
+                return response
+
+            return wrapper
+
+        return invalidates_decorator
+
+    """
+    Stored responses are the mimetype and the KEPT_HEADERS of the response, one per line,
+    followed by an empty line and the body
+    """
+
+    def dump(self, response):
+        lines = [response.mimetype]
+        lines += [f"{name}: {response.headers[name]}" for name in KEPT_HEADERS if name in response.headers]
+        return "\n".join(lines).encode() + b"\n\n" + response.get_data()
+
+    def load(self, value):
+        head, _, body = value.partition(b"\n\n")
+        mimetype, *lines = head.decode().split("\n")
+        response = Response(body, 200, mimetype=mimetype)
+        for line in lines:
+            name, _, header = line.partition(": ")
+            response.headers[name] = header
+        return response
+
+    def invalidate(self, *resources):
+        for resource in resources:
+            self.backend.bump(resource)
+
+    def key(self, payload, resources):
+        versions = self.backend.versions(resources)
+        scope = ",".join(sorted(payload.get("permissions") or ()))
+        query = "&".join(f"{name}={value}" for name, value in sorted(request.args.items(multi=True)))
+        raw = f"{request.path}?{query}|{scope}|" + ",".join(f"{r}:{v}" for r, v in zip(resources, versions))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+"""
+Process-wide response cache
+- RESPONSE_CACHE_TTL: seconds responses are cached (default 30, 0 disables)
+- RESPONSE_CACHE_SIZE: responses kept by the in-process backend (default 1024)
+- RESPONSE_CACHE_URL: redis:// url of a shared backend used instead of the in-process one
+"""
+
+if os.getenv("RESPONSE_CACHE_URL"):
+    _backend = SharedBackend.from_url(os.getenv("RESPONSE_CACHE_URL"))
+else:
+    _backend = MemoryBackend(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")))
+
+response_cache = ResponseCache(_backend, ttl=int(os.getenv("RESPONSE_CACHE_TTL", "30")))
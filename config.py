@@ -0,0 +1,92 @@
+import os
+
+"""
+ConfigError
+Raised when a required setting is missing from the environment, the first time it is used
+"""
+
+
+class ConfigError(RuntimeError):
+    pass
+
+
+"""
+Setting
+One setting of Config, read from the environment variable on first access and kept on the
+config object, so later reads are plain attribute lookups
+- variable: environment variable holding the setting
+- default: value used when the variable is unset, or a callable(config) computing it;
+  without a default the setting is required and reading it raises ConfigError
+"""
+
+
+class Setting:
+    def __init__(self, variable, default=None):
+        self.variable = variable
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, config, owner=None):
+        if config is None:
+            return self
+        value = config.environ.get(self.variable)
+        if value is not None:
+            value = value.replace("\r", "")
+        elif callable(self.default):
+            value = self.default(config)
+        elif self.default is not None:
+            value = self.default
+        else:
+            raise ConfigError(f"{self.variable} is not set")
+        config.__dict__[self.name] = value
+        return value
+
+
+"""
+Config
+Settings the app cannot start serving without. They are resolved lazily: importing a module
+never reads or checks them, each one is read when the code needing it first runs.
+Only those settings and the replica urls live here. The optional tuning settings, which all have
+defaults, are read from the environment by the module they tune:
+JWKS_TTL, JWKS_STALE_TTL, JWKS_MIN_REFETCH_INTERVAL, TOKEN_CACHE_SIZE, RATE_LIMIT_*, RESPONSE_CACHE_*,
+OBJECT_CACHE_*, JSON_DATE_FORMAT and SLOW_QUERY_MS at import, PROFILE_* by create_app, DB_POOL_*,
+DB_STATEMENT_TIMEOUT and DB_REPLICA_* by setup_db (see the README). reload() does not reach them.
+- environ: mapping the settings are read from (default os.environ)
+- overrides: setting values taking precedence over the environment, e.g. Config(database_url="sqlite://")
+- reload(): forget the settings read so far, the next reads see the current environment
+- database_url: DATABASE_URL, SQLAlchemy url of the database (required)
+- replica_urls: DATABASE_REPLICA_URLS, comma separated SQLAlchemy urls of read replicas of it
+  (default none, see database/replicas.py)
+- auth0_domain, algorithms, api_audience: AUTH0_DOMAIN, ALGORITHMS, API_AUDIENCE, the Auth0 tenant,
+  signing algorithms and audience tokens are verified against (required)
+- jwks_url: JWKS_URL, where the token signing keys are fetched from
+  (default https://<auth0_domain>/.well-known/jwks.json)
+"""
+
+
+class Config:
+    database_url = Setting("DATABASE_URL")
+    replica_urls = Setting("DATABASE_REPLICA_URLS", "")
+    auth0_domain = Setting("AUTH0_DOMAIN")
+    algorithms = Setting("ALGORITHMS")
+    api_audience = Setting("API_AUDIENCE")
+    jwks_url = Setting("JWKS_URL", lambda config: f"https://{config.auth0_domain}/.well-known/jwks.json")
+
+    def __init__(self, environ=None, **overrides):
+        self.environ = os.environ if environ is None else environ
+        self.overrides = overrides
+        self.reload()
+
+    def reload(self):
+        for name in [name for name in vars(self) if isinstance(getattr(type(self), name, None), Setting)]:
+            del self.__dict__[name]
+        self.__dict__.update(self.overrides)
+
+
+"""
+Process-wide configuration
+"""
+
+config = Config()
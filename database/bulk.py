@@ -0,0 +1,77 @@
+from database.models import db
+
+BULK_MAX_ITEMS = 10000
+CHUNK_SIZE = 1000
+
+"""
+Bulk writes
+All functions run in the current session's transaction and leave the commit
+(or rollback) to the caller, so a whole batch succeeds or fails together.
+"""
+
+"""
+Bulk_insert
+- inputs: model (Movie or Actor), list of validated column dicts
+- Postgres: multi-row INSERT ... RETURNING id, CHUNK_SIZE rows per statement
+- other databases: bulk_insert_mappings, fetching the generated ids
+- return list of new ids, in the order of rows
+"""
+
+
+def bulk_insert(model, rows):
+    table = model.__table__
+    if supports_returning():
+        ids = []
+        for chunk in _chunks(rows, CHUNK_SIZE):
+            result = db.session.execute(table.insert().values(chunk).returning(table.c.id))
+            ids.extend(row[0] for row in result)
+        return ids
+
+    db.session.bulk_insert_mappings(model, rows, return_defaults=True)
+    return [row["id"] for row in rows]
+
+
+"""
+Bulk_update
+- inputs: model (Movie or Actor), list of validated column dicts each with an "id"
+- rows whose id does not exist are skipped
+- rows are sent as executemany UPDATE ... WHERE id = :id, grouped by the set of columns supplied
+- return set of ids that were updated
+"""
+
+
+def bulk_update(model, rows):
+    found = existing_ids(model, [row["id"] for row in rows])
+    db.session.bulk_update_mappings(model, [row for row in rows if row["id"] in found])
+    return found
+
+
+"""
+Bulk_delete
+- inputs: model (Movie or Actor), list of ids
+- one DELETE ... WHERE id IN (...) per CHUNK_SIZE ids
+- return set of ids that were deleted
+"""
+
+
+def bulk_delete(model, ids):
+    found = existing_ids(model, ids)
+    for chunk in _chunks(sorted(found), CHUNK_SIZE):
+        model.query.filter(model.id.in_(chunk)).delete(synchronize_session=False)
+    return found
+
+
+def existing_ids(model, ids):
+    found = set()
+    for chunk in _chunks(list(set(ids)), CHUNK_SIZE):
+        found.update(row[0] for row in db.session.query(model.id).filter(model.id.in_(chunk)))
+    return found
+
+
+def supports_returning():
+    return db.session.get_bind().dialect.name == "postgresql"
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
@@ -0,0 +1,70 @@
+from database.models import db
+from database.queries import parse_fields
+from database.serialization import dumps
+
+EXPORT_BATCH_SIZE = 1000
+
+"""
+Iter_rows
+- inputs:
+    1. model: Movie or Actor
+    2. fields: the model's selectable fields (MOVIE_FIELDS or ACTOR_FIELDS)
+    3. args: request query args, fields=a,b selects only those columns
+    4. filters: SQL filter clauses built from args
+- rows are read through a server-side cursor (stream_results + yield_per), so only
+  batch_size rows are held in memory at a time
+- raises ValueError on unknown fields before any row is read
+- return iterator of row dicts ordered by id
+"""
+
+
+def iter_rows(model, fields, args, filters, batch_size=EXPORT_BATCH_SIZE):
+    names = parse_fields(fields, args.get("fields"))
+    query = (
+        db.session.query(*[fields[name] for name in names])
+        .filter(*filters)
+        .order_by(model.id)
+        .execution_options(stream_results=True)
+        .yield_per(batch_size)
+    )
+    return (dict(zip(names, row)) for row in query)
+
+
+"""
+Ndjson_chunks
+- input: iterator of row dicts
+- yield newline delimited JSON bytes, one row per line, batch_size rows per chunk
+"""
+
+
+def ndjson_chunks(rows, batch_size=EXPORT_BATCH_SIZE):
+    lines = []
+    for row in rows:
+        lines.append(dumps(row))
+        if len(lines) == batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+"""
+Json_array_chunks
+- inputs: iterator of row dicts, key the array is returned under (e.g. "movies")
+- yield {"success": true, "<key>": [...]} as bytes, in chunks of batch_size rows
+"""
+
+
+def json_array_chunks(rows, key, batch_size=EXPORT_BATCH_SIZE):
+    yield b'{"success":true,' + dumps(key) + b":["
+    separator = b""
+    lines = []
+    for row in rows:
+        lines.append(dumps(row))
+        if len(lines) == batch_size:
+            yield separator + b",".join(lines)
+            separator = b","
+            lines = []
+    if lines:
+        yield separator + b",".join(lines)
+    yield b"]}"
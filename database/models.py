@@ -1,18 +1,32 @@
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer, Date
-from datetime import date
-import os
-
-db = SQLAlchemy()
-
-database_path = os.getenv("DATABASE_URL").replace("\r", "")
-
-
-def setup_db(app, database_path=database_path):
+from sqlalchemy import Column, String, Integer, Date, DateTime, ForeignKey, Index, DDL, func, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import relationship
+from datetime import date, datetime
+from database.pool import engine_options
+from database.replicas import RoutingSQLAlchemy, setup_replicas
+from config import config
+import sqlite3
+
+db = RoutingSQLAlchemy()
+
+"""
+setup_db
+- binds db to app, on database_path or else the DATABASE_URL of config (read now, not at import)
+- replica_urls: read replicas serving GET requests (default DATABASE_REPLICA_URLS of config, see database/replicas.py)
+"""
+
+
+def setup_db(app, database_path=None, replica_urls=None):
+    database_path = database_path or config.database_url
+    if replica_urls is None:
+        replica_urls = [url.strip() for url in config.replica_urls.split(",") if url.strip()]
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
+    app.teardown_request(dbSessionTeardown)
+    setup_replicas(app, replica_urls)
     return db
     # db.create_all()
 
@@ -25,12 +39,45 @@ def dbSessionRollback():
     db.session.rollback()
 
 
+def dbSessionCommit():
+    db.session.commit()
+
+
+"""
+dbSessionTeardown
+- runs after every request, whether the handler returned, aborted or raised
+- rolls back whatever the request left uncommitted and returns the connection to the pool
+"""
+
+
+def dbSessionTeardown(exception=None):
+    if exception is not None:
+        db.session.rollback()
+    db.session.remove()
+
+
+"""
+SQLite leaves foreign keys unenforced unless asked, turn them on so
+castings are removed with their movie or actor like on Postgres
+"""
+
+
+@event.listens_for(Engine, "connect")
+def enableSqliteForeignKeys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
 class Movie(db.Model):
     __tablename__ = "movies"
 
     id = Column(Integer, primary_key=True)
     title = Column(String)
     release_date = Column(Date, nullable=False, default=date.today())
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    castings = relationship("Casting", back_populates="movie", cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, title, release_date):
         self.title = title
@@ -61,6 +108,8 @@ class Actor(db.Model):
     name = Column(String, nullable=False)
     age = Column(Integer)
     gender = Column(String)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    castings = relationship("Casting", back_populates="actor", cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, name, age, gender):
         self.name = name
@@ -83,3 +132,79 @@ class Actor(db.Model):
 
     def __repr__(self):
         return f"<Actor {self.id} {self.name} {self.age} {self.gender}>"
+
+
+"""
+Casting
+Association between a movie and an actor cast in it, with the role played
+"""
+
+
+class Casting(db.Model):
+    __tablename__ = "castings"
+
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    actor_id = Column(Integer, ForeignKey("actors.id", ondelete="CASCADE"), primary_key=True, index=True)
+    role = Column(String)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    movie = relationship("Movie", back_populates="castings")
+    actor = relationship("Actor", back_populates="castings")
+
+    def __init__(self, movie_id, actor_id, role=None):
+        self.movie_id = movie_id
+        self.actor_id = actor_id
+        self.role = role
+
+    def insert(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+
+    def format(self):
+        return {"movie_id": self.movie_id, "actor_id": self.actor_id, "role": self.role}
+
+    def __repr__(self):
+        return f"<Casting {self.movie_id} {self.actor_id} {self.role}>"
+
+
+"""
+Indexes backing the list endpoint filters (see migrations/versions/a3c9e1f27b4d_add_list_query_indexes.py,
+which also adds Postgres trigram variants of the lower() indexes)
+- on Postgres the lower() indexes use text_pattern_ops like the migration, so databases built with
+  create_all get the same index, serving LIKE 'prefix%' under any collation
+"""
+
+Index(
+    "ix_movies_title_lower",
+    func.lower(Movie.title).label("title_lower"),
+    postgresql_ops={"title_lower": "text_pattern_ops"},
+)
+Index("ix_movies_release_date", Movie.release_date)
+Index(
+    "ix_actors_name_lower",
+    func.lower(Actor.name).label("name_lower"),
+    postgresql_ops={"name_lower": "text_pattern_ops"},
+)
+Index("ix_actors_age", Actor.age)
+Index("ix_actors_gender", Actor.gender)
+
+
+"""
+Full-text search vectors of movie titles and actor names (see database/search.py).
+Postgres only, so they are generated columns left out of the models, added by
+migrations/versions/c4e8a2d90f13_add_search_indexes.py and here for db.create_all()
+"""
+
+SEARCH_VECTOR_DDL = (
+    "ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, coalesce({column}, ''))) STORED"
+)
+SEARCH_INDEX_DDL = "CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)"
+
+for table, column in ((Movie.__table__, "title"), (Actor.__table__, "name")):
+    for ddl in (SEARCH_VECTOR_DDL, SEARCH_INDEX_DDL):
+        statement = DDL(ddl.format(table=table.name, column=column)).execute_if(dialect="postgresql")
+        event.listen(table, "after_create", statement)
@@ -0,0 +1,112 @@
+import os
+import time
+import threading
+from sqlalchemy.pool import QueuePool
+
+"""
+PoolStats
+Counters of how long requests waited for a pooled connection
+"""
+
+
+class PoolStats:
+    def __init__(self):
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.waits += 1
+            self.wait_time += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def reset(self):
+        with self._lock:
+            self.waits = 0
+            self.wait_time = 0.0
+            self.max_wait = 0.0
+            self.timeouts = 0
+
+
+pool_stats = PoolStats()
+
+"""
+MeteredQueuePool
+QueuePool that records the time spent waiting for a connection in pool_stats
+"""
+
+
+class MeteredQueuePool(QueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = True
+        try:
+            connection = super()._do_get()
+            timed_out = False
+            return connection
+        finally:
+            pool_stats.record(time.perf_counter() - start, timed_out)
+
+
+"""
+Engine_options
+- input: database url
+- reads the pool configuration from the environment:
+    DB_POOL_SIZE: connections kept open per process (default 5)
+    DB_MAX_OVERFLOW: extra connections opened under load and closed afterwards (default 10)
+    DB_POOL_TIMEOUT: seconds to wait for a free connection before failing (default 30)
+    DB_POOL_RECYCLE: seconds after which a connection is replaced (default 1800, -1 never)
+    DB_POOL_PRE_PING: test connections before use, "false" to disable (default true)
+    DB_STATEMENT_TIMEOUT: Postgres statement_timeout in milliseconds (default 0, no limit)
+- SQLite keeps SQLAlchemy's own pool and only gets pre-ping
+- return the SQLALCHEMY_ENGINE_OPTIONS dict
+"""
+
+
+def engine_options(database_path):
+    options = {"pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() != "false"}
+    if database_path.startswith("sqlite"):
+        return options
+
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+    statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+    if statement_timeout and database_path.startswith("postgres"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+"""
+Pool_status
+- input: SQLAlchemy engine
+- return dict with the pool gauges (size, checked out, overflow) and wait counters
+"""
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+    status.update(
+        waits=pool_stats.waits,
+        wait_seconds_total=round(pool_stats.wait_time, 6),
+        wait_seconds_max=round(pool_stats.max_wait, 6),
+        timeouts=pool_stats.timeouts,
+    )
+    return status
@@ -0,0 +1,245 @@
+from datetime import date
+from sqlalchemy import func, and_
+from database.models import db, Movie, Actor, Casting
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+"""
+Selectable fields of each list endpoint, in response order
+"""
+
+MOVIE_FIELDS = {"id": Movie.id, "title": Movie.title, "release_date": Movie.release_date}
+ACTOR_FIELDS = {"id": Actor.id, "name": Actor.name, "age": Actor.age, "gender": Actor.gender}
+
+"""
+Movie_filters
+- input: request query args
+- title: case-insensitive title prefix
+- release_date_from / release_date_to: inclusive ISO date (YYYY-MM-DD) bounds
+- raises ValueError on malformed values
+- return list of SQL filter clauses
+"""
+
+
+def movie_filters(args):
+    filters = []
+    if args.get("title"):
+        filters.append(_prefix(Movie.title, args["title"]))
+    if args.get("release_date_from"):
+        filters.append(Movie.release_date >= date.fromisoformat(args["release_date_from"]))
+    if args.get("release_date_to"):
+        filters.append(Movie.release_date <= date.fromisoformat(args["release_date_to"]))
+    return filters
+
+
+"""
+Actor_filters
+- input: request query args
+- name: case-insensitive name prefix
+- age_min / age_max: inclusive age bounds
+- gender: exact gender
+- raises ValueError on malformed values
+- return list of SQL filter clauses
+"""
+
+
+def actor_filters(args):
+    filters = []
+    if args.get("name"):
+        filters.append(_prefix(Actor.name, args["name"]))
+    if args.get("age_min"):
+        filters.append(Actor.age >= int(args["age_min"]))
+    if args.get("age_max"):
+        filters.append(Actor.age <= int(args["age_max"]))
+    if args.get("gender"):
+        filters.append(Actor.gender == args["gender"])
+    return filters
+
+
+"""
+Fetch_page
+- inputs:
+    1. model: Movie or Actor
+    2. fields: the model's selectable fields (MOVIE_FIELDS or ACTOR_FIELDS)
+    3. args: request query args
+    4. filters: SQL filter clauses built from args
+- fields=a,b selects only those columns (id is always included, it is the cursor)
+- cursor: id of the last row of the previous page; rows after it are returned
+- limit: page size, DEFAULT_PAGE_SIZE by default, at most MAX_PAGE_SIZE
+- raises ValueError on malformed or unknown values
+- return (list of row dicts, next_cursor or None on the last page)
+"""
+
+
+def fetch_page(model, fields, args, filters):
+    names = parse_fields(fields, args.get("fields"))
+    cursor = args.get("cursor")
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    query = db.session.query(*[fields[name] for name in names]).filter(*filters)
+    if cursor:
+        query = query.filter(model.id > int(cursor))
+    # one row past the page tells us whether there is a next page
+    rows = query.order_by(model.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].id)
+
+    return [dict(zip(names, row)) for row in rows], next_cursor
+
+
+"""
+Fetch_row
+- inputs: model (Movie or Actor), its selectable fields, primary key
+- return the row as a dict of every field, or None if there is no such row
+"""
+
+
+def fetch_row(model, fields, id):
+    row = db.session.query(*fields.values()).filter(model.id == id).first()
+    return None if row is None else dict(zip(fields, row))
+
+
+"""
+Movie_casts
+- input: list of movie ids
+- loads the cast of every movie with one query, joined to actors
+- return dict of movie id -> list of {id, name, age, gender, role}
+"""
+
+
+def movie_casts(movie_ids):
+    casts = {id: [] for id in movie_ids}
+    if movie_ids:
+        rows = (
+            db.session.query(Casting.movie_id, Actor.id, Actor.name, Actor.age, Actor.gender, Casting.role)
+            .join(Actor, Actor.id == Casting.actor_id)
+            .filter(Casting.movie_id.in_(movie_ids))
+            .order_by(Casting.movie_id, Actor.id)
+        )
+        for movie_id, id, name, age, gender, role in rows:
+            casts[movie_id].append({"id": id, "name": name, "age": age, "gender": gender, "role": role})
+    return casts
+
+
+"""
+Actor_roles
+- input: list of actor ids
+- loads the movies every actor is cast in with one query, joined to movies
+- return dict of actor id -> list of {id, title, release_date, role}
+"""
+
+
+def actor_roles(actor_ids):
+    roles = {id: [] for id in actor_ids}
+    if actor_ids:
+        rows = (
+            db.session.query(Casting.actor_id, Movie.id, Movie.title, Movie.release_date, Casting.role)
+            .join(Movie, Movie.id == Casting.movie_id)
+            .filter(Casting.actor_id.in_(actor_ids))
+            .order_by(Casting.actor_id, Movie.id)
+        )
+        for actor_id, id, title, release_date, role in rows:
+            roles[actor_id].append({"id": id, "title": title, "release_date": release_date, "role": role})
+    return roles
+
+
+"""
+Embed_related
+- inputs: page of row dicts, key to embed under, loader (movie_casts or actor_roles)
+- adds the related rows of the whole page with a single extra query
+"""
+
+
+def embed_related(rows, key, load):
+    related = load([row["id"] for row in rows])
+    for row in rows:
+        row[key] = related[row["id"]]
+    return rows
+
+
+"""
+Catalog_version
+- inputs: (model, filter clauses) of every table a response is built from
+- counts the matching rows and takes their latest updated_at in a single query, without loading rows;
+  an insert or update raises the latest updated_at, a delete lowers the count
+- return tuple of (count, latest updated_at) per table, flattened
+"""
+
+
+def catalog_version(*sources):
+    columns = []
+    for model, filters in sources:
+        columns.append(db.session.query(func.count()).select_from(model).filter(*filters).as_scalar())
+        columns.append(db.session.query(func.max(model.updated_at)).filter(*filters).as_scalar())
+    return tuple(db.session.query(*columns).one())
+
+
+"""
+Movies_version, Actors_version
+- input: request query args of GET /movies or GET /actors
+- version of the rows matching the filters, plus castings and the other table when embed is set
+- raises ValueError on malformed filter values
+"""
+
+
+def movies_version(args):
+    sources = [(Movie, movie_filters(args))]
+    if args.get("embed"):
+        sources += [(Casting, []), (Actor, [])]
+    return catalog_version(*sources)
+
+
+def actors_version(args):
+    sources = [(Actor, actor_filters(args))]
+    if args.get("embed"):
+        sources += [(Casting, []), (Movie, [])]
+    return catalog_version(*sources)
+
+
+"""
+Movie_casts_version, Actor_roles_version
+- input: movie id or actor id
+- version of the movie (or actor), its castings and the rows they join to
+"""
+
+
+def movie_casts_version(movie_id):
+    cast = db.session.query(Casting.actor_id).filter(Casting.movie_id == movie_id)
+    return catalog_version(
+        (Movie, [Movie.id == movie_id]), (Casting, [Casting.movie_id == movie_id]), (Actor, [Actor.id.in_(cast)])
+    )
+
+
+def actor_roles_version(actor_id):
+    roles = db.session.query(Casting.movie_id).filter(Casting.actor_id == actor_id)
+    return catalog_version(
+        (Actor, [Actor.id == actor_id]), (Casting, [Casting.actor_id == actor_id]), (Movie, [Movie.id.in_(roles)])
+    )
+
+
+def parse_fields(fields, selected):
+    if not selected:
+        return list(fields)
+    requested = set(selected.split(","))
+    unknown = requested - set(fields)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    return [name for name in fields if name == "id" or name in requested]
+
+
+def _prefix(column, prefix):
+    prefix = prefix.lower()
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    clause = func.lower(column).like(escaped + "%", escape="\\")
+    if db.session.get_bind().dialect.name == "sqlite":
+        # SQLite never uses the lower() index for LIKE, but does for a range, which
+        # under its binary collation matches exactly the strings with this prefix
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        clause = and_(func.lower(column) >= prefix, func.lower(column) < upper, clause)
+    return clause
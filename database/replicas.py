@@ -0,0 +1,260 @@
+import os
+import sys
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, request, _request_ctx_stack
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm, text
+from database.pool import engine_options
+
+"""
+Read replicas
+With DATABASE_REPLICA_URLS set, the database work of GET and HEAD requests goes to read replicas
+and everything else to the primary (DATABASE_URL). A request reads from a single replica.
+"""
+
+READ_METHODS = frozenset(("GET", "HEAD"))
+STICKY_COOKIE = "db_primary_until"
+
+"""
+Seconds a Postgres replica lags behind the primary, 0 on a server that is not replaying
+"""
+
+LAG_QUERY = (
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END"
+)
+
+"""
+Replica
+One read replica: its engine, whether it passed its last check, and its last measured lag
+"""
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.lag = None
+        self.checked_at = -math.inf
+
+
+"""
+ReplicaRouter
+- engines: one SQLAlchemy engine per replica, used round-robin
+- check_interval: seconds between health checks of a replica, run by the request about to use it;
+  a replica that does not answer, or lags the primary by more than max_lag seconds (Postgres,
+  0 disables the lag check), is skipped until a later check passes
+- a replica whose connection fails or drops during a request is marked down at once
+- sticky_seconds: after a successful write a client reads from the primary for that long, so it
+  sees its own writes. The response sets a cookie, honoured by every worker; this worker also
+  remembers the sha256 of the client's bearer token, for clients that do not keep cookies (0 disables).
+  Replicas are assumed to catch up with the primary within that window
+- reads go to the primary while no replica is healthy
+- caches in front of the database ask is_sticky() before serving a cached response, and
+  cacheable() before storing one, see Read-your-writes below
+"""
+
+
+class ReplicaRouter:
+    def __init__(self, engines, check_interval=5.0, max_lag=0.0, sticky_seconds=5.0, maxsize=100000, clock=time.time):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.maxsize = maxsize
+        self.clock = clock
+        self._next = 0
+        self._writers = OrderedDict()
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            event.listen(replica.engine, "handle_error", self._connection_failed(replica))
+
+    @classmethod
+    def from_urls(cls, urls):
+        return cls(
+            [create_engine(url, **engine_options(url)) for url in urls],
+            check_interval=float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+            max_lag=float(os.getenv("DB_REPLICA_MAX_LAG", "0")),
+            sticky_seconds=float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5")),
+        )
+
+    """
+    read_engine()
+    - return the replica engine serving the current request, chosen on the first call of the request,
+      or None when the request goes to the primary (not a read, sticky client or no healthy replica)
+    """
+
+    def read_engine(self):
+        context = _request_ctx_stack.top
+        if context is None:
+            return None
+        # kept on the request context (not g, which outlives the request when an app context was
+        # already pushed), get_bind asks again for every statement
+        try:
+            return context.db_read_engine
+        except AttributeError:
+            pass
+        replica = None
+        if context.request.method in READ_METHODS and not self.is_sticky():
+            replica = self.choose()
+        context.db_read_engine = replica.engine if replica is not None else None
+        return context.db_read_engine
+
+    def choose(self):
+        now = time.monotonic()
+        for _ in self.replicas:
+            with self._lock:
+                replica = self.replicas[self._next]
+                self._next = (self._next + 1) % len(self.replicas)
+                due = now - replica.checked_at >= self.check_interval
+                if due:
+                    replica.checked_at = now
+            if due:
+                self.check(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+    def check(self, replica):
+        try:
+            with replica.engine.connect() as connection:
+                if replica.engine.dialect.name == "postgresql":
+                    replica.lag = float(connection.execute(text(LAG_QUERY)).scalar())
+                else:
+                    connection.execute(text("SELECT 1"))
+                    replica.lag = 0.0
+            replica.healthy = not self.max_lag or replica.lag <= self.max_lag
+        except Exception:
+            print(sys.exc_info())
+            replica.healthy = False
+        return replica.healthy
+
+    def _connection_failed(self, replica):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                replica.healthy = False
+
+        return handle_error
+
+    """
+    Read-your-writes
+    - is_sticky(): whether the client of the current request wrote less than sticky_seconds ago;
+      a cache must not answer such a request, it may hold what a lagging replica returned
+    - cacheable(invalidated_at): whether the response of the current request may be stored in a cache,
+      invalidated_at() returning the time.time() of the last invalidation of that cache: not when the
+      response was read from a replica that may not have replayed the invalidating write yet
+    - stick(response): called after every request, marks the client of a successful write
+    - the cookie is set by the client: a value that does not parse, or ends the window later than
+      sticky_seconds from now, is ignored, so a client cannot keep itself off the caches and replicas
+    """
+
+    def is_sticky(self):
+        if not self.sticky_seconds:
+            return False
+        now = self.clock()
+        try:
+            if now < float(request.cookies.get(STICKY_COOKIE, 0)) <= now + self.sticky_seconds:
+                return True
+        except ValueError:
+            pass
+        token = request.headers.get("Authorization")
+        return token is not None and self._writers.get(_writer_key(token), 0) > now
+
+    def cacheable(self, invalidated_at):
+        if getattr(_request_ctx_stack.top, "db_read_engine", None) is None:
+            return True
+        return self.clock() - invalidated_at() >= self.sticky_seconds
+
+    def stick(self, response):
+        if request.method in READ_METHODS or request.method == "OPTIONS" or response.status_code >= 400:
+            return response
+        if not self.sticky_seconds:
+            return response
+        until = self.clock() + self.sticky_seconds
+        response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=math.ceil(self.sticky_seconds), httponly=True)
+        token = request.headers.get("Authorization")
+        if token is not None:
+            key = _writer_key(token)
+            with self._lock:
+                self._writers.pop(key, None)
+                self._writers[key] = until
+                if len(self._writers) > self.maxsize:
+                    self._writers.popitem(last=False)
+        return response
+
+    def status(self):
+        return [
+            {"url": repr(replica.engine.url), "healthy": replica.healthy, "lag_seconds": replica.lag}
+            for replica in self.replicas
+        ]
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+
+def _writer_key(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+"""
+Setup_replicas
+- input: app, list of replica urls (empty to send everything to the primary)
+- installs the router read by RoutingSession on the app, and the hook making writers sticky
+- return the router or None
+"""
+
+
+def setup_replicas(app, urls):
+    router = app.extensions.pop("replicas", None)
+    if router is not None:
+        router.dispose()
+    if not urls:
+        return None
+    if _stick not in app.after_request_funcs.get(None, ()):
+        app.after_request(_stick)
+    router = app.extensions["replicas"] = ReplicaRouter.from_urls(urls)
+    return router
+
+
+def _stick(response):
+    router = current_app.extensions.get("replicas")
+    return router.stick(response) if router is not None else response
+
+
+"""
+Replica_status
+- input: app
+- return the url (password hidden), health and last measured lag of every replica
+"""
+
+
+def replica_status(app):
+    router = app.extensions.get("replicas")
+    return router.status() if router is not None else []
+
+
+"""
+RoutingSession
+Flask-SQLAlchemy session sending the statements of read requests to the replica the router picked;
+flushes, and every statement of other requests, go to the primary
+"""
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        router = self.app.extensions.get("replicas")
+        if router is not None and not self._flushing:
+            engine = router.read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,195 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from sqlalchemy import desc, func, literal, literal_column, select, union_all
+from database.models import db, Movie, Actor
+from database.queries import MOVIE_FIELDS, ACTOR_FIELDS, catalog_version
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_TERMS = 8
+SEARCH_CANDIDATES = 300
+# shorter words only match whole words; a one or two letter prefix matches too many words to be served fast
+SEARCH_MIN_PREFIX = 3
+
+"""
+Searchable catalogs: kind -> (model, searched column, returned fields, result type)
+"""
+
+SEARCH_KINDS = {
+    "movies": (Movie, Movie.title, MOVIE_FIELDS, "movie"),
+    "actors": (Actor, Actor.name, ACTOR_FIELDS, "actor"),
+}
+
+# the text search configuration of the search_vector columns, "simple" lowercases words without stemming them
+TEXT_SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+"""
+Search
+- inputs:
+    1. q: words to look for; every word must match the start of a word of the title or name
+       (words shorter than SEARCH_MIN_PREFIX must match a whole word)
+    2. kinds: catalogs searched, keys of SEARCH_KINDS
+    3. args: request query args, limit (default SEARCH_PAGE_SIZE, at most MAX_SEARCH_PAGE_SIZE)
+       and cursor (the next_cursor of the previous page)
+- Postgres: to_tsquery prefix matching on the GIN indexed search_vector columns
+  (see database/models.py), ranked by ts_rank
+- other databases: the in-process inverted index of MemoryIndex
+- results are ordered by rank, then by type and id, among the candidates: the SEARCH_CANDIDATES
+  matches of each catalog with the lowest ids. Ranking a broad prefix stays fast and every page ranks
+  the same candidates; with more matches than that, the order is approximate
+- at most SEARCH_CANDIDATES results are served: next_cursor is None once a page reaches them
+- raises ValueError on an empty q or malformed paging values, including a cursor past SEARCH_CANDIDATES
+- return (list of result dicts with "type" and "rank", next_cursor or None on the last page)
+"""
+
+
+def search(q, kinds, args):
+    terms = search_terms(q)
+    limit = int(args.get("limit", SEARCH_PAGE_SIZE))
+    offset = int(args.get("cursor", 0))
+    if not 0 < limit <= MAX_SEARCH_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_SEARCH_PAGE_SIZE}")
+    if not 0 <= offset < SEARCH_CANDIDATES:
+        raise ValueError(f"cursor must be between 0 and {SEARCH_CANDIDATES - 1}")
+    limit = min(limit, SEARCH_CANDIDATES - offset)
+
+    # one hit past the page tells us whether there is a next page
+    if db.session.get_bind().dialect.name == "postgresql":
+        hits = search_postgres(terms, kinds, limit + 1, offset, SEARCH_CANDIDATES)
+    else:
+        hits = memory_index().search(terms, kinds, SEARCH_CANDIDATES)[offset : offset + limit + 1]
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        if offset + limit < SEARCH_CANDIDATES:
+            next_cursor = str(offset + limit)
+
+    return load_results(hits), next_cursor
+
+
+def search_terms(q):
+    terms = re.findall(r"\w+", (q or "").lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise ValueError("q must contain at least one word")
+    return terms
+
+
+def search_postgres(terms, kinds, limit, offset, candidates):
+    words = [f"{term}:*" if len(term) >= SEARCH_MIN_PREFIX else term for term in terms]
+    query = func.to_tsquery(TEXT_SEARCH_CONFIG, " & ".join(words))
+    selects = []
+    for kind in kinds:
+        model = SEARCH_KINDS[kind][0]
+        vector = literal_column(f"{model.__tablename__}.search_vector")
+        # ranking reads every row it ranks, so only the candidates matches with the lowest ids are ranked;
+        # a broad prefix like "ma" then stays fast, at the cost of an approximate order
+        matches = select([model.id, vector.label("vector")]).where(vector.op("@@")(query))
+        matches = matches.order_by(model.id).limit(candidates).alias(kind)
+        # normalization 2 divides the rank by the number of words, so shorter titles and names come first
+        rank = func.ts_rank(matches.c.vector, query, 2)
+        selects.append(select([literal(kind).label("kind"), matches.c.id, rank.label("rank")]))
+
+    statement = union_all(*selects) if len(selects) > 1 else selects[0]
+    statement = statement.order_by(desc("rank"), "kind", "id").limit(limit).offset(offset)
+    return [(kind, id, rank) for kind, id, rank in db.session.execute(statement)]
+
+
+"""
+Load_results
+- input: page of (kind, id, rank) hits
+- loads the rows of each kind with one query
+- return list of result dicts in hit order
+"""
+
+
+def load_results(hits):
+    ids = defaultdict(list)
+    for kind, id, rank in hits:
+        ids[kind].append(id)
+
+    rows = {}
+    for kind, kind_ids in ids.items():
+        model, column, fields, type = SEARCH_KINDS[kind]
+        names = list(fields)
+        for row in db.session.query(*fields.values()).filter(model.id.in_(kind_ids)):
+            rows[kind, row.id] = dict(zip(names, row), type=type)
+
+    return [dict(rows[kind, id], rank=round(rank, 6)) for kind, id, rank in hits if (kind, id) in rows]
+
+
+"""
+MemoryIndex
+Inverted index of the words of every movie title and actor name, used where Postgres
+text search is not available (SQLite development and test databases).
+- words are kept sorted, so the words starting with a prefix are found by bisection
+- like Postgres search, words shorter than SEARCH_MIN_PREFIX only match whole words
+- rank: sum over the query words of 1 for an exact word and 0.5 for a prefix match,
+  divided by the number of words of the title or name
+- search(terms, kinds, candidates=None): like Postgres search, only the candidates matches of
+  each catalog with the lowest ids are ranked
+"""
+
+
+class MemoryIndex:
+    def __init__(self, documents):
+        self.postings = defaultdict(set)
+        self.lengths = {}
+        for key, text in documents:
+            words = re.findall(r"\w+", (text or "").lower())
+            self.lengths[key] = len(words) or 1
+            for word in words:
+                self.postings[word].add(key)
+        self.words = sorted(self.postings)
+
+    def matches(self, term):
+        scores = {}
+        for position in range(bisect_left(self.words, term), len(self.words)):
+            word = self.words[position]
+            if not word.startswith(term) or (word != term and len(term) < SEARCH_MIN_PREFIX):
+                break
+            weight = 1.0 if word == term else 0.5
+            for key in self.postings[word]:
+                scores[key] = max(scores.get(key, 0.0), weight)
+        return scores
+
+    def search(self, terms, kinds, candidates=None):
+        scores = None
+        for term in terms:
+            matches = self.matches(term)
+            if scores is None:
+                scores = {key: score for key, score in matches.items() if key[0] in kinds}
+            else:
+                scores = {key: score + matches[key] for key, score in scores.items() if key in matches}
+        if candidates is not None:
+            first = defaultdict(list)
+            for key in sorted(scores):
+                first[key[0]].append(key)
+            scores = {key: scores[key] for keys in first.values() for key in keys[:candidates]}
+        ranked = [(kind, id, score / self.lengths[kind, id]) for (kind, id), score in scores.items()]
+        return sorted(ranked, key=lambda hit: (-hit[2], hit[0], hit[1]))
+
+
+_memory_index = None
+_memory_version = None
+_memory_lock = threading.Lock()
+
+"""
+Memory_index
+- return the process-wide MemoryIndex, rebuilt from the database whenever the
+  catalog version (row counts and latest updated_at) has changed since it was built
+"""
+
+
+def memory_index():
+    global _memory_index, _memory_version
+    version = catalog_version(*[(model, []) for model, column, fields, type in SEARCH_KINDS.values()])
+    with _memory_lock:
+        if _memory_index is None or version != _memory_version:
+            documents = []
+            for kind, (model, column, fields, type) in SEARCH_KINDS.items():
+                documents += [((kind, id), text) for id, text in db.session.query(model.id, column)]
+            _memory_index, _memory_version = MemoryIndex(documents), version
+        return _memory_index
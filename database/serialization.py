@@ -0,0 +1,74 @@
+import os
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from flask import Response
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+JSON encoding of API responses
+- uses orjson when it is installed, the standard library encoder otherwise; both produce
+  compact UTF-8 JSON with keys in insertion order
+- JSON_DATE_FORMAT=http (default): dates are sent in the HTTP date format jsonify has always used,
+  e.g. "Mon, 11 Oct 2010 00:00:00 GMT", so responses are the same whichever encoder is used
+- JSON_DATE_FORMAT=iso: dates are sent as "2010-10-11", which orjson encodes natively without
+  calling back into Python for every date
+"""
+
+ENCODER = "orjson" if orjson else "json"
+DATE_FORMAT = os.getenv("JSON_DATE_FORMAT", "http")
+
+_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def encode_default(value):
+    if isinstance(value, date) and DATE_FORMAT == "iso":
+        return value.isoformat()
+    if isinstance(value, datetime):
+        return http_date(value)
+    if isinstance(value, date):
+        return format_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# release dates repeat a lot across rows, formatting each distinct one once saves most of the encoding time
+@lru_cache(maxsize=65536)
+def format_date(value):
+    return f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} 00:00:00 GMT"
+
+
+"""
+Dumps
+- input: dicts, lists, strings, numbers, dates
+- return the JSON document as UTF-8 bytes
+"""
+
+if orjson:
+    _options = orjson.OPT_PASSTHROUGH_DATETIME if DATE_FORMAT == "http" else 0
+
+    def dumps(value):
+        return orjson.dumps(value, default=encode_default, option=_options)
+
+
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=encode_default)
+
+    def dumps(value):
+        return _encoder.encode(value).encode()
+
+
+"""
+Json_response
+- inputs: response body, status code
+- return application/json Response of dumps(body), used in place of jsonify for large bodies
+"""
+
+
+def json_response(body, status=200):
+    return Response(dumps(body), status, mimetype="application/json")
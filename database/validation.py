@@ -0,0 +1,182 @@
+from datetime import date
+
+"""
+ValidationError
+Raised when a request item does not describe a valid Movie or Actor
+- ValidationError(message, errors=None)
+- errors: list of {"field": name, "message": text}, one per invalid field
+  (field is None when the item as a whole is invalid)
+- str(error) is the message, the errors' messages joined
+"""
+
+
+class ValidationError(ValueError):
+    # no __init__: the arguments stay in args, which keeps raising one as cheap as a plain ValueError
+    @property
+    def errors(self):
+        if len(self.args) > 1 and self.args[1] is not None:
+            return self.args[1]
+        return [{"field": None, "message": self.args[0]}]
+
+    def __str__(self):
+        return str(self.args[0])
+
+
+"""
+Schemas
+Declarative description of the columns a request may write
+- type: "string" (non-empty), "integer" (numeric strings are accepted, booleans are not)
+  or "date" (ISO date string YYYY-MM-DD)
+- min, max: bounds of an integer
+- choices: allowed values of a string, matched ignoring case and stored as spelled here
+- fields of an item not in the schema are ignored
+"""
+
+GENDERS = ("Female", "Male", "Non-binary", "Other")
+
+MOVIE_SCHEMA = {
+    "title": {"type": "string"},
+    "release_date": {"type": "date"},
+}
+
+ACTOR_SCHEMA = {
+    "name": {"type": "string"},
+    "age": {"type": "integer", "min": 0, "max": 150},
+    "gender": {"type": "string", "choices": GENDERS},
+}
+
+
+"""
+Compile_schema
+- input: a schema like MOVIE_SCHEMA
+- the field checks, bounds and messages are built once here, so validating an item is a single
+  pass over its fields with no lookups in the schema; a check returns the converted value or the
+  prebuilt _Invalid of its message, and only the item as a whole raises
+- return validate(item, partial=False):
+    - partial=True when only the supplied fields are required (PATCH)
+    - raises ValidationError listing every invalid or missing field
+    - return dict of column values ready for insert/update
+"""
+
+
+def compile_schema(schema):
+    checks = tuple((field, _compile_field(field, spec)) for field, spec in schema.items())
+    nothing = f"expected at least one of: {', '.join(schema)}"
+
+    def validate(item, partial=False):
+        if not isinstance(item, dict):
+            raise ValidationError("item must be a json object")
+        values = {}
+        errors = None
+        for field, check in checks:
+            if field in item:
+                value = check(item[field])
+                if type(value) is not _Invalid:
+                    values[field] = value
+                    continue
+                message = value.message
+            elif partial:
+                continue
+            else:
+                message = f"{field} is required"
+            if errors is None:
+                errors = []
+            errors.append({"field": field, "message": message})
+        if errors:
+            raise ValidationError("; ".join(error["message"] for error in errors), errors)
+        if not values:
+            raise ValidationError(nothing)
+        return values
+
+    return validate
+
+
+class _Invalid:
+    __slots__ = ("message",)
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _compile_field(field, spec):
+    kind = spec["type"]
+    if kind == "string" and "choices" in spec:
+        choices = {choice.lower(): choice for choice in spec["choices"]}
+        invalid = _Invalid(f"{field} must be one of: {', '.join(spec['choices'])}")
+
+        def check(value):
+            if type(value) is str:
+                return choices.get(value.lower(), invalid)
+            return invalid
+
+    elif kind == "string":
+        invalid = _Invalid(f"{field} must be a non-empty string")
+
+        def check(value):
+            if type(value) is not str or not value.strip():
+                return invalid
+            return value
+
+    elif kind == "integer":
+        low, high = spec.get("min", float("-inf")), spec.get("max", float("inf"))
+        invalid = _Invalid(f"{field} must be an integer")
+        out_of_bounds = _Invalid(f"{field} must be between {spec.get('min', '-inf')} and {spec.get('max', 'inf')}")
+
+        def check(value):
+            if type(value) is not int:
+                if type(value) is not str:
+                    return invalid
+                try:
+                    value = int(value)
+                except ValueError:
+                    return invalid
+            if not low <= value <= high:
+                return out_of_bounds
+            return value
+
+    elif kind == "date":
+        invalid = _Invalid(f"{field} must be an ISO date YYYY-MM-DD")
+
+        def check(value):
+            if type(value) is not str:
+                return invalid
+            try:
+                return date.fromisoformat(value)
+            except ValueError:
+                return invalid
+
+    else:
+        raise ValueError(f"unknown type {kind} of field {field}")
+    return check
+
+
+"""
+Validate_movie
+- title: non-empty string
+- release_date: ISO date string YYYY-MM-DD
+"""
+
+validate_movie = compile_schema(MOVIE_SCHEMA)
+
+"""
+Validate_actor
+- name: non-empty string
+- age: integer between 0 and 150
+- gender: one of GENDERS
+"""
+
+validate_actor = compile_schema(ACTOR_SCHEMA)
+
+"""
+Validate_id
+- input: a row id from a request
+- raises ValidationError unless it is a positive integer
+- return the id as int
+"""
+
+
+def validate_id(value):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        message = "id must be a positive integer"
+        raise ValidationError(message, [{"field": "id", "message": message}])
+    return value
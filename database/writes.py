@@ -0,0 +1,47 @@
+from database.models import db
+from database.queries import fetch_row
+from database.bulk import supports_returning
+
+"""
+Single row writes
+The row is changed with one statement, without loading it into the session first, so there is
+no window between reading and writing it. Like the bulk writes, they run in the current session's
+transaction and leave the commit (or rollback) to the caller.
+"""
+
+"""
+Update_row
+- inputs:
+    1. model: Movie or Actor
+    2. fields: the model's selectable fields (MOVIE_FIELDS or ACTOR_FIELDS), the columns returned
+    3. id: primary key
+    4. values: validated column dict, only these columns are changed
+- Postgres: one UPDATE ... RETURNING
+- other databases: UPDATE, then the row read back in the same transaction
+- return the updated row as a dict of fields, or None if there is no such row
+"""
+
+
+def update_row(model, fields, id, values):
+    table = model.__table__
+    statement = table.update().where(table.c.id == id).values(**values)
+    if supports_returning():
+        row = db.session.execute(statement.returning(*[table.c[name] for name in fields])).first()
+        return None if row is None else dict(zip(fields, row))
+
+    if db.session.execute(statement).rowcount == 0:
+        return None
+    return fetch_row(model, fields, id)
+
+
+"""
+Delete_row
+- inputs: model (Movie or Actor), primary key
+- one DELETE ... WHERE id = :id; castings go with the row through ON DELETE CASCADE
+- return True if the row existed
+"""
+
+
+def delete_row(model, id):
+    table = model.__table__
+    return db.session.execute(table.delete().where(table.c.id == id)).rowcount > 0
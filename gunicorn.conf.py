@@ -0,0 +1,93 @@
+import os
+import sys
+import multiprocessing
+
+"""
+Gunicorn configuration, loaded by gunicorn from the working directory (see Procfile)
+- GUNICORN_WORKER_CLASS: sync (default), gthread, or uvicorn to serve asgi:APP
+  (set GUNICORN_APP=asgi:APP, uvicorn workers need the optional uvicorn package)
+- WEB_CONCURRENCY: worker processes (default 2 per CPU + 1, as set by Heroku on its dynos)
+- GUNICORN_THREADS: threads per gthread worker (default 4)
+- GUNICORN_PRELOAD: import the app once in the master before forking (default true),
+  workers share its memory and start faster; each worker then opens its own database connections
+- GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER: a worker is replaced gracefully after
+  serving between max and max + jitter requests (default 1000 and 100, 0 never), so leaks stay bounded
+  and workers do not all restart at once
+- GUNICORN_KEEPALIVE: seconds an idle keep-alive connection is kept (default 5, gthread and uvicorn
+  workers only); keep it above the idle timeout of a load balancer in front of the app
+- GUNICORN_TIMEOUT / GUNICORN_GRACEFUL_TIMEOUT: seconds before a silent worker is killed and
+  seconds a stopping worker gets to finish its requests (default 30 and 30)
+"""
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn.workers.UvicornWorker",
+}
+
+worker_class = WORKER_CLASSES[os.getenv("GUNICORN_WORKER_CLASS", "sync")]
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() != "false"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# the worker heartbeat file is touched every second, keep it off disk-backed /tmp in containers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+"""
+On_starting
+- uvicorn workers only serve ASGI applications, refuse to start them on the WSGI app:APP
+"""
+
+
+def on_starting(server):
+    app_uri = getattr(server.app, "app_uri", "")
+    if worker_class == WORKER_CLASSES["uvicorn"] and not app_uri.startswith("asgi:"):
+        sys.exit(f"GUNICORN_WORKER_CLASS=uvicorn serves asgi:APP, not {app_uri}")
+
+
+"""
+When_ready
+- runs in the master once the app is preloaded, before the workers are forked
+- imports the JWT library and fetches the token signing keys (auth.warm_up) so every worker
+  starts with them instead of loading them during its first request
+"""
+
+
+def when_ready(server):
+    auth = sys.modules.get("auth.auth")
+    if auth is None:
+        return
+    try:
+        auth.warm_up()
+    except Exception:
+        print(sys.exc_info())
+
+
+"""
+Post_fork
+- runs in each new worker
+- drops the database connections (primary and replicas) inherited from the master: a pooled connection used by
+  two processes mixes their queries on the same socket
+- starts the worker's own background refresh of the signing keys (threads do not survive a fork)
+"""
+
+
+def post_fork(server, worker):
+    models = sys.modules.get("database.models")
+    if models is not None and models.db.app is not None:
+        with models.db.app.app_context():
+            models.db.engine.dispose()
+        replicas = models.db.app.extensions.get("replicas")
+        if replicas is not None:
+            replicas.dispose()
+
+    auth = sys.modules.get("auth.auth")
+    if auth is not None:
+        auth.key_store.start_background_refresh()
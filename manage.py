@@ -1,9 +1,15 @@
 from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
 
-from app import APP
+from app import create_app
 from database.models import db
 
+"""
+Migration commands, e.g. python manage.py db upgrade
+Flask-Migrate (and Alembic) are only imported here, never by the serving app
+"""
+
+APP = create_app()
 migrate = Migrate(APP, db)
 manager = Manager(APP)
 
@@ -11,4 +17,4 @@ manager.add_command("db", MigrateCommand)
 
 
 if __name__ == "__main__":
-    manager.run()
\ No newline at end of file
+    manager.run()
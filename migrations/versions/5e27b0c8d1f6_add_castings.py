@@ -0,0 +1,33 @@
+"""add castings
+
+Revision ID: 5e27b0c8d1f6
+Revises: a3c9e1f27b4d
+Create Date: 2026-10-18 11:02:07.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e27b0c8d1f6'
+down_revision = 'a3c9e1f27b4d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('castings',
+    sa.Column('movie_id', sa.Integer(), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['actor_id'], ['actors.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('movie_id', 'actor_id')
+    )
+    op.create_index(op.f('ix_castings_actor_id'), 'castings', ['actor_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_castings_actor_id'), table_name='castings')
+    op.drop_table('castings')
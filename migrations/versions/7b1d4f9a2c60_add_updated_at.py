@@ -0,0 +1,34 @@
+"""add updated_at
+
+Revision ID: 7b1d4f9a2c60
+Revises: 5e27b0c8d1f6
+Create Date: 2026-10-18 14:21:53.117042
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1d4f9a2c60'
+down_revision = '5e27b0c8d1f6'
+branch_labels = None
+depends_on = None
+
+tables = ['movies', 'actors', 'castings']
+
+
+def upgrade():
+    for table in tables:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE {table} SET updated_at = CURRENT_TIMESTAMP')
+        if op.get_bind().dialect.name == 'postgresql':
+            # SQLite cannot alter a column in place, there the model default keeps it filled
+            op.alter_column(table, 'updated_at', nullable=False)
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(tables):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,45 @@
+"""add list query indexes
+
+Revision ID: a3c9e1f27b4d
+Revises: 04e98e89b50c
+Create Date: 2026-10-18 10:12:41.318602
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f27b4d'
+down_revision = '04e98e89b50c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_movies_release_date', 'movies', ['release_date'])
+    op.create_index('ix_actors_age', 'actors', ['age'])
+    op.create_index('ix_actors_gender', 'actors', ['gender'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # text_pattern_ops lets LIKE 'prefix%' use the index under any collation,
+        # trigram indexes serve substring / ILIKE '%term%' searches
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_movies_title_lower ON movies (lower(title) text_pattern_ops)')
+        op.execute('CREATE INDEX ix_actors_name_lower ON actors (lower(name) text_pattern_ops)')
+        op.execute('CREATE INDEX ix_movies_title_trgm ON movies USING gin (lower(title) gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_actors_name_trgm ON actors USING gin (lower(name) gin_trgm_ops)')
+    else:
+        op.create_index('ix_movies_title_lower', 'movies', [sa.text('lower(title)')])
+        op.create_index('ix_actors_name_lower', 'actors', [sa.text('lower(name)')])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_actors_name_trgm', table_name='actors')
+        op.drop_index('ix_movies_title_trgm', table_name='movies')
+    op.drop_index('ix_actors_name_lower', table_name='actors')
+    op.drop_index('ix_movies_title_lower', table_name='movies')
+    op.drop_index('ix_actors_gender', table_name='actors')
+    op.drop_index('ix_actors_age', table_name='actors')
+    op.drop_index('ix_movies_release_date', table_name='movies')
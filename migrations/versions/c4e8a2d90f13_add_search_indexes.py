@@ -0,0 +1,34 @@
+"""add search indexes
+
+Revision ID: c4e8a2d90f13
+Revises: 7b1d4f9a2c60
+Create Date: 2026-10-18 16:05:12.480311
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2d90f13'
+down_revision = '7b1d4f9a2c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # generated tsvector columns (Postgres 12+), kept in sync by the database itself
+        op.execute("ALTER TABLE movies ADD COLUMN search_vector tsvector "
+                   "GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, coalesce(title, ''))) STORED")
+        op.execute("ALTER TABLE actors ADD COLUMN search_vector tsvector "
+                   "GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, coalesce(name, ''))) STORED")
+        op.execute('CREATE INDEX ix_movies_search_vector ON movies USING gin (search_vector)')
+        op.execute('CREATE INDEX ix_actors_search_vector ON actors USING gin (search_vector)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_actors_search_vector', table_name='actors')
+        op.drop_index('ix_movies_search_vector', table_name='movies')
+        op.drop_column('actors', 'search_vector')
+        op.drop_column('movies', 'search_vector')
@@ -0,0 +1,245 @@
+import time
+import threading
+from bisect import bisect_left
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+"""
+In-process metrics in the Prometheus text format
+- every metric is kept by the process that records it; with several gunicorn workers each one
+  reports its own counters, which Prometheus sums when the workers are scraped as separate targets
+- recording is a dict lookup, a bisection over the bucket bounds and an increment under a lock,
+  cheap enough to stay on in production
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    """
+    render(samples)
+    - samples: (name, type, help, value) tuples read at scrape time, e.g. from status_samples
+    - return the exposition text of every registered metric followed by the samples
+    """
+
+    def render(self, samples=()):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for name, kind, help, value in samples:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Counter:
+    def __init__(self, name, help, labels=(), registry=registry):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}")
+        return lines
+
+
+"""
+Histogram
+- observe(value, *label_values) counts value in the first bucket whose upper bound is >= value;
+  buckets are made cumulative only when rendered
+"""
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS, registry=registry):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, *label_values):
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self.series.items())
+        for label_values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = format_labels(self.labels + ("le",), label_values + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value)) if value else "0"
+    return repr(value)
+
+
+"""
+Metrics recorded by the application
+"""
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to build the response, by route pattern, method and status (_count is the number of requests)",
+    ("route", "method", "status"),
+)
+AUTH_DURATION = Histogram(
+    "auth_duration_seconds",
+    "Time spent authenticating requests, by step: header, jwks (signing key lookup), decode (JWT verification)",
+    ("step",),
+    buckets=FAST_BUCKETS,
+)
+AUTH_FAILURES = Counter("auth_failures_total", "Requests rejected by authentication, by error code", ("code",))
+DB_QUERIES = Histogram(
+    "db_queries_per_request", "Database queries run by one request, by route pattern", ("route",), COUNT_BUCKETS
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_seconds_per_request", "Database time of one request, by route pattern", ("route",), FAST_BUCKETS
+)
+
+
+"""
+Values read from the status dicts of the connection pool, the response and object caches and the token cache
+- key in the status dict -> (metric name, type, help)
+"""
+
+POOL_METRICS = {
+    "size": ("db_pool_size", "gauge", "Connections the pool keeps open"),
+    "checked_in": ("db_pool_checked_in", "gauge", "Idle connections in the pool"),
+    "checked_out": ("db_pool_checked_out", "gauge", "Connections in use"),
+    "overflow": ("db_pool_overflow", "gauge", "Connections open beyond the pool size"),
+    "waits": ("db_pool_checkouts_total", "counter", "Connections taken from the pool"),
+    "wait_seconds_total": ("db_pool_wait_seconds_total", "counter", "Seconds spent waiting for a connection"),
+    "wait_seconds_max": ("db_pool_wait_seconds_max", "gauge", "Longest wait for a connection"),
+    "timeouts": ("db_pool_timeouts_total", "counter", "Requests that gave up waiting for a connection"),
+}
+RESPONSE_CACHE_METRICS = {
+    "hits": ("response_cache_hits_total", "counter", "Responses served from the response cache"),
+    "misses": ("response_cache_misses_total", "counter", "Cacheable responses that had to be built"),
+}
+OBJECT_CACHE_METRICS = {
+    "size": ("object_cache_size", "gauge", "Rows kept by the object cache of the detail endpoints"),
+    "hits": ("object_cache_hits_total", "counter", "Detail responses served from the object cache"),
+    "misses": ("object_cache_misses_total", "counter", "Detail responses read from the database"),
+}
+TOKEN_CACHE_METRICS = {
+    "hits": ("token_cache_hits_total", "counter", "Bearer tokens found already verified"),
+    "misses": ("token_cache_misses_total", "counter", "Bearer tokens that had to be verified"),
+    "size": ("token_cache_size", "gauge", "Verified tokens remembered"),
+}
+
+
+def status_samples(metrics, status):
+    return [(name, kind, help, status[key]) for key, (name, kind, help) in metrics.items() if key in status]
+
+
+"""
+Query counting
+Database queries are counted per thread between the start and the end of a request;
+a request runs on a single thread under every worker model (sync, gthread, asgi:APP)
+"""
+
+
+class QueryStats(threading.local):
+    def __init__(self):
+        self.active = False
+        self.queries = 0
+        self.seconds = 0.0
+        self.started = 0.0
+
+
+query_stats = QueryStats()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def beforeCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    query_stats.started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def afterCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    if query_stats.active:
+        query_stats.queries += 1
+        query_stats.seconds += time.perf_counter() - query_stats.started
+
+
+"""
+Instrument_app
+- input: Flask app
+- records REQUEST_DURATION, DB_QUERIES and DB_QUERY_DURATION for every request;
+  404s without a matching route are grouped under route="unmatched"
+- streamed responses are timed until the response starts, not until the last chunk
+"""
+
+
+def instrument_app(app):
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        query_stats.active = True
+        query_stats.queries = 0
+        query_stats.seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_DURATION.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+            DB_QUERIES.observe(query_stats.queries, route)
+            DB_QUERY_DURATION.observe(query_stats.seconds, route)
+        query_stats.active = False
+        return response
+
+    return app
@@ -0,0 +1,114 @@
+import os
+import re
+import sys
+import time
+import random
+import cProfile
+import tempfile
+from flask import g, request
+
+"""
+Request profiling, off unless configured
+- PROFILE_SAMPLE_RATE: fraction of requests profiled, e.g. 0.01 (default 0)
+- PROFILE_TOKEN: requests sending the header X-Profile: <token> are profiled (default unset, header ignored)
+- PROFILE_SLOW_MS: only keep profiles of requests slower than this (default 0, keep all)
+- PROFILE_DIR: where profiles are written (default <tmp>/casting-profiles)
+- PROFILE_KEEP: how many of the latest profiles are kept (default 100)
+- a profile covers the request from the first before_request hook to the response
+  (authentication, queries, serialization), not the streaming of a streamed response
+- profiles are cProfile dumps: python -m pstats <file>, or snakeviz <file>
+- when neither PROFILE_SAMPLE_RATE nor PROFILE_TOKEN is set no hook is installed at all
+"""
+
+PROFILE_HEADER = "X-Profile"
+
+
+class RequestProfiler:
+    def __init__(self, sample_rate=0.0, token=None, slow_ms=0.0, directory=None, keep=100):
+        self.sample_rate = sample_rate
+        self.token = token
+        self.slow_ms = slow_ms
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "casting-profiles")
+        self.keep = keep
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            token=os.getenv("PROFILE_TOKEN") or None,
+            slow_ms=float(os.getenv("PROFILE_SLOW_MS", "0")),
+            directory=os.getenv("PROFILE_DIR"),
+            keep=int(os.getenv("PROFILE_KEEP", "100")),
+        )
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.token is not None
+
+    def wants(self):
+        if self.token is not None and request.headers.get(PROFILE_HEADER) == self.token:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    """
+    install(app)
+    - registers the hooks on app when profiling is enabled, does nothing otherwise
+    - the response of a profiled request names the kept profile in an X-Profile header
+    """
+
+    def install(self, app):
+        if not self.enabled:
+            return app
+
+        @app.before_request
+        def start_profile():
+            if self.wants():
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Python 3.12+ allows one active profiler per process, another request holds it
+                    return
+                g.profile = (profiler, time.perf_counter())
+
+        @app.after_request
+        def stop_profile(response):
+            path = self.stop()
+            if path is not None:
+                response.headers[PROFILE_HEADER] = os.path.basename(path)
+            return response
+
+        @app.teardown_request
+        def discard_profile(exception=None):
+            profile = g.pop("profile", None)
+            if profile is not None:
+                profile[0].disable()
+
+        return app
+
+    def stop(self):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return None
+        profiler, start = profile
+        profiler.disable()
+        milliseconds = (time.perf_counter() - start) * 1000
+        if milliseconds < self.slow_ms:
+            return None
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            route = re.sub(r"\W+", "-", request.url_rule.rule if request.url_rule else "unmatched").strip("-")
+            name = f"{time.time():.6f}_{request.method}_{route or 'root'}_{milliseconds:.0f}ms.prof"
+            path = os.path.join(self.directory, name)
+            profiler.dump_stats(path)
+            self.prune()
+            return path
+        except OSError:
+            print(sys.exc_info())
+            return None
+
+    def prune(self):
+        profiles = sorted(name for name in os.listdir(self.directory) if name.endswith(".prof"))
+        for name in profiles[: max(len(profiles) - self.keep, 0)]:
+            os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import logging
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from monitoring.metrics import Counter
+
+"""
+Slow query log, off unless configured
+- SLOW_QUERY_MS: queries taking longer are logged (default 0, disabled: no listener is installed)
+- each slow query is one JSON line on the "slow_queries" logger (stderr unless logging is configured):
+  duration, SQL, the shape of its parameters (names and types, never the values) and the route being served
+- db_slow_queries_total{route} counts them on /metrics
+"""
+
+logger = logging.getLogger("slow_queries")
+
+SLOW_QUERIES = Counter("db_slow_queries_total", "Queries slower than SLOW_QUERY_MS, by route pattern", ("route",))
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=0.0):
+        self.threshold = threshold_ms / 1000
+
+    @classmethod
+    def from_env(cls):
+        return cls(threshold_ms=float(os.getenv("SLOW_QUERY_MS", "0")))
+
+    """
+    install(target)
+    - listens to the queries of target (an engine, or every engine by default) when a threshold is set
+    - a failed query is not timed, handle_error drops its start time from the pooled connection
+    """
+
+    def install(self, target=Engine):
+        if self.threshold <= 0 or event.contains(target, "after_cursor_execute", self.after_cursor_execute):
+            return self
+        event.listen(target, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(target, "after_cursor_execute", self.after_cursor_execute)
+        event.listen(target, "handle_error", self.handle_error)
+        return self
+
+    def remove(self, target=Engine):
+        if event.contains(target, "after_cursor_execute", self.after_cursor_execute):
+            event.remove(target, "before_cursor_execute", self.before_cursor_execute)
+            event.remove(target, "after_cursor_execute", self.after_cursor_execute)
+            event.remove(target, "handle_error", self.handle_error)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("slow_query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        if seconds < self.threshold:
+            return
+
+        route = None
+        if has_request_context():
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+        SLOW_QUERIES.inc(route or "none")
+        record = {
+            "duration_ms": round(seconds * 1000, 3),
+            "statement": " ".join(statement.split()),
+            "parameters": parameter_shape(parameters, executemany),
+            "route": route,
+        }
+        logger.warning(json.dumps(record))
+
+    def handle_error(self, context):
+        # after_cursor_execute does not run for a statement that raised
+        if context.connection is None or context.statement is None:
+            return
+        starts = context.connection.info.get("slow_query_start")
+        if starts:
+            starts.pop()
+
+
+"""
+Parameter_shape
+- input: the parameters of a cursor execution
+- return their names and type names, e.g. {"title_1": "str"}; for executemany
+  the number of rows and the shape of the first one
+"""
+
+
+def parameter_shape(parameters, executemany=False):
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "row": parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+slow_query_log = SlowQueryLog.from_env()
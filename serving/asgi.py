@@ -0,0 +1,193 @@
+import io
+import sys
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+AsgiBridge
+Serves a WSGI application (the Flask app) to an ASGI server such as uvicorn.
+- connections, request bodies and responses are handled on the event loop, so idle keep-alive
+  connections, slow clients and queued requests cost a coroutine instead of a blocked worker
+- the WSGI application runs on a pool of threads, at most threads requests at a time;
+  size it to the database connection pool so a running request never waits for a connection
+- streamed responses (e.g. GET /export) are sent chunk by chunk and stop when the client disconnects
+- on_startup / on_shutdown: callables run on the thread pool when the ASGI lifespan starts and ends,
+  e.g. to fetch the JWKS before the first request instead of during it
+"""
+
+
+class AsgiBridge:
+    def __init__(self, wsgi_app, threads=15, on_startup=(), on_shutdown=()):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.on_startup = list(on_startup)
+        self.on_shutdown = list(on_shutdown)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self.http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        else:
+            raise ValueError(f"unsupported ASGI scope {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for hook in self.on_startup:
+                        await loop.run_in_executor(self.executor, hook)
+                except Exception as ex:
+                    print(sys.exc_info())
+                    await send({"type": "lifespan.startup.failed", "message": str(ex)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for hook in self.on_shutdown:
+                    try:
+                        await loop.run_in_executor(self.executor, hook)
+                    except Exception:
+                        print(sys.exc_info())
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope, receive, send):
+        body = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        loop = asyncio.get_running_loop()
+        disconnected = threading.Event()
+        watcher = loop.create_task(wait_disconnect(receive, disconnected))
+        try:
+            environ = wsgi_environ(scope, b"".join(body))
+            await loop.run_in_executor(self.executor, self.run, environ, loop, send, disconnected)
+        finally:
+            watcher.cancel()
+
+    """
+    run(environ, loop, send, disconnected)
+    - runs on a pool thread: calls the WSGI application and hands its response to the event loop
+    - one chunk is held back so a response that fits one chunk is sent with a single message,
+      and the last chunk carries more_body=False
+    """
+
+    def run(self, environ, loop, send, disconnected):
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            headers = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers]
+            start.update(type="http.response.start", status=int(status.split(" ", 1)[0]), headers=headers)
+
+        def emit(*messages):
+            asyncio.run_coroutine_threadsafe(send_all(send, messages), loop).result()
+
+        try:
+            result = self.wsgi_app(environ, start_response)
+        except Exception:
+            print(sys.exc_info())
+            emit(*error_response())
+            return
+
+        try:
+            pending = None
+            for chunk in result:
+                if disconnected.is_set():
+                    return
+                if not chunk:
+                    continue
+                if pending is not None:
+                    messages = [] if start.get("sent") else [response_start(start)]
+                    emit(*messages, {"type": "http.response.body", "body": pending, "more_body": True})
+                pending = chunk
+            messages = [] if start.get("sent") else [response_start(start)]
+            emit(*messages, {"type": "http.response.body", "body": pending or b""})
+        except Exception:
+            print(sys.exc_info())
+            if not start.get("sent"):
+                emit(*error_response())
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+
+
+def response_start(start):
+    start["sent"] = True
+    return {"type": start["type"], "status": start["status"], "headers": start["headers"]}
+
+
+def error_response():
+    return (
+        {"type": "http.response.start", "status": 500, "headers": [(b"content-type", b"application/json")]},
+        {"type": "http.response.body", "body": b'{"error":500,"message":"Internal Server Error","success":false}'},
+    )
+
+
+async def send_all(send, messages):
+    for message in messages:
+        await send(message)
+
+
+async def wait_disconnect(receive, disconnected):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+"""
+Wsgi_environ
+- inputs: ASGI http scope, request body
+- return the PEP 3333 environ of the request
+"""
+
+
+def wsgi_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+
+    for name, value in scope.get("headers", ()):
+        name = name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        # repeated headers are folded into one comma separated value, as WSGI servers do
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # the whole body has been read, which also covers bodies sent with chunked transfer encoding
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
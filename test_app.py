@@ -2,9 +2,48 @@ import os
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+os.environ.setdefault("AUTH0_DOMAIN", "casting.test")
+os.environ.setdefault("ALGORITHMS", "RS256")
+os.environ.setdefault("API_AUDIENCE", "casting")
 
 from app import create_app
-from database.models import setup_db
+from database.models import db, setup_db
+from auth.local_keys import LocalKeys
+
+"""
+Bearer tokens of the three roles
+- taken from CASTING_ASSISTANT_TOKEN, CASTING_DIRECTOR_TOKEN and EXECUTIVE_PRODUCER_TOKEN when they are set
+- otherwise signed locally with the permissions of each role, without Auth0 or network access
+"""
+
+ROLE_PERMISSIONS = {
+    "CASTING_ASSISTANT_TOKEN": ["get:actors", "get:movies"],
+    "CASTING_DIRECTOR_TOKEN": [
+        "delete:actors",
+        "get:actors",
+        "get:movies",
+        "patch:actors",
+        "patch:movies",
+        "post:actors",
+    ],
+    "EXECUTIVE_PRODUCER_TOKEN": [
+        "delete:actors",
+        "delete:movies",
+        "get:actors",
+        "get:movies",
+        "patch:actors",
+        "patch:movies",
+        "post:actors",
+        "post:movies",
+    ],
+}
+
+if not all(os.getenv(name) for name in ROLE_PERMISSIONS):
+    local_keys = LocalKeys().install()
+    for name, permissions in ROLE_PERMISSIONS.items():
+        os.environ[name] = local_keys.token(permissions, sub=name.lower(), expires_in=24 * 3600)
 
 test_database_path = os.getenv("TEST_DATABASE_URL").replace("\r", "")
 castingAssistant_BearerToken = os.getenv("CASTING_ASSISTANT_TOKEN").replace("\r", "")
@@ -58,6 +97,57 @@ class CastingAgencyTest(unittest.TestCase):
         self.assertEqual(data["success"], True)
         self.assertTrue(len(data["movies"]))
 
+    """
+    Test GetMovies pagination Role: Casting Assistant
+    """
+
+    def test_getMovies_paginated(self):
+        res = self.client().get(
+            "/movies?limit=1&fields=title", headers={"Authorization": "Bearer {}".format(self.castingAssistant)}
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data["movies"]), 1)
+        self.assertEqual(set(data["movies"][0]), {"id", "title"})
+        self.assertIn("next_cursor", data)
+
+    """
+    Test GetMovies not modified Role: Casting Assistant
+    """
+
+    def test_getMovies_not_modified(self):
+        headers = {"Authorization": "Bearer {}".format(self.castingAssistant)}
+        etag = self.client().get("/movies", headers=headers).headers["ETag"]
+        res = self.client().get("/movies", headers=dict(headers, **{"If-None-Match": etag}))
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+
+    """
+    Test Search Role: Casting Assistant
+    """
+
+    def test_search(self):
+        res = self.client().get("/search?q=a", headers={"Authorization": "Bearer {}".format(self.castingAssistant)})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data["success"])
+        self.assertIn("next_cursor", data)
+        self.assertTrue(all(result["type"] in ("movie", "actor") for result in data["results"]))
+
+    """
+    Test Search without q Role: Casting Assistant
+    """
+
+    def test_search_without_q(self):
+        res = self.client().get("/search", headers={"Authorization": "Bearer {}".format(self.castingAssistant)})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data["message"], "Bad Request")
+
     """
     Test GetMovies Role:Public
     """
@@ -247,6 +337,113 @@ class CastingAgencyTest(unittest.TestCase):
         self.assertEqual(res2.status_code, 200)
         self.assertTrue(data["movie"])
 
+    """
+    Test GetMovie Role: Casting Assistant, served from the object cache until the movie is edited
+    """
+
+    def test_getMovie_cached_until_edited(self):
+        res = self.client().post(
+            "/movies", json=self.new_movie, headers={"Authorization": "Bearer {}".format(self.executiveProducer)}
+        )
+        id = json.loads(res.data)["id"]
+        headers = {"Authorization": "Bearer {}".format(self.castingAssistant)}
+
+        res1 = self.client().get("/movies/{}".format(id), headers=headers)
+        with self.app.app_context():
+            engine = db.engine
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            res2 = self.client().get("/movies/{}".format(id), headers=headers)
+            unchanged = self.client().get(
+                "/movies/{}".format(id), headers=dict(headers, **{"If-None-Match": res1.headers["ETag"]})
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        self.client().patch(
+            "/movies/{}".format(id),
+            json=self.edit_movie,
+            headers={"Authorization": "Bearer {}".format(self.executiveProducer)},
+        )
+        res3 = self.client().get(
+            "/movies/{}".format(id), headers=dict(headers, **{"If-None-Match": res1.headers["ETag"]})
+        )
+
+        self.assertEqual(res1.status_code, 200)
+        self.assertEqual(json.loads(res1.data)["movie"]["title"], self.new_movie["title"])
+        self.assertEqual((res1.headers["X-Cache"], res2.headers["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual((unchanged.status_code, unchanged.data), (304, b""))
+        self.assertEqual(statements, [])
+        self.assertEqual(res3.status_code, 200)
+        self.assertEqual(json.loads(res3.data)["movie"]["title"], self.edit_movie["title"])
+
+    """
+    Test GetActor Role: Casting Assistant, 404 once the actor is deleted
+    """
+
+    def test_getActor_deleted(self):
+        res = self.client().post(
+            "/actors", json=self.new_actor, headers={"Authorization": "Bearer {}".format(self.castingDirector)}
+        )
+        id = json.loads(res.data)["id"]
+        headers = {"Authorization": "Bearer {}".format(self.castingAssistant)}
+
+        res1 = self.client().get("/actors/{}".format(id), headers=headers)
+        director = {"Authorization": "Bearer {}".format(self.castingDirector)}
+        self.client().delete("/actors/{}".format(id), headers=director)
+        res2 = self.client().get("/actors/{}".format(id), headers=headers)
+
+        self.assertEqual(json.loads(res1.data)["actor"]["name"], self.new_actor["name"])
+        self.assertEqual(res2.status_code, 404)
+
+    """
+    Test EditMovie partial update Role: Executive Producer, only the supplied fields change
+    """
+
+    def test_editMovie_partial(self):
+        headers = {"Authorization": "Bearer {}".format(self.executiveProducer)}
+        res1 = self.client().post("/movies", json=self.new_movie, headers=headers)
+        id = json.loads(res1.data)["id"]
+
+        res2 = self.client().patch("/movies/{}".format(id), json={"title": "Mad Max 3"}, headers=headers)
+        data = json.loads(res2.data)
+
+        self.assertEqual(res2.status_code, 200)
+        self.assertEqual(data["movie"]["title"], "Mad Max 3")
+        self.assertEqual(data["movie"]["release_date"], "Sun, 10 Jan 2016 00:00:00 GMT")
+
+    """
+    Test EditMovie and DeleteMovie of a missing movie Role: Executive Producer
+    """
+
+    def test_editMovie_deleteMovie_not_found(self):
+        headers = {"Authorization": "Bearer {}".format(self.executiveProducer)}
+        res1 = self.client().patch("/movies/999999", json=self.edit_movie, headers=headers)
+        res2 = self.client().delete("/movies/999999", headers=headers)
+        res3 = self.client().patch("/movies/1", json={"release_date": "soon"}, headers=headers)
+
+        self.assertEqual((res1.status_code, res2.status_code, res3.status_code), (404, 404, 400))
+
+    """
+    Test CreateActor and EditActor with invalid payloads Role: Casting Director
+    """
+
+    def test_createActor_editActor_invalid(self):
+        headers = {"Authorization": "Bearer {}".format(self.castingDirector)}
+        res1 = self.client().post("/actors", json={"name": "", "age": 200, "gender": "Male"}, headers=headers)
+        res2 = self.client().post("/actors", data="name=Ann", headers=headers)
+        res3 = self.client().patch("/actors/1", json={"gender": 1}, headers=headers)
+        data = json.loads(res1.data)
+
+        self.assertEqual((res1.status_code, res2.status_code, res3.status_code), (400, 400, 400))
+        self.assertFalse(data["success"])
+        self.assertEqual([error["field"] for error in data["errors"]], ["name", "age"])
+        self.assertEqual(json.loads(res3.data)["errors"][0]["field"], "gender")
+
     """
     Test EditMovie Role: Casting Director
     """
@@ -0,0 +1,183 @@
+import json
+import time
+import asyncio
+import threading
+import unittest
+from flask import Flask, Response, jsonify, request
+
+from serving.asgi import AsgiBridge
+
+
+def http_scope(method, path, query=b"", headers=()):
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+        "http_version": "1.1",
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 5000),
+    }
+
+
+"""
+Call
+- runs one ASGI request against app, feeding it the given receive messages
+  (then waiting forever, like a client that stays connected)
+- return the messages the app sent
+"""
+
+
+async def call_async(app, scope, received=({"type": "http.request", "body": b""},)):
+    queue = list(received)
+    sent = []
+
+    async def receive():
+        if queue:
+            message = queue.pop(0)
+            if message.get("delay"):
+                await asyncio.sleep(message["delay"])
+            return message
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+def call(app, scope, *received):
+    return asyncio.run(call_async(app, scope, *received))
+
+
+class AsgiBridgeTest(unittest.TestCase):
+    def setUp(self):
+        flask_app = Flask(__name__)
+        self.closed = threading.Event()
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+        @flask_app.route("/echo", methods=["GET", "POST"])
+        def echo():
+            return jsonify(
+                {
+                    "args": request.args.to_dict(),
+                    "json": request.get_json(silent=True),
+                    "token": request.headers.get("Authorization"),
+                    "remote": request.remote_addr,
+                }
+            )
+
+        @flask_app.route("/stream")
+        def stream():
+            def chunks():
+                try:
+                    for i in range(3):
+                        time.sleep(0.05)
+                        yield f"chunk{i}\n"
+                finally:
+                    self.closed.set()
+
+            return Response(chunks(), mimetype="text/plain")
+
+        @flask_app.route("/slow")
+        def slow():
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.05)
+            with self.lock:
+                self.running -= 1
+            return "ok"
+
+        self.app = AsgiBridge(flask_app, threads=2)
+
+    """
+    Path, query string, headers and body reach the Flask view, its response is sent in one body message
+    """
+
+    def test_request_and_response(self):
+        scope = http_scope(
+            "POST",
+            "/echo",
+            query=b"limit=5",
+            headers=[("content-type", "application/json"), ("authorization", "Bearer abc")],
+        )
+        body = [
+            {"type": "http.request", "body": b'{"title": ', "more_body": True},
+            {"type": "http.request", "body": b'"Mad Max"}'},
+        ]
+        start, message = call(self.app, scope, body)
+
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"application/json"), start["headers"])
+        self.assertFalse(message.get("more_body"))
+        self.assertEqual(
+            json.loads(message["body"]),
+            {"args": {"limit": "5"}, "json": {"title": "Mad Max"}, "token": "Bearer abc", "remote": "127.0.0.1"},
+        )
+
+        start, message = call(self.app, http_scope("GET", "/missing"))
+        self.assertEqual(start["status"], 404)
+
+    """
+    Streamed responses are sent chunk by chunk and stopped when the client goes away
+    """
+
+    def test_streaming_and_disconnect(self):
+        sent = call(self.app, http_scope("GET", "/stream"))
+        self.assertEqual([message.get("body") for message in sent[1:]], [b"chunk0\n", b"chunk1\n", b"chunk2\n"])
+        self.assertEqual([message.get("more_body", False) for message in sent[1:]], [True, True, False])
+
+        self.closed.clear()
+        received = [{"type": "http.request", "body": b""}, {"type": "http.disconnect", "delay": 0.06}]
+        sent = call(self.app, http_scope("GET", "/stream"), received)
+        self.assertLess(len(sent), 4)
+        self.assertTrue(self.closed.wait(1))
+
+    """
+    No more than threads requests run at once, the others wait on the event loop
+    """
+
+    def test_concurrency_limit(self):
+        async def run():
+            return await asyncio.gather(*[call_async(self.app, http_scope("GET", "/slow")) for _ in range(6)])
+
+        self.assertEqual([sent[0]["status"] for sent in asyncio.run(run())], [200] * 6)
+        self.assertEqual(self.max_running, 2)
+
+    """
+    Exceptions escaping the application become a 500 response
+    """
+
+    def test_errors(self):
+        self.app.wsgi_app = lambda environ, start_response: 1 / 0
+        start, message = call(self.app, http_scope("GET", "/echo"))
+        self.assertEqual(start["status"], 500)
+        self.assertIn(b"Internal Server Error", message["body"])
+
+    """
+    Lifespan events run the startup and shutdown hooks, a failing hook fails the startup
+    """
+
+    def test_lifespan(self):
+        calls = []
+        self.app.on_startup.append(lambda: calls.append("startup"))
+        self.app.on_shutdown.append(lambda: calls.append("shutdown"))
+        received = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = call(self.app, {"type": "lifespan"}, received)
+        self.assertEqual(
+            [message["type"] for message in sent], ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+        )
+        self.assertEqual(calls, ["startup", "shutdown"])
+
+        app = AsgiBridge(None, on_startup=[lambda: 1 / 0])
+        sent = call(app, {"type": "lifespan"}, [{"type": "lifespan.startup"}])
+        self.assertEqual(sent[0]["type"], "lifespan.startup.failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,441 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+from flask import Flask, jsonify
+
+os.environ.setdefault("AUTH0_DOMAIN", "casting.test")
+os.environ.setdefault("ALGORITHMS", "RS256")
+os.environ.setdefault("API_AUDIENCE", "casting")
+
+from auth.jwks import JWKSKeyStore
+from auth.token_cache import TokenCache
+from auth.auth import AuthError, check_permissions, permission_set, requires_auth, use_key_provider, key_store
+from auth.local_keys import LocalKeys
+from auth.rate_limit import MemoryBuckets, SharedBuckets, RateLimiter, RateLimitExceeded, rate_limiter
+
+
+def jwk(kid):
+    return {"kty": "RSA", "kid": kid, "use": "sig", "n": "n-" + kid, "e": "AQAB"}
+
+
+class CountingFetcher:
+    def __init__(self, *kids, cache_control=None, delay=0):
+        self.kids = list(kids)
+        self.cache_control = cache_control
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self, url, timeout):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise OSError("jwks endpoint down")
+        headers = {"Cache-Control": self.cache_control} if self.cache_control else {}
+        return json.dumps({"keys": [jwk(kid) for kid in self.kids]}), headers
+
+
+class JWKSKeyStoreTest(unittest.TestCase):
+    def make_store(self, fetcher, **kwargs):
+        store = JWKSKeyStore("https://casting.test/.well-known/jwks.json", fetcher=fetcher, **kwargs)
+        self.addCleanup(store.stop_background_refresh)
+        return store
+
+    """
+    Keys are fetched once and then served from memory
+    """
+
+    def test_get_key_fetches_once(self):
+        fetcher = CountingFetcher("a", "b")
+        store = self.make_store(fetcher)
+
+        for _ in range(100):
+            self.assertEqual(store.get_key("a")["kid"], "a")
+            self.assertEqual(store.get_key("b")["kid"], "b")
+
+        self.assertEqual(fetcher.calls, 1)
+
+    """
+    A local JWKS file works as a stand-in for Auth0
+    """
+
+    def test_file_url(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"keys": [jwk("local")]}, f)
+        self.addCleanup(os.remove, f.name)
+
+        store = JWKSKeyStore("file://" + f.name)
+        self.addCleanup(store.stop_background_refresh)
+
+        self.assertEqual(store.get_key("local")["n"], "n-local")
+
+    """
+    Cache-Control max-age sets the expiry of the key set
+    """
+
+    def test_cache_control_max_age(self):
+        fetcher = CountingFetcher("a", cache_control="public, max-age=42")
+        store = self.make_store(fetcher)
+        store.get_key("a")
+
+        self.assertAlmostEqual(store._expires_at - store._fetched_at, 42, places=3)
+
+    """
+    Concurrent lookups of an unknown kid share a single refetch
+    """
+
+    def test_unknown_kid_single_flight(self):
+        fetcher = CountingFetcher("a", delay=0.05)
+        store = self.make_store(fetcher, min_refetch_interval=0)
+        store.get_key("a")
+        fetcher.kids.append("rotated")
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.get_key("rotated"))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(fetcher.calls, 2)
+        self.assertTrue(all(key["kid"] == "rotated" for key in results))
+
+    """
+    Unknown kids do not trigger a refetch more often than min_refetch_interval
+    """
+
+    def test_unknown_kid_rate_limited(self):
+        fetcher = CountingFetcher("a")
+        store = self.make_store(fetcher, min_refetch_interval=60)
+        store.get_key("a")
+
+        for _ in range(10):
+            self.assertIsNone(store.get_key("bogus"))
+
+        self.assertEqual(fetcher.calls, 1)
+
+    """
+    Expired keys are still served while the endpoint is down
+    """
+
+    def test_stale_while_revalidate(self):
+        fetcher = CountingFetcher("a", cache_control="max-age=0")
+        store = self.make_store(fetcher, stale_ttl=3600)
+        store.get_key("a")
+        fetcher.fail = True
+
+        self.assertEqual(store.get_key("a")["kid"], "a")
+
+    """
+    Listeners are told which kids disappeared when the key set rotates
+    """
+
+    def test_rotation_listener(self):
+        fetcher = CountingFetcher("a", "b")
+        store = self.make_store(fetcher)
+        removed = []
+        store.add_listener(removed.append)
+        store.get_key("a")
+
+        fetcher.kids = ["b", "c"]
+        store.refresh()
+
+        self.assertEqual(removed, [{"a"}])
+        self.assertIsNotNone(store.get_key("c"))
+
+
+class TokenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000
+        self.cache = TokenCache(maxsize=2, clock=lambda: self.now)
+
+    """
+    A cached token is served until its exp claim
+    """
+
+    def test_hit_until_exp(self):
+        payload = {"sub": "user", "exp": 1010}
+        self.cache.put("token", payload, "kid1", frozenset(["get:movies"]))
+
+        self.assertEqual(self.cache.get("token"), (payload, frozenset(["get:movies"])))
+        self.now = 1010
+        self.assertIsNone(self.cache.get("token"))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(len(self.cache), 0)
+
+    """
+    Tokens without exp or already expired are not cached
+    """
+
+    def test_put_skips_uncacheable(self):
+        self.cache.put("no-exp", {"sub": "user"}, "kid1")
+        self.cache.put("expired", {"sub": "user", "exp": 999}, "kid1")
+
+        self.assertEqual(len(self.cache), 0)
+
+    """
+    The least recently used token is evicted beyond maxsize
+    """
+
+    def test_lru_eviction(self):
+        self.cache.put("a", {"exp": 2000}, "kid1")
+        self.cache.put("b", {"exp": 2000}, "kid1")
+        self.cache.get("a")
+        self.cache.put("c", {"exp": 2000}, "kid1")
+
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.evictions, 1)
+
+    """
+    Rotating a signing key out of the JWKS drops the tokens it verified
+    """
+
+    def test_invalidated_on_key_rotation(self):
+        fetcher = CountingFetcher("kid1", "kid2")
+        store = JWKSKeyStore("https://casting.test/.well-known/jwks.json", fetcher=fetcher)
+        self.addCleanup(store.stop_background_refresh)
+        store.add_listener(self.cache.invalidate_kids)
+        store.get_key("kid1")
+        self.cache.put("a", {"exp": 2000}, "kid1")
+        self.cache.put("b", {"exp": 2000}, "kid2")
+
+        fetcher.kids = ["kid2"]
+        store.refresh()
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("b"))
+
+
+class CheckPermissionsTest(unittest.TestCase):
+    def setUp(self):
+        self.payload = {"permissions": ["get:movies", "get:actors", "post:actors"]}
+        self.permissions = permission_set(self.payload)
+
+    def assertForbidden(self, *args, **kwargs):
+        with self.assertRaises(AuthError) as ctx:
+            check_permissions(*args, **kwargs)
+        self.assertEqual(ctx.exception.status_code, 403)
+
+    """
+    A single permission string is still accepted
+    """
+
+    def test_single_permission(self):
+        self.assertTrue(check_permissions("get:movies", self.payload))
+        self.assertForbidden("post:movies", self.payload)
+
+    """
+    All requested permissions are needed by default
+    """
+
+    def test_all_of(self):
+        required = frozenset(["get:actors", "post:actors"])
+        self.assertTrue(check_permissions(required, self.payload, self.permissions))
+        self.assertForbidden(frozenset(["get:actors", "delete:actors"]), self.payload, self.permissions)
+
+    """
+    any_of accepts one matching permission
+    """
+
+    def test_any_of(self):
+        required = frozenset(["delete:actors", "post:actors"])
+        self.assertTrue(check_permissions(required, self.payload, self.permissions, any_of=True))
+        self.assertForbidden(frozenset(["delete:actors"]), self.payload, self.permissions, any_of=True)
+
+    """
+    A token without a permissions claim is rejected with 400
+    """
+
+    def test_missing_permissions_claim(self):
+        with self.assertRaises(AuthError) as ctx:
+            check_permissions("get:movies", {"sub": "user"})
+        self.assertEqual(ctx.exception.status_code, 400)
+
+
+class LocalKeysTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.keys = LocalKeys(kid="test")
+        app = Flask(__name__)
+
+        @app.route("/movies")
+        @requires_auth("get:movies")
+        def movies(payload):
+            return jsonify({"sub": payload["sub"]})
+
+        @app.errorhandler(AuthError)
+        def auth_error(error):
+            return jsonify(error.error), error.status_code
+
+        cls.client = app.test_client()
+
+    def setUp(self):
+        self.keys.install()
+        self.addCleanup(use_key_provider, None)
+        self.addCleanup(key_store.stop_background_refresh)
+
+    def get(self, authorization):
+        res = self.client.get("/movies", headers={"Authorization": authorization})
+        return res.status_code, res.get_json()
+
+    """
+    Locally signed tokens are verified like Auth0 ones, without network access
+    """
+
+    def test_signed_tokens(self):
+        self.assertEqual(self.get("Bearer " + self.keys.token(["get:movies"], sub="alice")), (200, {"sub": "alice"}))
+        self.assertEqual(self.get("Bearer " + self.keys.token(["get:actors"]))[0], 403)
+        expired = self.keys.token(["get:movies"], expires_in=-10)
+        self.assertEqual(self.get("Bearer " + expired), (401, {"code": "token_expired", "message": "Token expired"}))
+        other_audience = self.keys.token(["get:movies"], aud="other")
+        self.assertEqual(self.get("Bearer " + other_audience)[1]["code"], "invalid_claims")
+
+    """
+    Malformed authorization headers and tokens are rejected with 401
+    """
+
+    def test_malformed(self):
+        for authorization in ("Bearer x.y.z", "Bearer", "Basic abc", "Bearer a b"):
+            self.assertEqual(self.get(authorization)[0], 401, authorization)
+
+    """
+    Tokens signed by a key that rotated out of the JWKS are rejected
+    """
+
+    def test_rotation(self):
+        old = self.keys.token(["get:movies"])
+        self.addCleanup(self.keys.rotate, "test")
+        self.keys.rotate()
+        self.keys.install()
+
+        self.assertEqual(self.get("Bearer " + old)[0], 400)
+        self.assertEqual(self.get("Bearer " + self.keys.token(["get:movies"]))[0], 200)
+
+    """
+    The JWKS can be served over HTTP to servers running in other processes
+    """
+
+    def test_serve(self):
+        url = self.keys.serve()
+        self.addCleanup(self.keys.stop)
+        store = JWKSKeyStore(url)
+        self.addCleanup(store.stop_background_refresh)
+
+        self.assertEqual(store.get_key("test")["n"], self.keys.jwks()["keys"][0]["n"])
+
+
+class LocalScripts:
+    """In-memory stand-in for the redis client used by SharedBuckets, running the token bucket in Python"""
+
+    def __init__(self):
+        self.buckets = MemoryBuckets()
+        self.keys = []
+
+    def register_script(self, script):
+        def run(keys, args):
+            self.keys += keys
+            rate, burst, cost = args
+            return str(self.buckets.take(keys[0], cost, rate, burst))
+
+        return run
+
+
+class RateLimitTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.buckets = MemoryBuckets(clock=lambda: self.now)
+
+    """
+    A bucket serves burst tokens at once, then refills at rate tokens per second
+    """
+
+    def test_token_bucket(self):
+        self.assertEqual([self.buckets.take("alice", 1, 2, 3) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(self.buckets.take("alice", 1, 2, 3), 0.5)
+        self.assertEqual(self.buckets.take("bob", 1, 2, 3), 0)
+
+        self.now += 0.5
+        self.assertEqual(self.buckets.take("alice", 1, 2, 3), 0)
+        self.now += 60
+        self.assertEqual([self.buckets.take("alice", 1, 2, 3) for _ in range(4)], [0, 0, 0, 0.5])
+
+    """
+    Requests cost the route cost, else the highest cost of their permissions, capped at burst
+    """
+
+    def test_costs(self):
+        limiter = RateLimiter(rate=1, burst=5, costs={"get:actors": 3, "delete": 4}, backend=self.buckets)
+        self.assertEqual(limiter.cost(frozenset(["get:movies"])), 1)
+        self.assertEqual(limiter.cost(frozenset(["get:movies", "get:actors"])), 3)
+        self.assertEqual(limiter.cost(frozenset(["delete:movies"])), 4)
+        self.assertEqual(limiter.cost(frozenset(["post:movies"])), 2)
+
+        limiter.admit({"sub": "alice"}, cost=50)
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            limiter.admit({"sub": "alice"}, frozenset(["get:movies"]))
+        self.assertEqual(ctx.exception.retry_after, 1)
+
+    """
+    Without a rate nothing is limited
+    """
+
+    def test_disabled(self):
+        limiter = RateLimiter(backend=self.buckets)
+        for _ in range(100):
+            limiter.admit({"sub": "alice"}, cost=10)
+        self.assertEqual(len(self.buckets._buckets), 0)
+
+    """
+    Shared buckets run the token bucket in the store, keyed by sub
+    """
+
+    def test_shared_buckets(self):
+        client = LocalScripts()
+        limiter = RateLimiter(rate=1, burst=2, backend=SharedBuckets(client))
+        limiter.admit({"sub": "alice"})
+        limiter.admit({"sub": "alice"})
+        self.assertRaises(RateLimitExceeded, limiter.admit, {"sub": "alice"})
+        self.assertEqual(client.keys, ["casting:ratelimit:alice"] * 3)
+
+    """
+    Over the limit, requests get 429 with Retry-After before the view runs
+    """
+
+    def test_requires_auth(self):
+        keys = LocalKeys().install()
+        self.addCleanup(use_key_provider, None)
+        self.addCleanup(key_store.stop_background_refresh)
+        for name, value in (("rate", 1.0), ("burst", 3.0), ("backend", self.buckets)):
+            self.addCleanup(setattr, rate_limiter, name, getattr(rate_limiter, name))
+            setattr(rate_limiter, name, value)
+
+        app = Flask(__name__)
+        calls = []
+
+        @app.route("/movies")
+        @requires_auth("get:movies", cost=2)
+        def movies(payload):
+            calls.append(payload["sub"])
+            return jsonify({"success": True})
+
+        @app.errorhandler(RateLimitExceeded)
+        def too_many_requests(ex):
+            return jsonify({"error": 429}), 429, {"Retry-After": str(ex.retry_after)}
+
+        client = app.test_client()
+        alice = {"Authorization": "Bearer " + keys.token(["get:movies"], sub="alice")}
+        bob = {"Authorization": "Bearer " + keys.token(["get:movies"], sub="bob")}
+
+        self.assertEqual(client.get("/movies", headers=alice).status_code, 200)
+        res = client.get("/movies", headers=alice)
+        self.assertEqual((res.status_code, res.headers["Retry-After"]), (429, "1"))
+        self.assertEqual(client.get("/movies", headers=bob).status_code, 200)
+        self.assertEqual(calls, ["alice", "bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,236 @@
+import time
+import unittest
+from datetime import datetime
+from flask import Flask, jsonify, abort, request
+
+from cache.response_cache import ResponseCache, MemoryBackend, SharedBackend
+from cache.conditional import conditional
+from cache.object_cache import ObjectCache
+
+
+class LocalRedis:
+    """In-memory stand-in for the subset of the redis client used by SharedBackend"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, time.time() + ex if ex else None)
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def incr(self, key):
+        value = int(self.get(key) or 0) + 1
+        self.data[key] = (str(value).encode(), None)
+        return value
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def make_app(self, cache):
+        app = Flask(__name__)
+        self.movies = ["Mad Max"]
+        self.updated_at = datetime(2020, 1, 1)
+        self.calls = 0
+
+        def with_payload(f):
+            def wrapper(*args, **kwargs):
+                permissions = request.headers.get("X-Permissions", "get:movies").split(",")
+                return f({"permissions": permissions}, *args, **kwargs)
+
+            wrapper.__name__ = f.__name__
+            return wrapper
+
+        @app.route("/movies")
+        @with_payload
+        @cache.cached("movies")
+        @conditional(lambda: (len(self.movies), self.updated_at))
+        def getMovies(payload):
+            self.calls += 1
+            if not self.movies:
+                abort(404)
+            return jsonify({"success": True, "movies": self.movies}), 200
+
+        @app.route("/movies", methods=["POST"])
+        @with_payload
+        @cache.invalidates("movies")
+        def createMovie(payload):
+            self.movies.append("Inception")
+            self.updated_at = datetime.utcnow()
+            return jsonify({"success": True}), 200
+
+        return app.test_client()
+
+    """
+    A repeated GET is served from the cache until a write invalidates it
+    """
+
+    def test_read_through_and_invalidate(self):
+        cache = ResponseCache(MemoryBackend(), ttl=30)
+        client = self.make_app(cache)
+
+        self.assertEqual(client.get("/movies").headers["X-Cache"], "MISS")
+        res = client.get("/movies")
+        self.assertEqual(res.headers["X-Cache"], "HIT")
+        self.assertEqual(res.get_json()["movies"], ["Mad Max"])
+        self.assertEqual(self.calls, 1)
+
+        client.post("/movies")
+        res = client.get("/movies")
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+        self.assertEqual(res.get_json()["movies"], ["Mad Max", "Inception"])
+        self.assertEqual(cache.stats()["hit_ratio"], 1 / 3)
+
+    """
+    Query parameters and permission scope are part of the key
+    """
+
+    def test_key_includes_query_and_scope(self):
+        cache = ResponseCache(MemoryBackend(), ttl=30)
+        client = self.make_app(cache)
+
+        client.get("/movies")
+        self.assertEqual(client.get("/movies?limit=1").headers["X-Cache"], "MISS")
+        res = client.get("/movies", headers={"X-Permissions": "get:movies,get:actors"})
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+        self.assertEqual(self.calls, 3)
+
+    """
+    Error responses are not cached and ttl=0 disables caching
+    """
+
+    def test_errors_and_disabled(self):
+        cache = ResponseCache(MemoryBackend(), ttl=30)
+        client = self.make_app(cache)
+        self.movies.clear()
+        client.get("/movies")
+        client.get("/movies")
+        self.assertEqual(self.calls, 2)
+
+        cache.ttl = 0
+        self.movies.append("Mad Max")
+        client.get("/movies")
+        client.get("/movies")
+        self.assertEqual(self.calls, 4)
+
+    """
+    Unchanged versions answer 304 without running the view, with and without a cached response
+    """
+
+    def test_conditional_requests(self):
+        cache = ResponseCache(MemoryBackend(), ttl=30)
+        client = self.make_app(cache)
+
+        res = client.get("/movies")
+        etag, last_modified = res.headers["ETag"], res.headers["Last-Modified"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(last_modified, "Wed, 01 Jan 2020 00:00:00 GMT")
+
+        res = client.get("/movies", headers={"If-None-Match": etag})
+        self.assertEqual((res.status_code, res.headers["X-Cache"], res.data), (304, "HIT", b""))
+        cache.ttl = 0
+        self.assertEqual(client.get("/movies", headers={"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(client.get("/movies", headers={"If-Modified-Since": last_modified}).status_code, 304)
+        self.assertEqual(self.calls, 1)
+
+        client.post("/movies")
+        res = client.get("/movies", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+        res = client.get("/movies", headers={"If-None-Match": etag, "X-Permissions": "get:movies,get:actors"})
+        self.assertEqual(res.status_code, 200)
+
+    """
+    The memory backend expires entries and evicts the least recently used ones
+    """
+
+    def test_memory_backend_expiry_and_lru(self):
+        backend = MemoryBackend(maxsize=2)
+        backend.set("a", b"1", ttl=0.01)
+        backend.set("b", b"2", ttl=30)
+        time.sleep(0.02)
+        self.assertIsNone(backend.get("a"))
+
+        backend.set("c", b"3", ttl=30)
+        backend.get("b")
+        backend.set("d", b"4", ttl=30)
+        self.assertIsNone(backend.get("c"))
+        self.assertEqual(backend.get("b"), b"2")
+
+    """
+    A shared backend invalidates every process reading from it
+    """
+
+    def test_shared_backend(self):
+        store = LocalRedis()
+        writer = ResponseCache(SharedBackend(store), ttl=30)
+        reader = ResponseCache(SharedBackend(store), ttl=30)
+        writer_client = self.make_app(writer)
+        reader_client = self.make_app(reader)
+
+        writer_client.get("/movies")
+        self.assertEqual(reader_client.get("/movies").headers["X-Cache"], "HIT")
+
+        writer_client.post("/movies")
+        self.assertEqual(reader_client.get("/movies").headers["X-Cache"], "MISS")
+
+
+class ObjectCacheTest(unittest.TestCase):
+    """
+    Rows are served until they expire or are evicted, least recently used first
+    """
+
+    def test_lookup_expiry_and_lru(self):
+        cache = ObjectCache(maxsize=2, ttl=30)
+        for id in (1, 2):
+            value, stamp = cache.lookup("movies", id)
+            cache.set("movies", id, b"movie %d" % id, stamp)
+        cache.lookup("movies", 1)
+        cache.set("movies", 3, b"movie 3", cache.lookup("movies", 3)[1])
+
+        self.assertEqual(cache.lookup("movies", 1)[0], b"movie 1")
+        self.assertIsNone(cache.lookup("movies", 2)[0])
+        self.assertIsNone(cache.lookup("actors", 1)[0])
+
+        cache.ttl = 0.01
+        cache.set("actors", 1, b"actor 1", cache.lookup("actors", 1)[1])
+        time.sleep(0.02)
+        self.assertIsNone(cache.lookup("actors", 1)[0])
+
+    """
+    Writes invalidate the row, and a row read before an invalidation is not stored
+    """
+
+    def test_invalidation(self):
+        cache = ObjectCache(ttl=30)
+        app = Flask(__name__)
+
+        @app.route("/movies/<movie_id>", methods=["DELETE"])
+        @cache.invalidates("movies", "movie_id")
+        def delete_movie(movie_id):
+            return "deleted"
+
+        cache.set("movies", 7, b"movie 7", cache.lookup("movies", 7)[1])
+        app.test_client().delete("/movies/7")
+        value, stamp = cache.lookup("movies", 7)
+        self.assertIsNone(value)
+
+        cache.invalidate("movies", 7)
+        cache.set("movies", 7, b"old movie 7", stamp)
+        self.assertIsNone(cache.lookup("movies", 7)[0])
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_disabled(self):
+        cache = ObjectCache(ttl=0)
+        cache.set("movies", 1, b"movie 1", cache.lookup("movies", 1)[1])
+        self.assertIsNone(cache.lookup("movies", 1)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,293 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+import subprocess
+from datetime import date
+from flask import Flask, abort, request
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("AUTH0_DOMAIN", "casting.test")
+os.environ.setdefault("ALGORITHMS", "RS256")
+os.environ.setdefault("API_AUDIENCE", "casting")
+
+from app import create_app
+from auth.local_keys import LocalKeys
+from cache.object_cache import object_cache
+from cache.response_cache import response_cache, MemoryBackend
+from database.models import db, setup_db, Actor, Movie
+from database.pool import MeteredQueuePool, engine_options, pool_stats, pool_status
+from database.replicas import replica_status
+from config import Config, ConfigError
+
+
+class EngineOptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.environ = dict(os.environ)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    """
+    Pool settings come from the environment, Postgres also gets a statement timeout
+    """
+
+    def test_postgres_options(self):
+        os.environ.update(DB_POOL_SIZE="20", DB_MAX_OVERFLOW="5", DB_POOL_RECYCLE="300", DB_STATEMENT_TIMEOUT="2000")
+        options = engine_options("postgres://postgres@localhost:5432/casting")
+
+        self.assertIs(options["poolclass"], MeteredQueuePool)
+        self.assertEqual((options["pool_size"], options["max_overflow"], options["pool_recycle"]), (20, 5, 300))
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["connect_args"], {"options": "-c statement_timeout=2000"})
+
+    """
+    SQLite keeps its own pool
+    """
+
+    def test_sqlite_options(self):
+        os.environ["DB_POOL_PRE_PING"] = "false"
+
+        self.assertEqual(engine_options("sqlite://"), {"pool_pre_ping": False})
+
+
+class PoolTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        pool_stats.reset()
+
+    """
+    Waiting for a connection and timing out are counted
+    """
+
+    def test_pool_metrics(self):
+        engine = create_engine(
+            "sqlite:///" + self.path, poolclass=MeteredQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+        )
+        connection = engine.connect()
+        status = pool_status(engine)
+        self.assertEqual((status["size"], status["checked_out"], status["overflow"]), (1, 1, 0))
+
+        with self.assertRaises(TimeoutError):
+            engine.connect()
+        connection.close()
+
+        status = pool_status(engine)
+        self.assertEqual((status["checked_out"], status["waits"], status["timeouts"]), (0, 2, 1))
+        self.assertGreaterEqual(status["wait_seconds_max"], 0.05)
+
+    """
+    The session is returned to the pool after every request, including failed ones
+    """
+
+    def test_request_teardown_returns_connection(self):
+        app = Flask(__name__)
+        setup_db(app, "sqlite:///" + self.path)
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"poolclass": MeteredQueuePool, "pool_size": 1, "max_overflow": 0}
+
+        @app.route("/ok")
+        def ok():
+            return str(Actor.query.count())
+
+        @app.route("/abort")
+        def aborted():
+            Actor.query.count()
+            abort(400)
+
+        @app.route("/error")
+        def error():
+            db.session.add(Actor(name="Uncommitted", age=1, gender="Male"))
+            db.session.flush()
+            raise RuntimeError("handler failed")
+
+        with app.app_context():
+            db.create_all()
+            engine = db.engine
+
+        client = app.test_client()
+        for path in ("/ok", "/abort", "/error", "/ok"):
+            client.get(path)
+            self.assertEqual(pool_status(engine)["checked_out"], 0, path)
+
+        self.assertEqual(client.get("/ok").data, b"0")
+
+
+class ReplicaTest(unittest.TestCase):
+    def setUp(self):
+        self.urls = []
+        for title in ("Primary", "Replica 1", "Replica 2"):
+            fd, path = tempfile.mkstemp(suffix=".db")
+            os.close(fd)
+            self.addCleanup(os.remove, path)
+            engine = create_engine("sqlite:///" + path)
+            db.Model.metadata.create_all(engine)
+            engine.execute(Movie.__table__.insert(), title=title, release_date=date(2020, 1, 1))
+            engine.dispose()
+            self.urls.append("sqlite:///" + path)
+        self.down = "sqlite:////nonexistent/casting/replica.db"
+
+    def serve(self, replica_urls, app=None):
+        app = app or Flask(__name__)
+
+        @app.route("/movie", methods=["GET", "PATCH"])
+        def movie():
+            if request.method == "PATCH":
+                db.session.execute(Movie.__table__.update().values(title="Written"))
+                db.session.commit()
+            return db.session.query(Movie.title).scalar()
+
+        setup_db(app, self.urls[0], replica_urls)
+        self.addCleanup(app.extensions["replicas"].dispose)
+        return app
+
+    """
+    Reads go round-robin to the replicas passing their health check, writes to the primary
+    """
+
+    def test_round_robin(self):
+        app = self.serve([self.urls[1], self.down, self.urls[2]])
+        client = app.test_client()
+
+        titles = [client.get("/movie").data for _ in range(4)]
+        self.assertEqual(titles, [b"Replica 1", b"Replica 2", b"Replica 1", b"Replica 2"])
+        self.assertEqual([replica["healthy"] for replica in replica_status(app)], [True, False, True])
+        self.assertEqual(client.patch("/movie").data, b"Written")
+
+        # requests sharing an app context are still routed one by one
+        with app.app_context():
+            client = app.test_client()
+            self.assertEqual(client.get("/movie").data, b"Replica 1")
+            self.assertEqual(client.patch("/movie").data, b"Written")
+            self.assertEqual(client.get("/movie").data, b"Written")
+
+        app = self.serve([self.down])
+        self.assertEqual(app.test_client().get("/movie").data, b"Written")
+
+    """
+    A client that wrote reads from the primary until the sticky window ends, by cookie or bearer token
+    """
+
+    def test_read_your_writes(self):
+        app = self.serve([self.urls[1]])
+        router = app.extensions["replicas"]
+        writer = app.test_client()
+        headers = {"Authorization": "Bearer writer"}
+
+        self.assertEqual(writer.patch("/movie", headers=headers).data, b"Written")
+        self.assertEqual(writer.get("/movie").data, b"Written")
+        self.assertEqual(app.test_client().get("/movie", headers=headers).data, b"Written")
+        self.assertEqual(app.test_client().get("/movie").data, b"Replica 1")
+
+        now = time.time()
+        router.clock = lambda: now + router.sticky_seconds + 1
+        self.assertEqual(writer.get("/movie", headers=headers).data, b"Replica 1")
+
+    """
+    A sticky cookie the router could not have set is ignored
+    """
+
+    def test_forged_sticky_cookie(self):
+        app = self.serve([self.urls[1]])
+        # the cookie is sent as a header, a client cookie jar would replace it
+        client = app.test_client(use_cookies=False)
+
+        for value in (str(time.time() + 10**9), "inf", "nan", "soon"):
+            headers = {"Cookie": "db_primary_until=" + value}
+            self.assertEqual(client.get("/movie", headers=headers).data, b"Replica 1", value)
+        headers = {"Cookie": "db_primary_until=" + str(time.time() + 1)}
+        self.assertEqual(client.get("/movie", headers=headers).data, b"Primary")
+
+    """
+    The response and object caches do not give a writer back the rows a lagging replica returned to
+    other clients, and do not keep those rows once the writer's window ends
+    """
+
+    def test_caches_read_your_writes(self):
+        backend = response_cache.backend
+        response_cache.backend = MemoryBackend()
+        self.addCleanup(setattr, response_cache, "backend", backend)
+        object_cache.clear()
+        self.addCleanup(object_cache.clear)
+
+        keys = LocalKeys().install()
+        permissions = ["get:movies", "patch:movies"]
+        writer_headers = {"Authorization": "Bearer " + keys.token(permissions, sub="writer")}
+        reader_headers = {"Authorization": "Bearer " + keys.token(permissions, sub="reader")}
+        app = create_app()
+        setup_db(app, self.urls[0], [self.urls[1]])
+        self.addCleanup(app.extensions["replicas"].dispose)
+        router = app.extensions["replicas"]
+        writer, reader = app.test_client(), app.test_client()
+
+        def title(client, path, headers):
+            response = client.get(path, headers=headers)
+            body = response.get_json()
+            movie = body["movie"] if "movie" in body else body["movies"][0]
+            return movie["title"], response.headers.get("X-Cache")
+
+        response = writer.patch("/movies/1", json={"title": "Written"}, headers=writer_headers)
+        self.assertEqual(response.status_code, 200)
+        for path in ("/movies/1", "/movies"):
+            self.assertEqual(title(reader, path, reader_headers), ("Replica 1", "MISS"), path)
+            self.assertEqual(title(writer, path, writer_headers)[0], "Written", path)
+            self.assertEqual(title(app.test_client(), path, writer_headers)[0], "Written", path)
+            self.assertEqual(title(reader, path, reader_headers), ("Replica 1", "MISS"), path)
+
+        now = time.time()
+        router.clock = lambda: now + router.sticky_seconds + 1
+        for path in ("/movies/1", "/movies"):
+            self.assertEqual(title(reader, path, reader_headers), ("Replica 1", "MISS"), path)
+            self.assertEqual(title(reader, path, reader_headers), ("Replica 1", "HIT"), path)
+
+
+class ConfigTest(unittest.TestCase):
+    """
+    Settings are read on first use, required ones fail then rather than at import
+    """
+
+    def test_lazy_settings(self):
+        environ = {"AUTH0_DOMAIN": "casting.test\r"}
+        config = Config(environ, api_audience="casting")
+
+        self.assertEqual(config.jwks_url, "https://casting.test/.well-known/jwks.json")
+        self.assertEqual(config.api_audience, "casting")
+        with self.assertRaises(ConfigError):
+            config.database_url
+
+        environ.update(DATABASE_URL="sqlite://", AUTH0_DOMAIN="other.test")
+        self.assertEqual(config.auth0_domain, "casting.test")
+        config.reload()
+        self.assertEqual((config.database_url, config.auth0_domain), ("sqlite://", "other.test"))
+
+    """
+    Importing the app needs no settings, and serving it loads neither the migration tooling nor the JWT library
+    """
+
+    def test_cold_start_imports(self):
+        def run(script, **settings):
+            settings_names = ("DATABASE_URL", "AUTH0_DOMAIN", "ALGORITHMS", "API_AUDIENCE", "JWKS_URL")
+            environ = {name: value for name, value in os.environ.items() if name not in settings_names}
+            return subprocess.run(
+                [sys.executable, "-c", script],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env=dict(environ, **settings),
+                capture_output=True,
+                text=True,
+            )
+
+        result = run("import app; app.APP")
+        self.assertIn("DATABASE_URL is not set", result.stderr)
+
+        script = "import sys; from app import APP; print('flask_migrate' in sys.modules, 'jose' in sys.modules)"
+        result = run(script, DATABASE_URL="sqlite://")
+        self.assertEqual(result.stdout, "False False\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import os
+import json
+import pstats
+import tempfile
+import unittest
+from flask import Flask, abort
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+from monitoring.metrics import Registry, Counter, Histogram, instrument_app, status_samples
+from monitoring.metrics import REQUEST_DURATION, DB_QUERIES, POOL_METRICS
+from monitoring.profiling import RequestProfiler
+from monitoring.slow_queries import SlowQueryLog, parameter_shape
+
+
+def series(histogram, *label_values):
+    counts, total = histogram.series.get(label_values, ([0], 0.0))
+    return sum(counts), total
+
+
+class MetricsTest(unittest.TestCase):
+    """
+    Histograms render cumulative buckets, sum and count per label set, in the Prometheus text format
+    """
+
+    def test_render(self):
+        registry = Registry()
+        histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0), registry=registry)
+        counter = Counter("failures_total", "Failures", ("code",), registry=registry)
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, '/say "hi"')
+        counter.inc("unauthorized")
+        counter.inc("unauthorized", amount=2)
+
+        text = registry.render([("pool_size", "gauge", "Pool size", 5)])
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{route="/say \\"hi\\"",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="/say \\"hi\\"",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="/say \\"hi\\"",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_sum{route="/say \\"hi\\""} 3.65', text)
+        self.assertIn('latency_seconds_count{route="/say \\"hi\\""} 4', text)
+        self.assertIn('failures_total{code="unauthorized"} 3', text)
+        self.assertIn("# TYPE pool_size gauge\npool_size 5\n", text)
+
+    """
+    Every request is recorded under its route pattern and status, with the queries it ran
+    """
+
+    def test_request_metrics(self):
+        app = instrument_app(Flask(__name__))
+        engine = create_engine("sqlite://")
+
+        @app.route("/metrics-test/<int:id>")
+        def show(id):
+            with engine.connect() as connection:
+                for _ in range(id):
+                    connection.execute("SELECT 1")
+            if id == 0:
+                abort(404)
+            return "ok"
+
+        route = "/metrics-test/<int:id>"
+        before = series(REQUEST_DURATION, route, "GET", "200")[0], series(DB_QUERIES, route)
+        unmatched = series(REQUEST_DURATION, "unmatched", "GET", "404")[0]
+        client = app.test_client()
+        client.get("/metrics-test/3")
+        client.get("/metrics-test/2")
+        client.get("/metrics-test/0")
+        client.get("/metrics-missing")
+        with engine.connect() as connection:
+            connection.execute("SELECT 1")
+
+        self.assertEqual(series(REQUEST_DURATION, route, "GET", "200")[0], before[0] + 2)
+        self.assertEqual(series(REQUEST_DURATION, route, "GET", "404")[0], 1)
+        self.assertEqual(series(REQUEST_DURATION, "unmatched", "GET", "404")[0], unmatched + 1)
+        count, total = series(DB_QUERIES, route)
+        self.assertEqual((count, total), (before[1][0] + 3, before[1][1] + 5))
+
+    """
+    Pool and cache status values become gauges and counters
+    """
+
+    def test_status_samples(self):
+        samples = status_samples(POOL_METRICS, {"pool": "QueuePool", "size": 5, "timeouts": 1})
+        self.assertEqual(
+            samples,
+            [
+                ("db_pool_size", "gauge", "Connections the pool keeps open", 5),
+                ("db_pool_timeouts_total", "counter", "Requests that gave up waiting for a connection", 1),
+            ],
+        )
+
+
+class ProfilingTest(unittest.TestCase):
+    def make_client(self, profiler):
+        app = profiler.install(Flask(__name__))
+
+        @app.route("/movies/<int:id>")
+        def movie(id):
+            return "ok"
+
+        return app.test_client()
+
+    """
+    Requests with the profiling token are profiled, the dumps are pstats files and only the last ones are kept
+    """
+
+    def test_header_trigger(self):
+        directory = tempfile.mkdtemp()
+        client = self.make_client(RequestProfiler(token="secret", directory=directory, keep=2))
+
+        self.assertNotIn("X-Profile", client.get("/movies/1").headers)
+        self.assertNotIn("X-Profile", client.get("/movies/1", headers={"X-Profile": "guess"}).headers)
+        names = [client.get("/movies/1", headers={"X-Profile": "secret"}).headers["X-Profile"] for _ in range(3)]
+
+        self.assertIn("_GET_movies-int-id_", names[0])
+        self.assertEqual(sorted(os.listdir(directory)), names[1:])
+        stats = pstats.Stats(os.path.join(directory, names[-1]))
+        self.assertTrue(any(function[2] == "movie" for function in stats.stats))
+
+    """
+    Sampling profiles a fraction of the requests, PROFILE_SLOW_MS drops the fast ones
+    """
+
+    def test_sampling_and_threshold(self):
+        directory = tempfile.mkdtemp()
+        client = self.make_client(RequestProfiler(sample_rate=1.0, directory=directory))
+        self.assertIn("X-Profile", client.get("/movies/1").headers)
+
+        client = self.make_client(RequestProfiler(sample_rate=1.0, slow_ms=10000, directory=directory))
+        self.assertNotIn("X-Profile", client.get("/movies/1").headers)
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    """
+    Without a sample rate or token no hook is installed
+    """
+
+    def test_disabled(self):
+        app = RequestProfiler().install(Flask(__name__))
+        self.assertEqual((app.before_request_funcs, app.after_request_funcs), ({}, {}))
+
+
+class SlowQueryLogTest(unittest.TestCase):
+    """
+    Queries over the threshold are logged with their SQL and parameter types, never their values
+    """
+
+    def test_logs_slow_queries(self):
+        engine = create_engine("sqlite://")
+        log = SlowQueryLog(threshold_ms=0.000001).install(engine)
+        try:
+            with self.assertLogs("slow_queries") as logs:
+                engine.execute("SELECT ? AS title,\n ? AS age", "Mad Max", 42)
+        finally:
+            log.remove(engine)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["statement"], "SELECT ? AS title, ? AS age")
+        self.assertEqual(record["parameters"], ["str", "int"])
+        self.assertIsNone(record["route"])
+        self.assertGreater(record["duration_ms"], 0)
+        self.assertNotIn("Mad Max", logs.output[0])
+
+    """
+    Failed queries leave no start time behind on the pooled connection
+    """
+
+    def test_failed_queries(self):
+        engine = create_engine("sqlite://")
+        log = SlowQueryLog(threshold_ms=1000).install(engine)
+        try:
+            with engine.connect() as connection:
+                for _ in range(3):
+                    with self.assertRaises(OperationalError):
+                        connection.execute("SELECT * FROM missing")
+                connection.execute("SELECT 1")
+                self.assertEqual(connection.info.get("slow_query_start"), [])
+        finally:
+            log.remove(engine)
+
+    """
+    Without a threshold no listener is installed
+    """
+
+    def test_disabled(self):
+        engine = create_engine("sqlite://")
+        log = SlowQueryLog().install(engine)
+        self.assertFalse(event.contains(engine, "after_cursor_execute", log.after_cursor_execute))
+
+    def test_parameter_shape(self):
+        self.assertEqual(parameter_shape({"title_1": "Mad Max", "limit": 5}), {"title_1": "str", "limit": "int"})
+        rows = [{"title": "Mad Max"}, {"title": "Inception"}]
+        self.assertEqual(parameter_shape(rows, executemany=True), {"rows": 2, "row": {"title": "str"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,589 @@
+import os
+import sys
+import json
+import importlib
+import unittest
+from contextlib import contextmanager
+from datetime import date, datetime
+from unittest import mock
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from werkzeug.datastructures import MultiDict
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from database.models import db, setup_db, Movie, Actor, Casting
+from database.queries import MOVIE_FIELDS, ACTOR_FIELDS, movie_filters, actor_filters, fetch_page
+from database.queries import movie_casts, actor_roles, embed_related
+from database.queries import movies_version, actors_version, movie_casts_version
+from database.export import iter_rows, ndjson_chunks, json_array_chunks
+from database.bulk import bulk_insert, bulk_update, bulk_delete
+from database.writes import update_row, delete_row
+from database.validation import ValidationError, validate_movie, validate_actor
+from database import serialization
+from database.search import MemoryIndex, search
+
+
+class ListQueriesTest(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        setup_db(self.app, "sqlite://")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        db.session.add_all(
+            [Movie(title=f"Mad Max {i}", release_date=date(2000 + i, 1, 1)) for i in range(5)]
+            + [Movie(title="Inception", release_date=date(2010, 7, 16))]
+            + [Actor(name=f"Actor {i}", age=20 + i, gender="Female" if i % 2 else "Male") for i in range(10)]
+        )
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def movies(self, **args):
+        args = MultiDict(args)
+        return fetch_page(Movie, MOVIE_FIELDS, args, movie_filters(args))
+
+    def actors(self, **args):
+        args = MultiDict(args)
+        return fetch_page(Actor, ACTOR_FIELDS, args, actor_filters(args))
+
+    """
+    Following next_cursor walks every row exactly once
+    """
+
+    def test_keyset_pagination(self):
+        seen = []
+        rows, cursor = self.actors(limit="3")
+        seen += rows
+        while cursor:
+            rows, cursor = self.actors(limit="3", cursor=cursor)
+            seen += rows
+
+        self.assertEqual([row["id"] for row in seen], list(range(1, 11)))
+
+    """
+    The last page has no next_cursor
+    """
+
+    def test_last_page(self):
+        rows, cursor = self.actors(limit="10")
+
+        self.assertEqual(len(rows), 10)
+        self.assertIsNone(cursor)
+
+    """
+    fields= returns only the requested columns plus id
+    """
+
+    def test_field_selection(self):
+        rows, _ = self.movies(fields="title", limit="1")
+
+        self.assertEqual(rows, [{"id": 1, "title": "Mad Max 0"}])
+
+    """
+    Filters are applied in SQL
+    """
+
+    def test_filters(self):
+        rows, _ = self.movies(title="mad", release_date_from="2002-01-01", release_date_to="2003-12-31")
+        self.assertEqual([row["title"] for row in rows], ["Mad Max 2", "Mad Max 3"])
+
+        rows, _ = self.actors(age_min="22", age_max="25", gender="Female")
+        self.assertEqual([row["age"] for row in rows], [23, 25])
+
+    """
+    LIKE wildcards in a prefix are matched literally
+    """
+
+    def test_prefix_escapes_wildcards(self):
+        rows, _ = self.movies(title="%")
+
+        self.assertEqual(rows, [])
+
+    """
+    Malformed parameters raise ValueError
+    """
+
+    def test_invalid_args(self):
+        for args in ({"limit": "0"}, {"limit": "5000"}, {"cursor": "abc"}, {"fields": "budget"}):
+            with self.assertRaises(ValueError):
+                self.actors(**args)
+        with self.assertRaises(ValueError):
+            self.movies(release_date_from="yesterday")
+
+    """
+    The NDJSON export streams every row, one per line, in small chunks
+    """
+
+    def test_export_ndjson(self):
+        args = MultiDict({"fields": "name"})
+        chunks = list(ndjson_chunks(iter_rows(Actor, ACTOR_FIELDS, args, actor_filters(args)), batch_size=4))
+        rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(rows[0], {"id": 1, "name": "Actor 0"})
+        self.assertEqual([row["id"] for row in rows], list(range(1, 11)))
+
+    """
+    The JSON export is a single valid document matching the list endpoint shape
+    """
+
+    def test_export_json_array(self):
+        args = MultiDict({"title": "mad"})
+        rows = iter_rows(Movie, MOVIE_FIELDS, args, movie_filters(args), batch_size=2)
+        data = json.loads(b"".join(json_array_chunks(rows, "movies", batch_size=2)))
+
+        self.assertTrue(data["success"])
+        self.assertEqual(len(data["movies"]), 5)
+
+    """
+    Bulk writes return the new ids and the ids that existed
+    """
+
+    def test_bulk_writes(self):
+        rows = [validate_actor({"name": f"New {i}", "age": "40", "gender": "Male"}) for i in range(3)]
+        ids = bulk_insert(Actor, rows)
+        db.session.commit()
+        self.assertEqual(ids, [11, 12, 13])
+
+        updated = bulk_update(Actor, [{"id": 11, "age": 41}, {"id": 99, "age": 1}])
+        db.session.commit()
+        self.assertEqual(updated, {11})
+        self.assertEqual(Actor.query.get(11).age, 41)
+        self.assertEqual(Actor.query.get(11).name, "New 0")
+
+        deleted = bulk_delete(Actor, [12, 13, 99])
+        db.session.commit()
+        self.assertEqual(deleted, {12, 13})
+        self.assertEqual(Actor.query.count(), 11)
+
+    """
+    Single row writes change only the supplied columns, without loading the row first
+    """
+
+    def test_single_row_writes(self):
+        with captured_statements() as statements:
+            row = update_row(Movie, MOVIE_FIELDS, 6, {"title": "Inception 2"})
+        db.session.commit()
+        self.assertEqual(row, {"id": 6, "title": "Inception 2", "release_date": date(2010, 7, 16)})
+        self.assertTrue(statements[0][0].startswith("UPDATE movies SET title=?, updated_at=?"))
+        self.assertIsNone(update_row(Movie, MOVIE_FIELDS, 99, {"title": "Missing"}))
+
+        with captured_statements() as statements:
+            self.assertTrue(delete_row(Actor, 3))
+        db.session.commit()
+        self.assertEqual(len(statements), 1)
+        self.assertFalse(delete_row(Actor, 3))
+        self.assertEqual(Actor.query.count(), 9)
+
+    """
+    The catalog version is one query and changes on insert, update (bulk too) and delete
+    """
+
+    def test_catalog_version(self):
+        args = MultiDict({"name": "actor"})
+        with captured_statements() as statements:
+            version = actors_version(args)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(version[0], 10)
+
+        versions = [version]
+        bulk_update(Actor, [{"id": 1, "age": 50}])
+        db.session.commit()
+        versions.append(actors_version(args))
+        bulk_insert(Actor, [validate_actor({"name": "Actor New", "age": 30, "gender": "Male"})])
+        db.session.commit()
+        versions.append(actors_version(args))
+        bulk_delete(Actor, [2])
+        db.session.commit()
+        versions.append(actors_version(args))
+
+        self.assertEqual(len(set(versions)), 4)
+        self.assertGreater(versions[1][1], versions[0][1])
+        self.assertEqual(movies_version(MultiDict()), movies_version(MultiDict()))
+        self.assertEqual(len(movies_version(MultiDict({"embed": "actors"}))), 6)
+        with self.assertRaises(ValueError):
+            movies_version(MultiDict({"release_date_from": "soon"}))
+
+    """
+    Items are validated before any write
+    """
+
+    def test_validation(self):
+        values = validate_movie({"release_date": "2020-12-30"}, partial=True)
+        self.assertEqual(values, {"release_date": date(2020, 12, 30)})
+        for item in ({"title": "Mad Max"}, {"title": "", "release_date": "2020-12-30"}, ["Mad Max"]):
+            with self.assertRaises(ValidationError):
+                validate_movie(item)
+        for item in ({"name": "Ann", "age": -1, "gender": "Female"}, {"name": "Ann", "age": "old", "gender": "Female"}):
+            with self.assertRaises(ValidationError):
+                validate_actor(item)
+        for item in ({"name": "Ann", "age": 151, "gender": "Female"}, {"name": "Ann", "age": True, "gender": "Female"}):
+            with self.assertRaises(ValidationError):
+                validate_actor(item)
+
+        values = validate_actor({"name": "Ann", "age": "40", "gender": "female", "id": 3})
+        self.assertEqual(values, {"name": "Ann", "age": 40, "gender": "Female"})
+        with self.assertRaises(ValidationError) as raised:
+            validate_actor({"age": 30.5, "gender": "robot"})
+        self.assertEqual([error["field"] for error in raised.exception.errors], ["name", "age", "gender"])
+        self.assertEqual(raised.exception.errors[0]["message"], "name is required")
+        with self.assertRaises(ValidationError) as raised:
+            validate_movie({"id": 1}, partial=True)
+        self.assertEqual(raised.exception.errors, [{"field": None, "message": str(raised.exception)}])
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.get_engine()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+class CastingQueriesTest(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        setup_db(self.app, "sqlite://")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        movies = [{"title": f"Movie {i}", "release_date": date.today()} for i in range(100)]
+        actors = [{"name": f"Actor {i}", "age": 30, "gender": "Male"} for i in range(30)]
+        castings = [
+            {"movie_id": m, "actor_id": 1 + (m + k) % 30, "role": f"Role {k}"} for m in range(1, 101) for k in range(3)
+        ]
+        db.session.execute(Movie.__table__.insert(), movies)
+        db.session.execute(Actor.__table__.insert(), actors)
+        db.session.execute(Casting.__table__.insert(), castings)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    """
+    100 movies with their casts take two queries: the page and the casts
+    """
+
+    def test_embedded_casts_constant_queries(self):
+        args = MultiDict({"limit": "100"})
+        with captured_statements() as statements:
+            movies, _ = fetch_page(Movie, MOVIE_FIELDS, args, movie_filters(args))
+            embed_related(movies, "actors", movie_casts)
+
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(len(movies), 100)
+        self.assertTrue(all(len(movie["actors"]) == 3 for movie in movies))
+        self.assertEqual(
+            movies[0]["actors"][0], {"id": 2, "name": "Actor 1", "age": 30, "gender": "Male", "role": "Role 0"}
+        )
+
+    """
+    The movies of every actor on a page are loaded with one query
+    """
+
+    def test_actor_roles_single_query(self):
+        with captured_statements() as statements:
+            roles = actor_roles(list(range(1, 31)))
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(sum(len(movies) for movies in roles.values()), 300)
+
+    """
+    Removing an actor from a movie changes the version of the movie's cast
+    """
+
+    def test_cast_version(self):
+        version = movie_casts_version(1)
+        Casting.query.get((1, 2)).delete()
+
+        self.assertNotEqual(movie_casts_version(1), version)
+        self.assertEqual((version[0], version[2], version[4]), (1, 3, 3))
+        self.assertEqual(movie_casts_version(1)[2], 2)
+
+    """
+    Deleting a movie removes its castings
+    """
+
+    def test_castings_deleted_with_movie(self):
+        db.session.delete(Movie.query.get(1))
+        db.session.commit()
+        Movie.query.filter(Movie.id == 2).delete()
+        db.session.commit()
+
+        self.assertEqual(Casting.query.filter(Casting.movie_id.in_([1, 2])).count(), 0)
+        self.assertEqual(Casting.query.count(), 294)
+
+
+class SerializationTest(unittest.TestCase):
+    """
+    Both encoders produce the document jsonify produces, dates included
+    """
+
+    def test_matches_jsonify(self):
+        app = Flask(__name__)
+        body = {
+            "success": True,
+            "movies": [{"id": 1, "title": "Amélie", "release_date": date(2001, 4, 25)}],
+            "updated_at": datetime(2020, 1, 2, 3, 4, 5),
+            "next_cursor": None,
+        }
+        with app.app_context():
+            expected = json.loads(app.json_encoder().encode(body))
+
+        fallback = self.reload(orjson=None)
+        self.assertEqual(fallback.ENCODER, "json")
+        self.assertEqual(json.loads(fallback.dumps(body)), expected)
+        self.assertEqual(json.loads(self.reload().dumps(body)), expected)
+        with self.assertRaises(TypeError):
+            serialization.dumps({"value": object()})
+
+    """
+    JSON_DATE_FORMAT=iso sends ISO dates with either encoder
+    """
+
+    def test_iso_dates(self):
+        with mock.patch.dict(os.environ, JSON_DATE_FORMAT="iso"):
+            for modules in ({}, {"orjson": None}):
+                dumps = self.reload(**modules).dumps
+                self.assertEqual(json.loads(dumps({"release_date": date(2001, 4, 25)})), {"release_date": "2001-04-25"})
+
+    def reload(self, **modules):
+        self.addCleanup(importlib.reload, serialization)
+        with mock.patch.dict(sys.modules, modules):
+            return importlib.reload(serialization)
+
+
+class SearchTest(unittest.TestCase):
+    """
+    Runs against SEARCH_DATABASE_URL (SQLite in memory and the in-process index by default,
+    Postgres text search supported)
+    """
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        setup_db(self.app, os.getenv("SEARCH_DATABASE_URL", "sqlite://"))
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.drop_all()
+        db.create_all()
+
+        db.session.add_all(
+            [
+                Movie(title="Mad Max", release_date=date(1979, 4, 12)),
+                Movie(title="Mad Max: Fury Road", release_date=date(2015, 5, 15)),
+                Movie(title="Madagascar", release_date=date(2005, 5, 27)),
+                Movie(title="Max Payne", release_date=date(2008, 10, 17)),
+                Actor(name="Max von Sydow", age=90, gender="Male"),
+                Actor(name="Madeleine Stowe", age=62, gender="Female"),
+            ]
+        )
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def titles(self, q, kinds=("movies", "actors"), **args):
+        results, _ = search(q, list(kinds), MultiDict(args))
+        return [result.get("title") or result.get("name") for result in results]
+
+    """
+    Every word must prefix a word of the title or name (or be one, under three letters),
+    shorter matches rank first
+    """
+
+    def test_ranked_prefix_matches(self):
+        self.assertEqual(self.titles("mad max"), ["Mad Max", "Mad Max: Fury Road"])
+        self.assertEqual(self.titles("FURY, roa"), ["Mad Max: Fury Road"])
+        self.assertEqual(set(self.titles("max")), {"Mad Max", "Mad Max: Fury Road", "Max Payne", "Max von Sydow"})
+        self.assertEqual(self.titles("mad", kinds=["actors"]), ["Madeleine Stowe"])
+        self.assertEqual(self.titles("maxx"), [])
+        self.assertEqual(self.titles("ma"), [])
+        self.assertEqual(self.titles("max vo"), [])
+        self.assertEqual(self.titles("max von"), ["Max von Sydow"])
+
+        results, _ = search("payne", ["movies"], MultiDict())
+        self.assertEqual(results[0]["type"], "movie")
+        self.assertEqual(results[0]["release_date"], date(2008, 10, 17))
+
+    """
+    Following next_cursor returns every result exactly once
+    """
+
+    def test_pagination(self):
+        seen, cursor = [], None
+        while True:
+            args = MultiDict({"limit": "2", **({"cursor": cursor} if cursor else {})})
+            results, cursor = search("mad", ["movies", "actors"], args)
+            seen += [(result["type"], result["id"]) for result in results]
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 4)
+        self.assertEqual(len(set(seen)), 4)
+
+    """
+    With more matches than SEARCH_CANDIDATES, every page ranks the matches with the lowest ids and paging
+    stops at SEARCH_CANDIDATES results, on both backends
+    """
+
+    def test_candidates_cap_paging(self):
+        with mock.patch("database.search.SEARCH_CANDIDATES", 2):
+            first, cursor = search("mad", ["movies"], MultiDict({"limit": "1"}))
+            self.assertEqual((len(first), cursor), (1, "1"))
+            second, cursor = search("mad", ["movies"], MultiDict({"limit": "5", "cursor": "1"}))
+            self.assertEqual((len(second), cursor), (1, None))
+            with self.assertRaises(ValueError):
+                search("mad", ["movies"], MultiDict({"cursor": "2"}))
+
+        titles = {result["title"] for result in first + second}
+        self.assertEqual(titles, {"Mad Max", "Mad Max: Fury Road"})
+
+        index = MemoryIndex([(("movies", 1), "Max Payne"), (("movies", 2), "Max"), (("actors", 1), "Max")])
+        self.assertEqual(index.search(["max"], ["actors", "movies"], 1), [("actors", 1, 1.0), ("movies", 1, 0.5)])
+
+    """
+    New and renamed rows are found by the next search
+    """
+
+    def test_follows_writes(self):
+        self.titles("mad")
+        Movie(title="Mad City", release_date=date(1997, 11, 7)).insert()
+        movie = Movie.query.get(4)
+        movie.title = "Payne"
+        movie.update()
+
+        self.assertIn("Mad City", self.titles("mad"))
+        self.assertEqual(self.titles("max", kinds=["movies"]), ["Mad Max", "Mad Max: Fury Road"])
+
+    def test_invalid_args(self):
+        cases = [("", {}), ("?!", {}), ("mad", {"limit": "0"}), ("mad", {"cursor": "-1"}), ("mad", {"limit": "x"})]
+        for q, args in cases:
+            with self.subTest(q=q, args=args), self.assertRaises(ValueError):
+                search(q, ["movies"], MultiDict(args))
+
+    """
+    The in-process index finds prefixes by bisection
+    """
+
+    def test_memory_index(self):
+        index = MemoryIndex([(("movies", 1), "Mad Max"), (("movies", 2), "Madagascar"), (("actors", 1), "Max")])
+
+        self.assertEqual(index.matches("mad"), {("movies", 1): 1.0, ("movies", 2): 0.5})
+        self.assertEqual(index.matches("ma"), {})
+        self.assertEqual(index.search(["max"], ["actors", "movies"]), [("actors", 1, 1.0), ("movies", 1, 0.5)])
+
+
+class QueryPlanTest(unittest.TestCase):
+    """
+    The filtered and paginated list queries must be served by an index.
+    Runs against QUERY_PLAN_DATABASE_URL (SQLite in memory by default, Postgres supported).
+    """
+
+    ROWS = 20000
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        setup_db(self.app, os.getenv("QUERY_PLAN_DATABASE_URL", "sqlite://"))
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.drop_all()
+        db.create_all()
+
+        db.session.execute(
+            Movie.__table__.insert(),
+            [{"title": f"Movie {i:05d}", "release_date": date(1950 + i % 70, 1 + i % 12, 1)} for i in range(self.ROWS)],
+        )
+        db.session.execute(
+            Actor.__table__.insert(),
+            [
+                {"name": f"Actor {i:05d}", "age": i % 90, "gender": ("Male", "Female", "Other")[i % 3]}
+                for i in range(self.ROWS)
+            ],
+        )
+        db.session.commit()
+        db.session.execute("ANALYZE")
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def plan(self, model, fields, filters, **args):
+        with captured_statements() as statements:
+            args = MultiDict(args)
+            fetch_page(model, fields, args, filters(args))
+
+        return self.explain(*statements[-1])
+
+    def explain(self, statement, parameters):
+        explain = "EXPLAIN" if db.get_engine().dialect.name == "postgresql" else "EXPLAIN QUERY PLAN"
+        cursor = db.session.connection().connection.cursor()
+        cursor.execute(f"{explain} {statement}", parameters)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertIndexed(self, plan, table):
+        self.assertNotRegex(plan, rf"Seq Scan on {table}|SCAN (TABLE )?{table}$|SCAN (TABLE )?{table}\n", plan)
+
+    def test_list_queries_use_indexes(self):
+        dates = {"release_date_from": "1960-01-01", "release_date_to": "1960-02-01"}
+        cases = [
+            (Movie, MOVIE_FIELDS, movie_filters, {"cursor": "15000"}, "movies"),
+            (Movie, MOVIE_FIELDS, movie_filters, {"title": "movie 0012"}, "movies"),
+            (Movie, MOVIE_FIELDS, movie_filters, dates, "movies"),
+            (Actor, ACTOR_FIELDS, actor_filters, {"cursor": "15000"}, "actors"),
+            (Actor, ACTOR_FIELDS, actor_filters, {"name": "actor 0012"}, "actors"),
+            (Actor, ACTOR_FIELDS, actor_filters, {"age_min": "30", "age_max": "31"}, "actors"),
+        ]
+        for model, fields, filters, args, table in cases:
+            with self.subTest(args=args):
+                self.assertIndexed(self.plan(model, fields, filters, **args), table)
+
+    """
+    create_all builds the lower() indexes like the migration, with text_pattern_ops on Postgres
+    """
+
+    def test_pattern_indexes(self):
+        for table, name in ((Movie.__table__, "ix_movies_title_lower"), (Actor.__table__, "ix_actors_name_lower")):
+            index = next(index for index in table.indexes if index.name == name)
+            self.assertIn("text_pattern_ops", str(CreateIndex(index).compile(dialect=postgresql.dialect())))
+            if db.get_engine().dialect.name == "postgresql":
+                definition = db.session.execute(
+                    "SELECT indexdef FROM pg_indexes WHERE indexname = :name", {"name": name}
+                ).scalar()
+                self.assertIn("text_pattern_ops", definition)
+
+    def test_search_uses_indexes(self):
+        if db.get_engine().dialect.name != "postgresql":
+            self.skipTest("text search runs in process on SQLite")
+
+        with captured_statements() as statements:
+            search("movie 0012", ["movies", "actors"], MultiDict())
+        plan = self.explain(*statements[0])
+
+        self.assertIn("ix_movies_search_vector", plan)
+        self.assertIn("ix_actors_search_vector", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()